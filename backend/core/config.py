@@ -1,7 +1,8 @@
 import os
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file (the only place it is read:
+# everything else gets its configuration from `settings`)
 load_dotenv()
 
 class Settings:
@@ -14,6 +15,77 @@ class Settings:
     
     # API Keys
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+
+    # AI Provider: "gemini", "openai" or "stub" (deterministic, offline)
+    AI_PROVIDER: str = os.getenv("AI_PROVIDER", "gemini")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # How long a discovered Gemini model name is trusted before listing models again
+    AI_MODEL_TTL_SECONDS: float = float(os.getenv("AI_MODEL_TTL_SECONDS", "3600"))
+    # Simulated latency of the stub provider (benchmarks)
+    AI_STUB_LATENCY_MS: float = float(os.getenv("AI_STUB_LATENCY_MS", "0"))
+
+    # AI Agent: max LLM calls running at the same time (bounded thread pool,
+    # so slow calls never block the event loop nor pile up unbounded threads)
+    AI_MAX_CONCURRENCY: int = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+
+    # Prompt compaction: max tokens spent on the data section of the prompt,
+    # and how many top/bottom performers are listed before the long tail is aggregated
+    AI_PROMPT_TOKEN_BUDGET: int = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "1500"))
+    AI_PROMPT_TOP_K: int = int(os.getenv("AI_PROMPT_TOP_K", "5"))
+
+    # AI response cache (content-addressed): memory tier + optional disk tier
+    AI_CACHE_TTL_SECONDS: float = float(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", "256"))
+    AI_CACHE_DIR: str = os.getenv("AI_CACHE_DIR", "")  # Empty = memory only
+    AI_CACHE_DISK_MAX_BYTES: int = int(os.getenv("AI_CACHE_DISK_MAX_BYTES", str(50 * 1024 * 1024)))
+
+    # Ingestion: number of CSV rows parsed and validated per chunk.
+    # Peak memory per upload is bounded by this value, not by the file size.
+    CSV_CHUNK_SIZE: int = int(os.getenv("CSV_CHUNK_SIZE", "50000"))
+    # Parallel aggregation: frames with at least this many rows, and the chunks of an
+    # upload past this many rows, are summed in a process pool (0 workers = one per CPU,
+    # 1 = always serial)
+    PARALLEL_AGGREGATION_MIN_ROWS: int = int(os.getenv("PARALLEL_AGGREGATION_MIN_ROWS", "2000000"))
+    PARALLEL_AGGREGATION_WORKERS: int = int(os.getenv("PARALLEL_AGGREGATION_WORKERS", "0"))
+    # Maximum size of a gzip-compressed request body once inflated (HTTP 413 above)
+    REQUEST_MAX_DECOMPRESSED_BYTES: int = int(os.getenv("REQUEST_MAX_DECOMPRESSED_BYTES", str(2 * 1024 ** 3)))
+    # Response compression: bodies from this size up are compressed (brotli if installed, else gzip)
+    RESPONSE_COMPRESSION_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    RESPONSE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+    # Prometheus metrics on /metrics (request timing, pipeline stages, AI calls, webhook queue)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Result cache of the dataset analytics endpoints (query, timeseries, aggregate), keyed by
+    # dataset version; least recently used results evicted above the byte budget. With a directory,
+    # results are also shared by the workers of one machine (empty = per-process memory only)
+    QUERY_CACHE_MAX_BYTES: int = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    QUERY_CACHE_DIR: str = os.getenv("QUERY_CACHE_DIR", "")
+    QUERY_CACHE_DISK_MAX_BYTES: int = int(os.getenv("QUERY_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Memory for the per-dataset aggregation cubes (least recently used dataset versions evicted)
+    CUBE_CACHE_MAX_BYTES: int = int(os.getenv("CUBE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Maximum number of failing row numbers listed in a validation report
+    VALIDATION_MAX_REPORTED_ROWS: int = int(os.getenv("VALIDATION_MAX_REPORTED_ROWS", "1000"))
+
+    # Webhooks: write-behind buffer between the endpoints and the database
+    WEBHOOK_QUEUE_MAX_DEPTH: int = int(os.getenv("WEBHOOK_QUEUE_MAX_DEPTH", "50000"))  # 429 above this
+    WEBHOOK_BATCH_SIZE: int = int(os.getenv("WEBHOOK_BATCH_SIZE", "500"))
+    WEBHOOK_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("WEBHOOK_FLUSH_INTERVAL_SECONDS", "1.0"))
+    WEBHOOK_MAX_BULK_ITEMS: int = int(os.getenv("WEBHOOK_MAX_BULK_ITEMS", "10000"))
+    # Attempts before a batch the database keeps refusing is split, down to single
+    # leads that are dead-lettered (connection errors are retried without limit)
+    WEBHOOK_MAX_FLUSH_ATTEMPTS: int = int(os.getenv("WEBHOOK_MAX_FLUSH_ATTEMPTS", "3"))
+    # Lead deduplication: a rotating Bloom filter remembers leads for this window
+    # (memory ~ 2 x 1.8 MB per million leads of capacity at a 0.1% false-positive rate)
+    DEDUPE_WINDOW_SECONDS: float = float(os.getenv("DEDUPE_WINDOW_SECONDS", "86400"))
+    DEDUPE_CAPACITY: int = int(os.getenv("DEDUPE_CAPACITY", "1000000"))  # Leads per generation
+    DEDUPE_ERROR_RATE: float = float(os.getenv("DEDUPE_ERROR_RATE", "0.001"))
+
+    # Database: SQLite file by default, PostgreSQL in production (postgresql://...)
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./marketing_data.db")
+
+    # Dataset store: where validated uploads are persisted (Parquet, one folder per dataset)
+    DATASET_DIR: str = os.getenv("DATASET_DIR", "./data/datasets")
     
     # CORS Settings
     BACKEND_CORS_ORIGINS: list = [
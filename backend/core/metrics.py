@@ -0,0 +1,273 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+# Minimal Prometheus instrumentation (text exposition format 0.0.4).
+# Recording is a lock + an add; nothing is formatted until /metrics is scraped,
+# and callback metrics (e.g. queue depth) are only read at scrape time.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds: from sub-millisecond handlers to multi-minute uploads and LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, **labels: str):
+        """Child for one combination of label values (created on first use)."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+class Counter(_Metric):
+    """Monotonic total, e.g. requests served or tokens sent."""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> Iterator[str]:
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+class _GaugeChild(_CounterChild):
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in progress."""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot: above the highest bound
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Histogram(_Metric):
+    """Distribution of observed values (latencies in seconds) over fixed buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self) -> Iterator[str]:
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+class CallbackMetric(_Metric):
+    """
+    Value read from the application when scraped (no bookkeeping on the hot path).
+    `read` returns a number, or a {label value tuple: number} dict for labelled metrics.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str,
+                 read: Callable[[], Union[float, Dict[Tuple[str, ...], float]]], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.read = read
+
+    def _samples(self) -> Iterator[str]:
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+class Registry:
+    """Set of metrics rendered together by /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in list(self._metrics.values())) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+def callback(name: str, documentation: str, kind: str, read: Callable, labelnames: Sequence[str] = ()) -> CallbackMetric:
+    return REGISTRY.register(CallbackMetric(name, documentation, kind, read, labelnames))
+
+# --- APPLICATION METRICS ---
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests served.", ["method", "route", "status"])
+HTTP_LATENCY = histogram("http_request_duration_seconds", "Time to produce the full HTTP response.", ["method", "route"])
+HTTP_IN_PROGRESS = gauge("http_requests_in_progress", "HTTP requests being served.")
+
+CSV_STAGE_LATENCY = histogram(
+    "csv_pipeline_stage_seconds",
+    "Time per upload spent in each pipeline stage (read = parse + column normalization).",
+    ["stage"]
+)
+CSV_ROWS = counter("csv_rows_total", "Uploaded rows by validation outcome.", ["outcome"])
+
+WEBHOOK_FLUSH_LATENCY = histogram("webhook_flush_seconds", "Duration of one lead batch write to the database.")
+
+AI_MODEL_DISCOVERY_LATENCY = histogram("ai_model_discovery_seconds", "Time to list and pick an LLM model.", ["provider"])
+AI_LLM_LATENCY = histogram("ai_llm_call_seconds", "Duration of LLM calls (whole answer).", ["provider", "mode"])
+AI_TOKENS = counter("ai_tokens_total", "Estimated LLM tokens sent (in) and received (out).", ["provider", "direction"])
+AI_CACHE_REQUESTS = counter("ai_cache_requests_total", "AI report lookups by cache outcome.", ["result"])
+
+QUERY_CACHE_REQUESTS = counter("query_cache_requests_total", "Dataset analytics lookups by cache outcome.", ["endpoint", "result"])
+
+_DONE = object()
+
+class StageTimer:
+    """
+    Accumulates per-stage durations across chunks and records them once per
+    request, so one upload adds one observation per stage (not one per chunk).
+    """
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.totals: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+
+    def timed(self, name: str, iterator: Iterator) -> Iterator:
+        """Wraps an iterator so the time spent producing each item counts toward `name`."""
+        iterator = iter(iterator)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def observe(self) -> None:
+        for name, seconds in self.totals.items():
+            self.histogram.labels(stage=name).observe(seconds)
+
+def route_label(scope) -> str:
+    """Path template of the matched route (bounded cardinality); raw paths are never used."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,167 @@
+import time
+import zlib
+from typing import Set
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:  # Optional: responses fall back to gzip
+    brotli = None
+
+# Bodies at least this large are compressed in a worker thread, off the event loop
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+class GzipRequestMiddleware:
+    """
+    Transparently accepts request bodies sent with `Content-Encoding: gzip`
+    (e.g. compressed CSV uploads). The body is inflated chunk by chunk as the
+    endpoint reads it, so it is never held compressed + decompressed in memory.
+    `max_size` caps the inflated size (protection against gzip bombs, HTTP 413).
+    Other encodings are refused with HTTP 415, corrupt gzip data with HTTP 400.
+    Errors are raised as HTTPException from `receive`, so the app's exception
+    handling turns them into responses wherever the body is read.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = Headers(scope=scope).get("content-encoding", "identity").strip().lower()
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+        if encoding not in ("gzip", "x-gzip"):
+            response = PlainTextResponse(f"Unsupported Content-Encoding: {encoding}", status_code=415)
+            await response(scope, receive, send)
+            return
+
+        # The endpoint sees a plain body: drop the encoding and the (compressed) length
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        inflated = 0
+
+        async def inflating_receive() -> Message:
+            nonlocal inflated
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            more_body = message.get("more_body", False)
+            try:
+                # Bounded output: a tiny bomb chunk cannot inflate past the limit in one call
+                body = decompressor.decompress(message.get("body", b""), self.max_size - inflated + 1)
+                if not more_body:
+                    body += decompressor.flush()
+            except zlib.error as e:
+                raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+            inflated += len(body)
+            if inflated > self.max_size:
+                raise HTTPException(status_code=413, detail=f"Decompressed body exceeds {self.max_size} bytes.")
+            return {"type": "http.request", "body": body, "more_body": more_body}
+
+        await self.app(scope, inflating_receive, send)
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Codings listed in an Accept-Encoding header, minus the ones with q=0."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+class BrotliResponder(IdentityResponder):
+    """Starlette compression responder producing `Content-Encoding: br`."""
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        return data + (self.compressor.flush() if more_body else self.compressor.finish())
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Negotiated response compression: brotli when the client accepts `br` and the
+    optional `brotli` package is installed, otherwise gzip. Bodies smaller than
+    `minimum_size` and event streams (SSE) are sent uncompressed.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, gzip_level: int = 6, brotli_quality: int = 4):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=gzip_level,
+                         thread_minimum_size=THREAD_MINIMUM_SIZE)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
+
+class TimingMiddleware:
+    """
+    Records every HTTP request on /metrics: count by method, route template and
+    status, latency histogram (until the last body chunk is sent) and requests
+    in progress. Add it innermost, so the route matched by the router is visible
+    in the scope; exceptions escaping the app are counted as 500.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def recording_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        metrics.HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            metrics.HTTP_IN_PROGRESS.dec()
+            route = metrics.route_label(scope)
+            metrics.HTTP_LATENCY.labels(method=scope["method"], route=route).observe(time.perf_counter() - start)
+            metrics.HTTP_REQUESTS.labels(method=scope["method"], route=route, status=status).inc()
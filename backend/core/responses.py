@@ -0,0 +1,40 @@
+import json
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import pyarrow as pa
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Binary columnar alternative to JSON, requested with `Accept: application/vnd.apache.arrow.stream`
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def wants_arrow(request: Request) -> bool:
+    return ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "")
+
+class EncodedJSONResponse(Response):
+    """
+    A JSON body encoded once (e.g. a cached result) and sent as is: FastAPI
+    neither validates it against the endpoint's response_model nor encodes it again.
+    """
+    media_type = "application/json"
+
+class ArrowResponse(Response):
+    """
+    A DataFrame as an Arrow IPC stream. Clients decode it straight into columns
+    (pyarrow.ipc.open_stream(...).read_pandas()) without building a dict per row.
+    `metadata` values are stored JSON-encoded in the schema metadata.
+    """
+    media_type = ARROW_STREAM_MEDIA_TYPE
+
+    def __init__(self, frame: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None, **kwargs):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if metadata:
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                **{key: json.dumps(value, default=str) for key, value in metadata.items()},
+            })
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        super().__init__(content=sink.getvalue().to_pybytes(), **kwargs)
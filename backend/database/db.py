@@ -1,12 +1,15 @@
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.orm import declarative_base, sessionmaker
+from ..core.config import settings
 
 # --- DATABASE CONFIGURATION ---
 # By default, we use SQLite (a local file) for development.
 # In production, this would be changed to a PostgreSQL URL (e.g., Supabase/AWS).
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./marketing_data.db")
+DATABASE_URL = settings.DATABASE_URL
+
+# Some hosts (Heroku, Supabase) still hand out the legacy "postgres://" scheme
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 # Create the database engine
 # connect_args={"check_same_thread": False} is only needed for SQLite
@@ -21,6 +24,12 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for our database models (tables)
 Base = declarative_base()
 
+# --- SCHEMA SETUP ---
+# Creates the tables on startup (no-op when they already exist)
+def init_db():
+    from . import models  # noqa: F401 (registers the tables on Base)
+    Base.metadata.create_all(bind=engine)
+
 # --- DEPENDENCY (Dependency Injection) ---
 # This function is used in endpoints to get a secure database session
 def get_db():
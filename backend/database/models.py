@@ -0,0 +1,71 @@
+from sqlalchemy import JSON, Column, Date, DateTime, Float, Index, Integer, String
+from .db import Base
+
+# --- TABLES ---
+
+class CampaignFact(Base):
+    """
+    One validated row of an uploaded dataset (the raw grain).
+    """
+    __tablename__ = "campaign_facts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dataset_id = Column(String(64), nullable=False)
+    date = Column(Date, nullable=False)
+    channel = Column(String(255), nullable=False)
+    campaign_name = Column(String(255), nullable=False)
+    spend = Column(Float, nullable=False)
+    revenue = Column(Float, nullable=False)
+    clicks = Column(Integer, nullable=False)
+    conversions = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_campaign_facts_grain", "dataset_id", "date", "channel", "campaign_name"),
+    )
+
+class CampaignRollup(Base):
+    """
+    Materialized totals at date x channel x campaign_name grain, per dataset.
+    Updated incrementally on ingest, so queries never scan the facts table.
+    """
+    __tablename__ = "campaign_rollups"
+
+    dataset_id = Column(String(64), primary_key=True)
+    date = Column(Date, primary_key=True)
+    channel = Column(String(255), primary_key=True)
+    campaign_name = Column(String(255), primary_key=True)
+    spend = Column(Float, nullable=False, default=0.0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    clicks = Column(Integer, nullable=False, default=0)
+    conversions = Column(Integer, nullable=False, default=0)
+    row_count = Column(Integer, nullable=False, default=0)
+
+class IngestedDataset(Base):
+    """
+    Marks a dataset as loaded into the facts and rollups. Inserted in the same
+    transaction as its rows, so only one loader of a dataset ever commits
+    (rollups are incremented, a second load would double them).
+    """
+    __tablename__ = "ingested_datasets"
+
+    dataset_id = Column(String(64), primary_key=True)
+    ingested_at = Column(DateTime, nullable=False)
+
+class Lead(Base):
+    """
+    A lead received through the webhooks (n8n, Make, Zapier).
+    Written in batches by the write-behind buffer.
+    `fingerprint` (normalized email + campaign + source) is unique: it is the
+    exact duplicate check behind the in-memory Bloom filter.
+    """
+    __tablename__ = "leads"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String(255), nullable=False)
+    campaign_id = Column(String(255), nullable=True, index=True)
+    lead_email = Column(String(320), nullable=False)
+    timestamp = Column(DateTime, nullable=True)
+    received_at = Column(DateTime, nullable=False)
+    lead_metadata = Column("metadata", JSON, nullable=False, default=dict)
+    fingerprint = Column(String(32), nullable=False, unique=True)
+    idempotency_key = Column(String(255), nullable=True, index=True)
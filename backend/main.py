@@ -1,22 +1,44 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-import os
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 
 # --- IMPORTANT: We are NOW importing ALL 3 ROUTERS ---
-from .routers import data_analytics, recommendations, integrations
+from .routers import data_analytics, recommendations, integrations, attribution
 # --------------------------------------------------
+from .core import metrics
+from .core.config import settings
+from .core.middleware import CompressionMiddleware, GzipRequestMiddleware, TimingMiddleware
+from .database.db import init_db
+from .services.lead_buffer import lead_buffer, lead_deduplicator, load_recent_keys
+from .services.attribution import lead_attribution, load_lead_counts
+from .services.parallel_aggregation import shutdown_pool
 
-# Load environment variables
-load_dotenv()
+# --- LIFECYCLE ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: make sure the tables exist and start the webhook write-behind flusher
+    init_db()
+    lead_attribution.recompute(load_lead_counts())  # Live CPA counters start from the stored leads
+    lead_deduplicator.warm(load_recent_keys(settings.DEDUPE_WINDOW_SECONDS))  # Duplicate filter too
+    await lead_buffer.start()
+    yield
+    # Shutdown: flush every queued lead before the worker exits
+    await lead_buffer.stop()
+    shutdown_pool()
 
 # Initialize FastAPI App
 app = FastAPI(
     title="AI Marketing Optimizer API",
     version="1.1.0", # Subimos versión por la nueva feature
-    description="Backend API for marketing data analysis, AI optimization, and Webhook Integrations."
+    description="Backend API for marketing data analysis, AI optimization, and Webhook Integrations.",
+    lifespan=lifespan
 )
 
+# --- REQUEST TIMING ---
+# Added first so it is the innermost middleware and sees the matched route
+if settings.METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
 # --- CORS CONFIGURATION ---
 origins = [
     "http://localhost:8501",
@@ -32,6 +54,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Accept gzip-compressed request bodies (large CSV uploads from the frontend client)
+app.add_middleware(GzipRequestMiddleware, max_size=settings.REQUEST_MAX_DECOMPRESSED_BYTES)
+
+# Compress large responses (brotli or gzip, negotiated via Accept-Encoding; SSE is left alone)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+    gzip_level=settings.RESPONSE_GZIP_LEVEL,
+    brotli_quality=settings.RESPONSE_BROTLI_QUALITY
+)
+
 # --- REGISTER ROUTERS ---
 
 # 1. Core Analytics
@@ -43,6 +76,9 @@ app.include_router(recommendations.router)
 # 3. External Integrations (Webhook para n8n/Make)
 app.include_router(integrations.router)
 
+# 4. Lead -> Spend Attribution (live CPA)
+app.include_router(attribution.router)
+
 # ---------------------------------------------------------------
 
 # --- ROOT ENDPOINT ---
@@ -52,6 +88,13 @@ def health_check():
     return {
         "status": "online",
         "system": "AI Marketing Optimizer",
-        "modules": ["Analytics", "AI Agent", "Integrations"],
-        "environment": os.getenv("ENV", "development")
-    }
\ No newline at end of file
+        "modules": ["Analytics", "AI Agent", "Integrations", "Attribution"],
+        "environment": settings.ENV
+    }
+
+# --- PROMETHEUS METRICS ---
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["General"])
+    def prometheus_metrics():
+        """Latency histograms and counters in the Prometheus text format (scrape target)."""
+        return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
-from datetime import date
+from typing import Any, List, Literal, Optional, Dict
+from datetime import date, datetime
 
 # --- INPUTS (What's included in the CSV) ---
 
@@ -36,7 +36,143 @@ class MetricResult(BaseModel):
     conversion_rate: float
     recommendation_status: str  # Example: "Good", "Warning", "Critical"
 
+class ValidationReport(BaseModel):
+    """Row-level validation outcome of an upload"""
+    total_rows: int = 0
+    invalid_rows: int = 0
+    failing_rows: List[int] = []  # 1-based data row numbers (header excluded), capped
+    errors_by_field: Dict[str, int] = {}
+
 class AnalysisResponse(BaseModel):
     """The complete final API response"""
     summary: List[MetricResult]
-    global_roas: float
\ No newline at end of file
+    global_roas: float
+    validation: Optional[ValidationReport] = None
+    dataset_id: Optional[str] = None  # Set when the upload was persisted
+
+# --- DATASETS (Persisted uploads) ---
+
+class DatasetInfo(BaseModel):
+    """Metadata of a stored dataset, including its precomputed summary"""
+    dataset_id: str
+    version: int = 1
+    created_at: datetime
+    updated_at: datetime
+    row_count: int
+    channels: List[str]
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    partitions: List[str] = []
+    content_hash: Optional[str] = None  # Hash of the uploaded rows, until the first append changes them
+    summary: AnalysisResponse
+
+class AppendResponse(BaseModel):
+    """What an append changed in a stored dataset"""
+    dataset_id: str
+    version: int  # Bumped by every append
+    row_count: int  # Rows in the dataset after the append
+    rows_added: int
+    rows_replaced: int  # Stored rows whose date x channel x campaign_name was in the upload
+    keys_inserted: int  # New date x channel x campaign_name combinations
+    keys_updated: int  # Combinations whose rows were replaced
+    partitions_rewritten: List[str]
+    validation: Optional[ValidationReport] = None
+    summary: AnalysisResponse  # Summary of the whole dataset after the append
+
+class DatasetQuery(BaseModel):
+    """Filters and grouping applied to a stored dataset"""
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    channels: Optional[List[str]] = None
+    campaigns: Optional[List[str]] = None
+    group_by: List[Literal["date", "channel", "campaign_name"]] = Field(default=["channel"], min_length=1)
+
+class QueryResponse(BaseModel):
+    """Aggregated rows returned by a dataset query"""
+    dataset_id: str
+    version: int
+    group_by: List[str]
+    rows: List[Dict[str, Any]]
+
+class CubeQuery(BaseModel):
+    """Arbitrary roll-up / drill-down over a stored dataset, answered from its aggregation cube"""
+    dimensions: List[Literal["channel", "campaign_name", "date"]] = ["channel"]  # Empty = grand total
+    date_grain: Literal["day", "week", "month", "quarter"] = "day"  # Used when "date" is a dimension
+    metrics: List[Literal["spend", "revenue", "clicks", "conversions", "roas", "cpa", "conversion_rate", "rows"]] = \
+        Field(default=["spend", "revenue", "roas"], min_length=1)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    channels: Optional[List[str]] = None
+    campaigns: Optional[List[str]] = None
+    sort_by: Optional[str] = None  # A dimension or metric; defaults to the dimensions in order
+    descending: bool = False
+    limit: Optional[int] = Field(default=None, ge=1)
+
+    @field_validator("dimensions", "metrics")
+    @classmethod
+    def _unique(cls, values: List[str]) -> List[str]:
+        return list(dict.fromkeys(values))
+
+class AggregateResponse(BaseModel):
+    """Result of a CubeQuery"""
+    dataset_id: str
+    version: int
+    dimensions: List[str]
+    date_grain: Optional[str] = None
+    metrics: List[str]
+    cuboid: str  # Pre-aggregated group-by set the answer was read from
+    cells_scanned: int
+    rows_total: int  # Before `limit`
+    rows: List[Dict[str, Any]]
+
+class TimeSeries(BaseModel):
+    """One chart line: a metric per time bucket for one channel (columnar, to keep payloads small)"""
+    channel: str
+    dates: List[date]
+    values: List[float]
+    points_total: int  # Buckets before downsampling
+
+class TimeSeriesResponse(BaseModel):
+    """Bucketed (and optionally downsampled) time series of a stored dataset"""
+    dataset_id: str
+    version: int
+    metric: Literal["revenue", "spend", "roas"]
+    bucket: Literal["day", "week", "month"]
+    series: List[TimeSeries]
+
+class AttributedCampaign(BaseModel):
+    """Spend of one campaign joined with the webhook leads it received"""
+    campaign_name: str
+    channels: List[str]
+    spend: float
+    revenue: float
+    leads: int
+    cpa: Optional[float] = None  # None until the first lead arrives
+
+class AttributionReport(BaseModel):
+    """Live CPA per campaign for a stored dataset"""
+    dataset_id: str
+    total_spend: float
+    attributed_spend: float
+    attributed_leads: int
+    unattributed_leads: int
+    attributed_cpa: Optional[float] = None
+    campaigns: List[AttributedCampaign]
+
+class WindowVelocity(BaseModel):
+    """Leads in one window: sliding count, rate and count since the aligned window start"""
+    count: int
+    per_minute: float
+    tumbling_count: int
+
+class VelocityGroup(BaseModel):
+    key: str
+    windows: Dict[str, WindowVelocity]
+
+class LeadVelocity(BaseModel):
+    """Live lead velocity, overall and per source or campaign"""
+    as_of: str
+    events_total: int
+    total: Dict[str, WindowVelocity]
+    dimension: str
+    groups: List[VelocityGroup]
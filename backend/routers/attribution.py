@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from ..core.config import settings
+from ..database.db import get_db
+from ..models.schemas import AttributionReport
+from ..services import attribution, dataset_store, rollups
+from ..services.attribution import lead_attribution
+from ..services.lead_buffer import lead_buffer
+
+# Joins webhook leads (ExternalLead.campaign_id) to uploaded spend (campaign_name)
+router = APIRouter(prefix="/attribution", tags=["Attribution"])
+
+@router.get("/datasets/{dataset_id}", response_model=AttributionReport)
+def dataset_attribution(
+    dataset_id: str,
+    campaign: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Live CPA per campaign: the dataset's spend divided by the leads received
+    so far for that campaign (matched case-insensitively on campaign_id = campaign_name).
+    """
+    # 1. Resolve the dataset
+    try:
+        info = dataset_store.get_store().get(dataset_id)
+    except dataset_store.DatasetNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found.")
+
+    # 2. Spend side of the join (built once per dataset version, then kept in memory)
+    def load_spend():
+        rollups.ensure_ingested(db, dataset_store.get_store(), info, settings.CSV_CHUNK_SIZE)
+        return attribution.campaign_spend(db, info.dataset_id)
+
+    index = lead_attribution.index(info.dataset_id, info.version, load_spend)
+
+    # 3. Probe with the live lead counts
+    return {"dataset_id": info.dataset_id, **lead_attribution.report(index, campaign=campaign, limit=limit)}
+
+@router.post("/recompute")
+async def recompute_attribution():
+    """
+    Batch mode for backfills: flushes queued leads, recounts leads per campaign
+    in the database and replaces the live counters.
+    """
+    await lead_buffer.flush()
+    counts = await run_in_threadpool(attribution.load_lead_counts)
+    lead_attribution.recompute(counts)
+    return lead_attribution.stats()
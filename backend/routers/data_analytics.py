@@ -1,61 +1,378 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends, Request
+from sqlalchemy.orm import Session
+from datetime import date
+import json
 import pandas as pd
-import numpy as np
-import io
-from typing import List
-from ..services import metrics_engine
-from ..models.schemas import CampaignRecord, AnalysisResponse
+from typing import Any, Dict, Iterator, List, Literal, Optional
+from ..core import metrics
+from ..core.config import settings
+from ..core.responses import ArrowResponse, EncodedJSONResponse, wants_arrow
+from ..database.db import get_db
+from ..services import metrics_engine, ingestion, dataset_store, rollups, timeseries
+from ..services.cube import cube_cache, cuboid_name
+from ..services.query_cache import query_cache
+from ..models.schemas import (
+    AggregateResponse, AnalysisResponse, AppendResponse, CubeQuery, DatasetInfo, DatasetQuery, QueryResponse,
+    TimeSeriesResponse, ValidationReport
+)
 
 # Create the router instance
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+# --- UPLOADS ---
+
+def _validated_frames(file: UploadFile, chunk_size: int, timer: metrics.StageTimer,
+                      report: ingestion.ValidationReportBuilder) -> Iterator[pd.DataFrame]:
+    """Valid rows of the upload, one typed frame per chunk; invalid rows go to `report`."""
+    # 1-2. Detect the format and stream the upload chunk by chunk
+    # (columns are normalized and checked on the way)
+    for chunk in timer.timed("read", ingestion.read_upload_chunks(file.file, chunk_size)):
+        # 3. Validate the whole chunk at once; invalid rows are recorded, not fatal
+        with timer.stage("validate"):
+            result = ingestion.validate_frame(chunk)
+            report.add(result)
+        yield result.frame
+
+def _checked_report(report: ingestion.ValidationReportBuilder, on_invalid: str) -> ValidationReport:
+    """
+    Final validation report. HTTP 400 with the report if rows are invalid and the
+    mode is 'reject', or if no valid row is left (nothing to analyze or store).
+    """
+    validation = report.build()
+    valid_rows = validation.total_rows - validation.invalid_rows
+    metrics.CSV_ROWS.labels(outcome="valid").inc(valid_rows)
+    metrics.CSV_ROWS.labels(outcome="invalid").inc(validation.invalid_rows)
+    if validation.invalid_rows and on_invalid == "reject":
+        message = f"Data validation error: {validation.invalid_rows} invalid row(s)."
+    elif valid_rows == 0:
+        message = "Data validation error: the file has no valid rows."
+    else:
+        return validation
+    raise HTTPException(status_code=400, detail={"message": message, "report": validation.model_dump()})
+
+@router.post("/upload", response_model=AnalysisResponse)
 @router.post("/upload-csv", response_model=AnalysisResponse)
-async def analyze_csv_file(file: UploadFile = File(...)):
+def analyze_csv_file(
+    file: UploadFile = File(...),
+    chunk_size: int = Query(
+        settings.CSV_CHUNK_SIZE, gt=0,
+        description="Rows parsed and validated per chunk. Bounds peak memory per request."
+    ),
+    on_invalid: Literal["reject", "skip"] = Query(
+        "reject",
+        description="'reject' fails the upload if any row is invalid; 'skip' drops invalid rows and analyzes the rest."
+    ),
+    persist: bool = Query(True, description="Store the validated rows as a dataset that can be queried by ID."),
+    db: Session = Depends(get_db)
+):
     """
-    Endpoint to upload a CSV file.
-    It validates the structure and returns calculated performance metrics.
+    Endpoint to upload campaign data: CSV (plain, gzip or zstd), Parquet or
+    Arrow IPC / Feather, detected from the file's magic bytes. Columnar files
+    skip text parsing; every format goes through the same validation.
+    The file is streamed in bounded chunks: each chunk is normalized, validated
+    column by column and folded into running per-channel totals, so memory stays
+    flat regardless of file size. The response includes a validation report and,
+    when persisted, the dataset ID to query later without re-uploading.
+    Declared as a sync function so FastAPI runs the parsing in its threadpool
+    instead of blocking the event loop.
     """
-    # 1. Validate File Extension
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Invalid file type. Only CSV files are accepted.")
-    
+    writer = dataset_store.get_store().writer() if persist else None
+    # Time per stage, summed over the chunks and exported once per upload on /metrics
+    timer = metrics.StageTimer(metrics.CSV_STAGE_LATENCY)
+    accumulator = metrics_engine.PerformanceAccumulator()
     try:
-        # 2. Read file content into a Pandas DataFrame
-        contents = await file.read()
-        df = pd.read_csv(io.BytesIO(contents))
-        
-        # 3. Data Cleaning: Normalize column names
-        # Example: "  Revenue " -> "revenue"
-        df.columns = [c.lower().strip().replace(' ', '_') for c in df.columns]
-        
-        # 4. Validate Required Columns
-        required_columns = {'date', 'channel', 'spend', 'revenue', 'clicks', 'conversions'}
-        if not required_columns.issubset(df.columns):
-            missing = required_columns - set(df.columns)
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required columns in CSV: {missing}"
-            )
-
-        # 5. Handle missing values (NaN)
-        # Pydantic does not like NaN, so we convert them to None or 0
-        df = df.replace({np.nan: None})
-        
-        # 6. Convert DataFrame to List of Dictionaries
-        records_dicts = df.to_dict(orient='records')
-        
-        # 7. Validate Data Types using Pydantic
-        # This loop checks every row against the CampaignRecord schema
-        try:
-            validated_data = [CampaignRecord(**record) for record in records_dicts]
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=f"Data validation error: {str(e)}")
-        
-        # 8. Calculate Metrics using the Service Layer
-        results = metrics_engine.calculate_performance(validated_data)
-        
-        return results
+        report = ingestion.ValidationReportBuilder(settings.VALIDATION_MAX_REPORTED_ROWS)
+
+        # 1-3. Stream, normalize and validate the upload chunk by chunk
+        for frame in _validated_frames(file, chunk_size, timer, report):
+            # 4. Hand the typed frame straight to the engine (and the dataset store)
+            with timer.stage("compute"):
+                accumulator.add(frame)
+            if writer:
+                with timer.stage("store"):
+                    writer.write(frame)
+
+        validation = _checked_report(report, on_invalid)
 
+        # 5. Calculate Metrics from the accumulated totals
+        with timer.stage("compute"):
+            response = accumulator.result()
+        response.validation = validation
+
+        # 6. Register the dataset (or reuse the one holding the same rows) and update the rollup tables
+        if writer:
+            with timer.stage("store"):
+                info = writer.commit(response)
+            writer = None
+            with timer.stage("rollups"):
+                rollups.ensure_ingested(db, dataset_store.get_store(), info, chunk_size)
+            response.dataset_id = info.dataset_id
+        return response
+
+    except HTTPException:
+        raise
+    except ingestion.IngestionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Catch-all for unexpected errors
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    finally:
+        timer.observe()
+        accumulator.close()
+        if writer:
+            writer.abort()
+
+# --- STORED DATASETS ---
+
+def _get_dataset(dataset_id: str) -> DatasetInfo:
+    try:
+        return dataset_store.get_store().get(dataset_id)
+    except dataset_store.DatasetNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found.")
+
+@router.get("/datasets", response_model=List[DatasetInfo])
+def list_datasets():
+    """Lists stored datasets, most recently updated first."""
+    return dataset_store.get_store().list()
+
+@router.get("/datasets/{dataset_id}", response_model=DatasetInfo)
+def get_dataset(dataset_id: str):
+    """Returns the metadata and precomputed summary of a stored dataset."""
+    return _get_dataset(dataset_id)
+
+@router.post("/datasets/{dataset_id}/append", response_model=AppendResponse)
+def append_to_dataset(
+    dataset_id: str,
+    file: UploadFile = File(...),
+    chunk_size: int = Query(settings.CSV_CHUNK_SIZE, gt=0, description="Rows parsed and validated per chunk."),
+    on_invalid: Literal["reject", "skip"] = Query("reject"),
+    db: Session = Depends(get_db)
+):
+    """
+    Incremental refresh of a stored dataset (e.g. yesterday's export, overlapping
+    the previous week). Rows are upserted by date x channel x campaign_name: the
+    uploaded rows replace every stored row with the same key, other keys are added.
+    Only the month partitions the upload touches are rewritten, and only the
+    affected facts and rollups are replaced, so a daily refresh costs the size
+    of the upload, not of the history. The dataset keeps its ID; its version is
+    bumped, which invalidates everything cached per version (results, cube,
+    attribution). Accepts the same formats as /upload.
+    """
+    store = dataset_store.get_store()
+    info = _get_dataset(dataset_id)
+    writer = store.writer()
+    merge = None
+    timer = metrics.StageTimer(metrics.CSV_STAGE_LATENCY)
+    try:
+        report = ingestion.ValidationReportBuilder(settings.VALIDATION_MAX_REPORTED_ROWS)
+
+        # 1-4. Validate the upload and stage its rows by month partition
+        for frame in _validated_frames(file, chunk_size, timer, report):
+            with timer.stage("store"):
+                writer.write(frame)
+        validation = _checked_report(report, on_invalid)
+
+        with store.lock(info.dataset_id):
+            # Re-read under the lock: a concurrent append may have bumped the version
+            info = _get_dataset(dataset_id)
+            # Facts and rollups must hold the current version before a delta is applied
+            with timer.stage("rollups"):
+                rollups.ensure_ingested(db, store, info, chunk_size)
+
+            # 5. Merge into the touched partitions (written to the next version's folder, live files untouched)
+            with timer.stage("store"):
+                merge = store.merge(info, writer).prepare()
+
+            # 6. Replace the facts and rollups of the uploaded keys, in one transaction
+            with timer.stage("rollups"):
+                rollups.replace_keys(db, info.dataset_id, merge.keys, merge.new_rows(chunk_size))
+
+            # 7. Summary of the whole dataset from the per-channel rollups, then switch to the new version
+            with timer.stage("compute"):
+                summary = metrics_engine.summarize_totals(rollups.channel_totals(db, info.dataset_id))
+            with timer.stage("store"):
+                info = merge.commit(summary)
+
+        # 8. Results of the previous versions can no longer be served: free them now
+        query_cache.invalidate(info.dataset_id)
+        cube_cache.invalidate(info.dataset_id)
+
+        response = AppendResponse(
+            dataset_id=info.dataset_id,
+            version=info.version,
+            row_count=info.row_count,
+            rows_added=merge.rows_added,
+            rows_replaced=merge.rows_replaced,
+            keys_inserted=merge.keys_inserted,
+            keys_updated=merge.keys_updated,
+            partitions_rewritten=merge.partitions,
+            validation=validation,
+            summary=info.summary
+        )
+        merge = writer = None
+        return response
+
+    except HTTPException:
+        raise
+    except ingestion.IngestionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    finally:
+        timer.observe()
+        if merge:
+            merge.abort()
+        elif writer:
+            writer.abort()
+
+def _rows_frame(rows: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Cached JSON rows back as a frame for Arrow (dates are cached as ISO strings)."""
+    frame = pd.DataFrame(rows, columns=columns)
+    if 'date' in frame.columns:
+        frame['date'] = pd.to_datetime(frame['date']).dt.date
+    return frame
+
+@router.post("/datasets/{dataset_id}/query", response_model=QueryResponse)
+def query_dataset(dataset_id: str, query: DatasetQuery, request: Request, db: Session = Depends(get_db)):
+    """
+    Runs a filtered aggregation against a stored dataset.
+    Answered from the pre-aggregated rollup table, never from the raw rows.
+    Example: group_by=["date", "channel"] returns the daily trend per channel.
+    Send `Accept: application/vnd.apache.arrow.stream` to get the rows as an Arrow IPC stream.
+    Results are cached per dataset version, encoded: repeated dashboard loads skip
+    the database and the JSON serialization.
+    """
+    info = _get_dataset(dataset_id)
+
+    def run_query():
+        rollups.ensure_ingested(db, dataset_store.get_store(), info, settings.CSV_CHUNK_SIZE)
+        rows = rollups.query_rollups(db, info.dataset_id, query)
+        return QueryResponse(
+            dataset_id=info.dataset_id,
+            version=info.version,
+            group_by=query.group_by,
+            rows=rows.to_dict(orient='records')
+        ).model_dump_json()
+
+    body = query_cache.get_or_compute(info, "query", query.model_dump(mode="json"), run_query)
+
+    if wants_arrow(request):
+        return ArrowResponse(_rows_frame(json.loads(body)["rows"]),
+                             metadata={"dataset_id": info.dataset_id, "version": info.version, "group_by": query.group_by})
+    return EncodedJSONResponse(body)
+
+@router.post("/datasets/{dataset_id}/aggregate", response_model=AggregateResponse)
+def aggregate_dataset(dataset_id: str, query: CubeQuery, request: Request, db: Session = Depends(get_db)):
+    """
+    Roll-up / drill-down over any combination of channel, campaign_name and
+    date (day, week, month or quarter), with filters and derived metrics.
+    Answered from the dataset's aggregation cube: every group-by combination is
+    pre-aggregated once per dataset version, and each query reads the smallest
+    one that covers it. Example: dimensions=["channel", "date"], date_grain="quarter".
+    Send `Accept: application/vnd.apache.arrow.stream` to get the rows as an Arrow IPC stream.
+    """
+    # 1. Resolve the dataset and validate the sort column
+    info = _get_dataset(dataset_id)
+    if query.sort_by is not None and query.sort_by not in query.dimensions + query.metrics:
+        raise HTTPException(status_code=422, detail="sort_by must be one of the requested dimensions or metrics.")
+    date_grain = query.date_grain if "date" in query.dimensions else None
+
+    def run_query():
+        # 2. Cube of this dataset version (built from the rollups on first use)
+        def load_cells():
+            rollups.ensure_ingested(db, dataset_store.get_store(), info, settings.CSV_CHUNK_SIZE)
+            return rollups.rollup_cells(db, info.dataset_id)
+
+        cube = cube_cache.get(info.dataset_id, info.version, load_cells)
+
+        # 3. Read the smallest covering cuboid, then sort and cut
+        rows, cuboid, cells = cube.query(
+            query.dimensions, query.date_grain, query.metrics, start_date=query.start_date,
+            end_date=query.end_date, channels=query.channels, campaigns=query.campaigns
+        )
+        rows_total = len(rows)
+        if query.sort_by is not None:
+            rows = rows.sort_values(query.sort_by, ascending=not query.descending, kind="stable")
+        if query.limit is not None:
+            rows = rows.head(query.limit)
+
+        return AggregateResponse(
+            dataset_id=info.dataset_id,
+            version=info.version,
+            dimensions=query.dimensions,
+            date_grain=date_grain,
+            metrics=query.metrics,
+            cuboid=cuboid_name(cuboid),
+            cells_scanned=cells,
+            rows_total=rows_total,
+            rows=rows.to_dict(orient='records')
+        ).model_dump_json()
+
+    # 4. Same query on the same dataset version: served from the result cache, already encoded
+    params = query.model_dump(mode="json", exclude={"date_grain"} if date_grain is None else None)
+    body = query_cache.get_or_compute(info, "aggregate", params, run_query)
+
+    if wants_arrow(request):
+        result = json.loads(body)
+        columns = [d for d in ("channel", "campaign_name", "date") if d in query.dimensions] + query.metrics
+        metadata = {key: result[key] for key in ("dataset_id", "version", "cuboid", "cells_scanned", "rows_total", "date_grain")}
+        return ArrowResponse(_rows_frame(result["rows"], columns), metadata=metadata)
+    return EncodedJSONResponse(body)
+
+@router.get("/cube/stats")
+def cube_stats():
+    """Memory, hit/miss and build counters of the per-dataset aggregation cubes."""
+    return cube_cache.stats()
+
+@router.get("/cache/stats")
+def query_cache_stats():
+    """Hit ratio, bytes and evictions of the analytics result cache (memory and shared disk tiers)."""
+    return query_cache.stats()
+
+@router.get("/datasets/{dataset_id}/timeseries", response_model=TimeSeriesResponse)
+def dataset_timeseries(
+    dataset_id: str,
+    request: Request,
+    metric: Literal["revenue", "spend", "roas"] = "revenue",
+    bucket: Literal["day", "week", "month"] = "day",
+    channels: Optional[List[str]] = Query(default=None),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    max_points: Optional[int] = Query(default=None, ge=3, le=100000, description="Per-series point budget (LTTB downsampling)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Chart-ready time series: one line per channel with the metric summed per
+    day/week/month (ROAS is revenue/spend of each bucket). With `max_points`,
+    each line is downsampled with LTTB so the client only receives what it draws.
+    With `Accept: application/vnd.apache.arrow.stream` the points come back as one
+    long (channel, date, value) Arrow table; points_total per channel is in the schema metadata.
+    """
+    info = _get_dataset(dataset_id)
+
+    def run_query():
+        rollups.ensure_ingested(db, dataset_store.get_store(), info, settings.CSV_CHUNK_SIZE)
+        query = DatasetQuery(start_date=start_date, end_date=end_date, channels=channels, group_by=["date", "channel"])
+        daily = rollups.daily_totals(db, info.dataset_id, query)
+        return TimeSeriesResponse(
+            dataset_id=info.dataset_id,
+            version=info.version,
+            metric=metric,
+            bucket=bucket,
+            series=timeseries.build_series(daily, metric, bucket, max_points)
+        ).model_dump_json()
+
+    params = {"metric": metric, "bucket": bucket, "channels": channels, "start_date": start_date,
+              "end_date": end_date, "max_points": max_points}
+    body = query_cache.get_or_compute(info, "timeseries", params, run_query)
+
+    if wants_arrow(request):
+        series = json.loads(body)["series"]
+        points = _rows_frame([
+            {"channel": s["channel"], "date": d, "value": v}
+            for s in series for d, v in zip(s["dates"], s["values"])
+        ], columns=["channel", "date", "value"])
+        metadata = {"dataset_id": info.dataset_id, "version": info.version, "metric": metric, "bucket": bucket,
+                    "points_total": {s["channel"]: s["points_total"] for s in series}}
+        return ArrowResponse(points, metadata=metadata)
+    return EncodedJSONResponse(body)
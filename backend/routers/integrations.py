@@ -1,52 +1,234 @@
-from fastapi import APIRouter, HTTPException, Request
-from pydantic import BaseModel, EmailStr
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from typing import Optional, Dict, Any, List, Literal, Tuple
 from datetime import datetime
+import json
+import logging
+from ..core.config import settings
+from ..models.schemas import LeadVelocity
+from ..services.dedupe import lead_fingerprint, record_keys
+from ..services.lead_buffer import lead_buffer, lead_deduplicator, BufferFullError
+from ..services.lead_stream import lead_stream
+from ..services.attribution import lead_attribution
+
+logger = logging.getLogger(__name__)
 
 # Prefix to group all integrations
 router = APIRouter(prefix="/integrations", tags=["Integrations & Webhooks"])
 
+# Max validation errors echoed back by the bulk endpoint
+MAX_REPORTED_ERRORS = 50
+
 # --- DATA MODEL (Validation) ---
-# This ensures n8n sends us clean data
+# This ensures n8n sends us clean data (and nothing the leads table would refuse)
 class ExternalLead(BaseModel):
-    source: str  # Ex: "Facebook Ads", "Typeform", "Shopify"
-    campaign_id: Optional[str] = None
-    lead_email: EmailStr
+    source: str = Field(max_length=255)  # Ex: "Facebook Ads", "Typeform", "Shopify"
+    campaign_id: Optional[str] = Field(default=None, max_length=255)
+    lead_email: EmailStr  # At most 254 characters
     timestamp: Optional[datetime] = None
     metadata: Dict[str, Any] = {} # For flexible extra data
 
+def _to_record(lead: ExternalLead, received_at: datetime, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """Row for the leads table (timestamp defaults to the reception time)."""
+    record = lead.model_dump()
+    record["timestamp"] = lead.timestamp or received_at
+    record["received_at"] = received_at
+    record["fingerprint"] = lead_fingerprint(lead.lead_email, lead.campaign_id, lead.source)
+    record["idempotency_key"] = idempotency_key
+    return record
+
+def _uncount(records: List[Dict[str, Any]]) -> None:
+    """Takes leads the flush found already stored off the live counters they were added to on acceptance."""
+    for record in records:
+        lead_stream.record(record["source"], record["campaign_id"], ts=record["received_at"].timestamp(), n=-1)
+        lead_attribution.record_lead(record["campaign_id"], n=-1)
+
+# Leads older than the Bloom window pass the duplicate check but are dropped by the
+# database on write: the counters are corrected then
+lead_buffer.on_dropped = _uncount
+
+def _enqueue(records: List[Dict[str, Any]]) -> None:
+    """Hands records to the write-behind buffer, translating a full queue into HTTP 429."""
+    try:
+        lead_buffer.offer(records)
+    except BufferFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
 # --- WEBHOOK ENDPOINT ---
 @router.post("/webhook/ingest-data")
-async def ingest_external_data(lead: ExternalLead):
+async def ingest_external_data(lead: ExternalLead, idempotency_key: Optional[str] = Header(default=None, max_length=255)):
     """
     Receives real-time data from automation tools (n8n, Make, Zapier).
+    The lead is queued and written to the database in batches (write-behind).
+    Retries are safe: a lead already received (same email, campaign and source,
+    or same Idempotency-Key header) is acknowledged as a duplicate and not stored again.
     """
-    try:
-        # Assign timestamp if not provided
-        if not lead.timestamp:
-            lead.timestamp = datetime.now()
-
-        # 1. Simulate Processing (Here would go the DB save)
-        print(f"🔔 NEW LEAD RECEIVED from {lead.source}: {lead.lead_email}")
-        
-        # 2. "Trigger" Logic (Automation Logic)
-        # This demonstrates the "Systems Thinking" part of the offer
-        response_action = "Data Logged"
-        
-        # Example: If the lead comes from a VIP campaign, mark priority
-        if lead.metadata.get("is_vip") == True:
-            print("🚀 VIP ALERT: Notifying sales team...")
-            response_action += " + Priority Alert Sent"
+    # Assign timestamp if not provided
+    if not lead.timestamp:
+        lead.timestamp = datetime.now()
 
+    # 1. Drop duplicates (retries, double-fired automations)
+    record = _to_record(lead, datetime.now(), idempotency_key)
+    (duplicate,) = await lead_deduplicator.check([record_keys(record)])
+    if duplicate:
         return {
-            "status": "success",
-            "message": "Webhook processed successfully",
-            "action_taken": response_action,
+            "status": "duplicate",
+            "message": "Lead already received",
+            "action_taken": "Ignored",
             "data_received": {
                 "source": lead.source,
                 "email": lead.lead_email
             }
         }
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Webhook Error: {str(e)}")
\ No newline at end of file
+    # 2. Queue for the batched DB write (429 if the queue is full)
+    _enqueue([record])
+    lead_stream.record(lead.source, lead.campaign_id)
+    lead_attribution.record_lead(lead.campaign_id)
+    logger.debug("New lead from %s: %s", lead.source, lead.lead_email)
+
+    # 3. "Trigger" Logic (Automation Logic)
+    # This demonstrates the "Systems Thinking" part of the offer
+    response_action = "Data Queued"
+
+    # Example: If the lead comes from a VIP campaign, mark priority
+    if lead.metadata.get("is_vip") == True:
+        logger.info("🚀 VIP ALERT: Notifying sales team (%s)", lead.lead_email)
+        response_action += " + Priority Alert Sent"
+
+    return {
+        "status": "success",
+        "message": "Webhook processed successfully",
+        "action_taken": response_action,
+        "data_received": {
+            "source": lead.source,
+            "email": lead.lead_email
+        }
+    }
+
+# --- BULK WEBHOOK ENDPOINT ---
+
+async def _iter_ndjson_lines(request: Request):
+    """Yields (line_number, line) from a streamed NDJSON body without buffering it whole."""
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line
+    if buffer:
+        yield line_number + 1, buffer
+
+async def _parse_bulk(request: Request) -> Tuple[List[ExternalLead], List[Dict[str, Any]], int]:
+    """
+    Parses a JSON array or an NDJSON stream into leads.
+    Invalid items are counted and reported (by 1-based position, capped)
+    instead of failing the batch. Returns (leads, errors, rejected_count).
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    leads, errors = [], []
+    rejected = 0
+
+    def add_error(position: int, message: str):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"item": position, "error": message})
+
+    def check_size(count: int):
+        if count > settings.WEBHOOK_MAX_BULK_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Too many items (max {settings.WEBHOOK_MAX_BULK_ITEMS}).")
+
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/ndjson"):
+        count = 0
+        async for line_number, line in _iter_ndjson_lines(request):
+            if not line.strip():
+                continue
+            count += 1
+            check_size(count)
+            try:
+                leads.append(ExternalLead.model_validate_json(line))
+            except ValidationError as e:
+                add_error(line_number, e.errors()[0]["msg"])
+        return leads, errors, rejected
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON (Content-Type: application/x-ndjson).")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of leads.")
+    check_size(len(items))
+
+    for position, item in enumerate(items, start=1):
+        try:
+            leads.append(ExternalLead.model_validate(item))
+        except ValidationError as e:
+            add_error(position, e.errors()[0]["msg"])
+    return leads, errors, rejected
+
+@router.post("/webhook/ingest-bulk")
+async def ingest_external_data_bulk(request: Request, idempotency_key: Optional[str] = Header(default=None, max_length=255)):
+    """
+    Bulk variant for campaign launches: accepts a JSON array of leads or an
+    NDJSON stream (one lead per line, Content-Type: application/x-ndjson).
+    Valid leads are queued for batched DB writes; invalid ones are reported.
+    Duplicate leads are skipped and counted; a replayed Idempotency-Key
+    skips the whole request.
+    Returns 429 (with Retry-After) when the write-behind queue is full.
+    """
+    leads, errors, rejected = await _parse_bulk(request)
+
+    # 1. One duplicate check for the whole request (a replayed Idempotency-Key) and every
+    # lead (its content fingerprint): nothing is awaited between it and queueing the new leads
+    received_at = datetime.now()
+    records = [_to_record(lead, received_at, idempotency_key) for lead in leads]
+    candidates = [record_keys(r)[:1] for r in records]
+    if idempotency_key:
+        candidates.insert(0, [f"idem:{idempotency_key}"])
+    flags = await lead_deduplicator.check(candidates)
+    if idempotency_key:
+        replayed, *flags = flags
+        if replayed:
+            return {"status": "duplicate", "accepted": 0, "duplicates": len(leads), "rejected": rejected,
+                    "errors": errors, "priority_alerts": 0}
+
+    # 2. Queue the new leads
+    fresh = [(lead, record) for lead, record, duplicate in zip(leads, records, flags) if not duplicate]
+    _enqueue([record for _, record in fresh])
+    for lead, _ in fresh:
+        lead_stream.record(lead.source, lead.campaign_id)
+        lead_attribution.record_lead(lead.campaign_id)
+
+    vip_count = sum(1 for lead, _ in fresh if lead.metadata.get("is_vip") == True)
+    if vip_count:
+        logger.info("🚀 VIP ALERT: %d priority leads in bulk batch", vip_count)
+
+    return {
+        "status": "success",
+        "accepted": len(fresh),
+        "duplicates": len(records) - len(fresh),
+        "rejected": rejected,
+        "errors": errors,
+        "priority_alerts": vip_count
+    }
+
+@router.get("/webhook/stats")
+def webhook_stats():
+    """Write-behind queue depth and flush counters, plus duplicate-filter metrics."""
+    return {**lead_buffer.stats(), "dedupe": lead_deduplicator.stats()}
+
+@router.get("/leads/velocity", response_model=LeadVelocity)
+def lead_velocity(
+    dimension: Literal["source", "campaign_id"] = "source",
+    key: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=1000)
+):
+    """
+    Live lead velocity over the last 5 minutes, 1 hour and 24 hours
+    (sliding counts, leads per minute and the current aligned window),
+    overall and per source or campaign_id. Reads in-memory counters only.
+    """
+    return lead_stream.velocity(dimension=dimension, key=key, limit=limit)
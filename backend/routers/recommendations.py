@@ -1,27 +1,90 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any
-from ..services import ai_agent
+import json
+from contextlib import aclosing
+from typing import Dict, Any, Optional
+from ..services import ai_agent, dataset_store
 
 # Create the router with the prefix "/ai"
 router = APIRouter(prefix="/ai", tags=["AI Agent"])
 
 # Define the expected Data Structure for the request
 class AIRequest(BaseModel):
-    summary_data: Dict[str, Any] # This receives the JSON summary from the Frontend
+    summary_data: Optional[Dict[str, Any]] = None # JSON summary sent by the Frontend...
+    dataset_id: Optional[str] = None              # ...or the ID of a stored dataset
+
+def _resolve_summary(request: AIRequest) -> Dict[str, Any]:
+    """Loads the stored summary when a dataset ID is given, so clients don't ship data around."""
+    if request.dataset_id:
+        try:
+            info = dataset_store.get_store().get(request.dataset_id)
+        except dataset_store.DatasetNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Dataset '{request.dataset_id}' not found.")
+        return info.summary.model_dump(mode="json", include={"summary", "global_roas"})
+    if request.summary_data is None:
+        raise HTTPException(status_code=400, detail="Provide either 'dataset_id' or 'summary_data'.")
+    return request.summary_data
 
 @router.post("/generate-insights")
 async def ask_ai_agent(request: AIRequest):
     """
     Endpoint that receives marketing metrics and calls the Google Gemini Agent.
     Returns strategic recommendations in text format.
+    The LLM call runs on a bounded worker pool, so other requests keep being served meanwhile.
     """
+    summary_data = _resolve_summary(request)
     try:
-        # Call the Service Layer (The brain)
-        insights = ai_agent.generate_marketing_insights(request.summary_data)
-        
-        # Return the response wrapped in a JSON
-        return {"response": insights}
+        # Call the Service Layer (The brain) without blocking the event loop
+        insights, prompt_stats = await ai_agent.agenerate_marketing_insights_with_stats(summary_data)
+
+        # Return the response wrapped in a JSON (with prompt size stats for tuning)
+        return {"response": insights, "prompt_stats": prompt_stats}
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/prompt-preview")
+def preview_prompt(request: AIRequest):
+    """
+    Returns the exact prompt that would be sent to the model, with compaction
+    stats (original vs compacted tokens, ratio, rows kept). No LLM call is made.
+    """
+    prompt, stats = ai_agent.build_prompt_with_stats(_resolve_summary(request))
+    return {"prompt": prompt, "prompt_stats": stats}
+
+@router.get("/cache/stats")
+def ai_cache_stats():
+    """Hit/miss counters of the AI response cache (memory and disk tiers) and request coalescing."""
+    return ai_agent.insight_cache_stats()
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Formats one Server-Sent Event (JSON payload, so newlines in tokens are safe)."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@router.post("/generate-insights/stream")
+async def stream_ai_agent(request: AIRequest):
+    """
+    Streaming variant of /generate-insights (Server-Sent Events).
+    Each `data:` event carries {"token": "..."} as soon as the model produces it;
+    a final `event: done` closes the stream. Identical concurrent requests share
+    one model call, which stops if every client disconnects.
+    """
+    summary_data = _resolve_summary(request)
+
+    async def event_stream():
+        try:
+            # aclosing: a disconnect closes the token stream right away (not when collected)
+            async with aclosing(ai_agent.astream_marketing_insights(summary_data)) as tokens:
+                async for token in tokens:
+                    yield _sse({"token": token})
+            yield _sse({}, event="done")
+        except Exception as e:
+            yield _sse({"detail": str(e)}, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,21 +1,25 @@
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-from typing import Dict, Any
+import asyncio
+import logging
+import queue
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, Optional, Tuple
+from ..core import metrics
+from ..core.config import settings
+from .cache import STREAM_DONE, DiskCache, LRUCache, SharedStream, SingleFlight, StreamFlight, TieredCache, content_key
+from . import prompt_compactor
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Configure Gemini API
-GENAI_KEY = os.getenv("GEMINI_API_KEY")
-if not GENAI_KEY:
-    print("⚠️ WARNING: GEMINI_API_KEY not found in .env")
-
-# Model Configuration
-try:
-    genai.configure(api_key=GENAI_KEY)
-except Exception as e:
-    print(f"⚠️ Error configuring Gemini: {e}")
+def _genai():
+    """
+    The Gemini SDK, imported on first use: it takes longer to import than the
+    rest of the API, and processes using another provider never need it.
+    """
+    import google.generativeai as genai
+    return genai
 
 def get_available_model():
     """
@@ -23,13 +27,13 @@ def get_available_model():
     """
     try:
         # List all models available to this API Key
-        models = list(genai.list_models())
+        models = list(_genai().list_models())
         
         # Filter for models that support text generation ('generateContent')
         # We prefer 'gemini-1.5-flash' or 'gemini-pro'
         generative_models = [m.name for m in models if 'generateContent' in m.supported_generation_methods]
         
-        print(f"🔍 Available Models for this Key: {generative_models}")
+        logger.info("🔍 Available Models for this Key: %s", generative_models)
         
         # Priority list
         priorities = ['models/gemini-1.5-flash', 'models/gemini-1.5-pro', 'models/gemini-pro']
@@ -47,18 +51,188 @@ def get_available_model():
         return 'gemini-1.5-flash' # Default blind hope
         
     except Exception as e:
-        print(f"⚠️ Error listing models: {e}")
+        logger.warning("⚠️ Error listing models: %s", e)
         return 'gemini-1.5-flash'
 
-def generate_marketing_insights(data_summary: Dict[str, Any]) -> str:
+# --- PROVIDER CLIENT LAYER ---
+# One long-lived client per process: model discovery and SDK handles are
+# reused across requests instead of being rebuilt for every report.
+
+class LLMProvider:
     """
-    Receives a metrics summary (JSON) and generates strategic recommendations.
+    Interface of an LLM backend. Implementations must be thread-safe:
+    they are shared by every request and called from the AI worker pool.
     """
-    try:
-        # 1. Prepare the Prompt
-        summary_text = str(data_summary)
-        
-        prompt = f"""
+    name = "base"
+
+    def model_name(self) -> str:
+        raise NotImplementedError
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # Default: no native streaming, emit the whole answer at once
+        yield self.generate(prompt)
+
+class GeminiProvider(LLMProvider):
+    """
+    Google Gemini. The model is discovered once (list_models) and refreshed
+    only after `model_ttl` seconds; GenerativeModel handles are kept alive.
+    """
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str], model_ttl: float):
+        if not api_key:
+            logger.warning("⚠️ GEMINI_API_KEY not found in .env")
+        try:
+            _genai().configure(api_key=api_key)
+        except Exception as e:
+            logger.warning("⚠️ Error configuring Gemini: %s", e)
+
+        self.model_ttl = model_ttl
+        self._lock = threading.Lock()
+        self._model_name: Optional[str] = None
+        self._resolved_at = 0.0
+        self._models: Dict[str, Any] = {}
+
+    def model_name(self) -> str:
+        if self._model_name is None or time.monotonic() - self._resolved_at > self.model_ttl:
+            with self._lock:
+                # Re-check: another thread may have refreshed while we waited
+                if self._model_name is None or time.monotonic() - self._resolved_at > self.model_ttl:
+                    with metrics.AI_MODEL_DISCOVERY_LATENCY.labels(provider=self.name).time():
+                        self._model_name = get_available_model()
+                    self._resolved_at = time.monotonic()
+        return self._model_name
+
+    def _model(self):
+        name = self.model_name()
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.setdefault(name, _genai().GenerativeModel(name))
+        return model
+
+    def generate(self, prompt: str) -> str:
+        response = self._model().generate_content(prompt)
+        if response and hasattr(response, 'text'):
+            return response.text
+        return "Error: The model returned an empty response."
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self._model().generate_content(prompt, stream=True):
+            text = getattr(chunk, 'text', '')
+            if text:
+                yield text
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI Chat Completions, with one pooled client for the whole process."""
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], model: str):
+        from openai import OpenAI
+        self._client = OpenAI(api_key=api_key)
+        self._model_name = model
+
+    def model_name(self) -> str:
+        return self._model_name
+
+    def generate(self, prompt: str) -> str:
+        response = self._client.chat.completions.create(
+            model=self._model_name,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content or "Error: The model returned an empty response."
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        response = self._client.chat.completions.create(
+            model=self._model_name,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic offline provider for tests and benchmarks: the same prompt
+    always yields the same report, after an optional simulated latency.
+    """
+    name = "stub"
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+
+    def model_name(self) -> str:
+        return "stub-1"
+
+    def generate(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        tokens = [
+            "## Stub Report\n",
+            f"- Prompt fingerprint: `{digest}`\n",
+            f"- Prompt size: {len(prompt)} characters\n",
+            "- Recommendation: shift budget from the lowest-ROAS channel to the highest-ROAS channel.\n",
+        ]
+        for token in tokens:
+            if self.latency:
+                time.sleep(self.latency / len(tokens))
+            yield token
+
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+def create_provider(name: str) -> LLMProvider:
+    """Builds the provider named in AI_PROVIDER ("gemini", "openai" or "stub")."""
+    if name == "gemini":
+        return GeminiProvider(settings.GEMINI_API_KEY, settings.AI_MODEL_TTL_SECONDS)
+    if name == "openai":
+        return OpenAIProvider(settings.OPENAI_API_KEY, settings.OPENAI_MODEL)
+    if name == "stub":
+        return StubProvider(settings.AI_STUB_LATENCY_MS)
+    raise ValueError(f"Unknown AI provider: {name}")
+
+def get_provider() -> LLMProvider:
+    """Returns the process-wide provider, creating it on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider(settings.AI_PROVIDER)
+    return _provider
+
+def set_provider(provider: Optional[LLMProvider]) -> None:
+    """Replaces the process-wide provider (None = rebuild from settings on next use)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+# Bounded pool for the blocking LLM SDK calls (keeps them off the event loop)
+_executor = ThreadPoolExecutor(max_workers=settings.AI_MAX_CONCURRENCY, thread_name_prefix="ai-agent")
+
+# Bump whenever the prompt wording (or its compaction) changes, so cached reports are not reused
+PROMPT_TEMPLATE_VERSION = "v2"
+
+def build_prompt_with_stats(data_summary: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Builds the consultant prompt from a metrics summary.
+    The summary is compacted to AI_PROMPT_TOKEN_BUDGET tokens first (top/bottom
+    performers + long-tail aggregates), so prompt size stays bounded no matter
+    how many channels there are. Returns the prompt and the compaction stats.
+    """
+    compacted = prompt_compactor.compact_summary(
+        data_summary,
+        token_budget=settings.AI_PROMPT_TOKEN_BUDGET,
+        top_k=settings.AI_PROMPT_TOP_K
+    )
+    summary_text = compacted["text"]
+
+    prompt = f"""
         Act as a Senior Digital Marketing Consultant. Analyze the following campaign performance summary:
         
         DATA:
@@ -72,20 +246,222 @@ def generate_marketing_insights(data_summary: Dict[str, Any]) -> str:
         RESPONSE FORMAT:
         Use Markdown. Be direct, professional, and data-oriented. Do not use generic phrases.
         """
-        
-        # 2. Auto-select Model
-        model_name = get_available_model()
-        print(f"🤖 Using Model: {model_name}")
-        
-        model = genai.GenerativeModel(model_name)
-        
-        # Generate content
-        response = model.generate_content(prompt)
-        
-        if response and hasattr(response, 'text'):
-            return response.text
-        else:
-            return "Error: The model returned an empty response."
 
+    stats = {**compacted["stats"], "prompt_tokens": prompt_compactor.estimate_tokens(prompt)}
+    return prompt, stats
+
+def build_prompt(data_summary: Dict[str, Any]) -> str:
+    return build_prompt_with_stats(data_summary)[0]
+
+# --- RESPONSE CACHE ---
+# Reports are keyed by the normalized summary + prompt version + model, so
+# re-running the same analysis is served without a new (paid) LLM call.
+
+_insight_cache = TieredCache(
+    LRUCache(
+        max_entries=settings.AI_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.AI_CACHE_TTL_SECONDS
+    ),
+    DiskCache(
+        settings.AI_CACHE_DIR,
+        max_bytes=settings.AI_CACHE_DISK_MAX_BYTES,
+        ttl_seconds=settings.AI_CACHE_TTL_SECONDS
+    ) if settings.AI_CACHE_DIR else None
+)
+_insight_flights = SingleFlight()
+# Identical concurrent streams share one upstream stream
+_insight_streams = StreamFlight()
+
+def insight_cache_key(data_summary: Dict[str, Any], provider: LLMProvider) -> str:
+    return content_key(data_summary, PROMPT_TEMPLATE_VERSION, settings.AI_PROMPT_TOKEN_BUDGET,
+                       settings.AI_PROMPT_TOP_K, provider.name, provider.model_name())
+
+def insight_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters of both tiers plus single-flight coalescing."""
+    return {**_insight_cache.stats(), "single_flight": _insight_flights.stats(),
+            "stream_single_flight": _insight_streams.stats()}
+
+def clear_insight_cache() -> None:
+    _insight_cache.memory.clear()
+
+def _record_tokens(provider: LLMProvider, prompt_tokens: int, answer: str) -> None:
+    """Estimated tokens in/out of one LLM call (same estimator as the prompt budget)."""
+    metrics.AI_TOKENS.labels(provider=provider.name, direction="in").inc(prompt_tokens)
+    metrics.AI_TOKENS.labels(provider=provider.name, direction="out").inc(prompt_compactor.estimate_tokens(answer))
+
+def _generate_cached(data_summary: Dict[str, Any], prompt: str, stats: Dict[str, Any]) -> str:
+    """
+    Cache lookup, then one upstream call per key even under concurrency.
+    Raises on provider errors (errors are never cached).
+    """
+    provider = get_provider()
+    key = insight_cache_key(data_summary, provider)
+
+    cached = _insight_cache.get(key)
+    if cached is not None:
+        metrics.AI_CACHE_REQUESTS.labels(result="hit").inc()
+        return cached
+    metrics.AI_CACHE_REQUESTS.labels(result="miss").inc()
+
+    def call_llm() -> str:
+        # A request that finished while we were queued may have filled the cache
+        cached = _insight_cache.get(key)
+        if cached is not None:
+            return cached
+        logger.info("🤖 Using Model: %s/%s (prompt ~%d tokens, compaction ratio %s)",
+                    provider.name, provider.model_name(), stats["prompt_tokens"], stats["compaction_ratio"])
+        with metrics.AI_LLM_LATENCY.labels(provider=provider.name, mode="generate").time():
+            text = provider.generate(prompt)
+        _record_tokens(provider, stats["prompt_tokens"], text)
+        _insight_cache.set(key, text)
+        return text
+
+    return _insight_flights.do(key, call_llm)
+
+def _error_text(error: BaseException) -> str:
+    return f"AI Engine Error ({type(error).__name__}): {str(error)}"
+
+def generate_marketing_insights_with_stats(data_summary: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Receives a metrics summary (JSON) and generates strategic recommendations.
+    Identical summaries are answered from the response cache.
+    Returns the report and the stats of the prompt it was (or would be) generated from.
+    Blocking: call it from a worker thread (see agenerate_marketing_insights_with_stats).
+    """
+    prompt, stats = build_prompt_with_stats(data_summary)
+    try:
+        return _generate_cached(data_summary, prompt, stats), stats
+    except Exception as e:
+        return _error_text(e), stats
+
+def generate_marketing_insights(data_summary: Dict[str, Any]) -> str:
+    return generate_marketing_insights_with_stats(data_summary)[0]
+
+def _produce_stream(key: str, stream: SharedStream, provider: LLMProvider, data_summary: Dict[str, Any]) -> None:
+    """
+    Runs one upstream stream on the AI executor and publishes its chunks.
+    Stops (and closes the upstream response) as soon as every client has left;
+    the report is cached only when it completes.
+    """
+    try:
+        prompt, stats = build_prompt_with_stats(data_summary)
+        logger.info("🤖 Using Model (stream): %s/%s (prompt ~%d tokens, compaction ratio %s)",
+                    provider.name, provider.model_name(), stats["prompt_tokens"], stats["compaction_ratio"])
+        parts = []
+        started = time.perf_counter()
+        upstream = provider.stream(prompt)
+        try:
+            for text in upstream:
+                parts.append(text)
+                if not _insight_streams.publish(key, stream, text):
+                    return
+        finally:
+            close = getattr(upstream, "close", None)
+            if close is not None:
+                close()
+        metrics.AI_LLM_LATENCY.labels(provider=provider.name, mode="stream").observe(time.perf_counter() - started)
+        report = "".join(parts)
+        _record_tokens(provider, stats["prompt_tokens"], report)
+        _insight_cache.set(key, report)
+        _insight_streams.finish(key, stream)
+    except Exception as e:
+        _insight_streams.finish(key, stream, e)
+
+def _lookup(data_summary: Dict[str, Any]) -> Tuple[LLMProvider, str, Optional[str]]:
+    """
+    Provider, cache key and cached report (or None) of a summary.
+    Blocking (provider setup, model discovery, disk tier): run it off the event loop.
+    """
+    provider = get_provider()
+    key = insight_cache_key(data_summary, provider)
+    return provider, key, _insight_cache.get(key)
+
+def _subscribe(data_summary: Dict[str, Any], lookup: Tuple[LLMProvider, str, Optional[str]],
+               deliver: Callable[[Any], None]) -> Optional[SharedStream]:
+    """
+    Delivers a cached report in one piece (returns None), or listens to the
+    report's shared stream, starting it on the AI executor if it is not running.
+    Never blocks: `lookup` is the result of _lookup.
+    """
+    provider, key, cached = lookup
+    if cached is not None:
+        metrics.AI_CACHE_REQUESTS.labels(result="hit").inc()
+        deliver(cached)
+        deliver(STREAM_DONE)
+        return None
+    metrics.AI_CACHE_REQUESTS.labels(result="miss").inc()
+    return _insight_streams.subscribe(
+        key, deliver, lambda stream: _executor.submit(_produce_stream, key, stream, provider, data_summary)
+    )
+
+def stream_marketing_insights(data_summary: Dict[str, Any]) -> Iterator[str]:
+    """
+    Same as generate_marketing_insights, but yields the text as the model produces it.
+    A cached report is emitted in one piece; a fresh one is cached once complete.
+    Identical concurrent requests share one upstream stream.
+    Blocking iterator: consume it from a worker thread (or use astream_marketing_insights).
+    """
+    items: queue.Queue = queue.Queue()
+    stream = None
+    try:
+        stream = _subscribe(data_summary, _lookup(data_summary), items.put)
+        while True:
+            item = items.get()
+            if item is STREAM_DONE:
+                return
+            if isinstance(item, BaseException):
+                yield _error_text(item)
+                return
+            yield item
     except Exception as e:
-        return f"AI Engine Error ({type(e).__name__}): {str(e)}"
\ No newline at end of file
+        yield _error_text(e)
+    finally:
+        if stream is not None:
+            _insight_streams.unsubscribe(stream, items.put)
+
+async def agenerate_marketing_insights_with_stats(data_summary: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Async wrapper: runs the blocking LLM call on the bounded AI executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, generate_marketing_insights_with_stats, data_summary)
+
+async def agenerate_marketing_insights(data_summary: Dict[str, Any]) -> str:
+    return (await agenerate_marketing_insights_with_stats(data_summary))[0]
+
+async def astream_marketing_insights(data_summary: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Async variant of stream_marketing_insights. The shared upstream stream runs
+    on the AI executor and hands chunks to the event loop as they arrive; no
+    thread is held per client, and nothing blocking runs on the loop. Closing this generator (client disconnect)
+    unsubscribes, and the upstream call stops once no client is left.
+    """
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+
+    def deliver(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            pass  # Event loop closed: nobody to deliver to
+
+    stream = None
+    try:
+        try:
+            # Provider, key and cache lookup may block: resolve them on the AI executor
+            lookup = await loop.run_in_executor(_executor, _lookup, data_summary)
+            stream = _subscribe(data_summary, lookup, deliver)
+        except Exception as e:
+            yield _error_text(e)
+            return
+        while True:
+            item = await items.get()
+            if item is STREAM_DONE:
+                return
+            if isinstance(item, BaseException):
+                yield _error_text(item)
+                return
+            yield item
+    finally:
+        if stream is not None:
+            _insight_streams.unsubscribe(stream, deliver)
@@ -0,0 +1,172 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..database.db import SessionLocal
+from ..database.models import CampaignRollup, Lead
+
+# Spend indexes kept in memory (one per dataset version, least recently used evicted)
+MAX_SPEND_INDEXES = 8
+
+def campaign_key(value: Any) -> str:
+    """Join key between ExternalLead.campaign_id and CampaignRecord.campaign_name."""
+    return str(value or "").strip().lower()
+
+def campaign_spend(db: Session, dataset_id: str) -> pd.DataFrame:
+    """Spend, revenue and conversions per campaign and channel, read from the rollups."""
+    stmt = (
+        select(
+            CampaignRollup.campaign_name,
+            CampaignRollup.channel,
+            func.sum(CampaignRollup.spend),
+            func.sum(CampaignRollup.revenue),
+            func.sum(CampaignRollup.conversions),
+        )
+        .where(CampaignRollup.dataset_id == dataset_id)
+        .group_by(CampaignRollup.campaign_name, CampaignRollup.channel)
+    )
+    return pd.DataFrame(
+        db.execute(stmt).all(),
+        columns=['campaign_name', 'channel', 'spend', 'revenue', 'conversions']
+    )
+
+def load_lead_counts() -> Dict[str, int]:
+    """Batch side of the attribution: leads per campaign key, counted by the database."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(Lead.campaign_id, func.count()).group_by(Lead.campaign_id)).all()
+    finally:
+        db.close()
+    counts: Dict[str, int] = {}
+    for campaign_id, count in rows:
+        key = campaign_key(campaign_id)
+        counts[key] = counts.get(key, 0) + count
+    return counts
+
+class SpendIndex:
+    """
+    Build side of the hash join: campaign key -> spend aggregates of one dataset.
+    Also keeps the attributed totals, updated per lead.
+    """
+
+    def __init__(self, spend: pd.DataFrame, lead_counts: Dict[str, int]):
+        keyed = spend.assign(key=spend['campaign_name'].map(campaign_key))
+        grouped = keyed.groupby('key', sort=False).agg(
+            campaign_name=('campaign_name', 'first'),
+            channels=('channel', lambda c: sorted(set(c))),
+            spend=('spend', 'sum'),
+            revenue=('revenue', 'sum'),
+            conversions=('conversions', 'sum'),
+        )
+        self.campaigns: Dict[str, Dict[str, Any]] = grouped.to_dict(orient='index')
+        self.total_spend = float(grouped['spend'].sum())
+        self.recount(lead_counts)
+
+    def recount(self, lead_counts: Dict[str, int]) -> None:
+        """Recomputes the attributed totals from scratch (one probe per campaign key with leads)."""
+        self.attributed_leads = 0
+        self.attributed_spend = 0.0
+        self.unattributed_leads = 0
+        for key, count in lead_counts.items():
+            self.add_leads(key, count, previous=0)
+
+    def add_leads(self, key: str, n: int, previous: int) -> None:
+        entry = self.campaigns.get(key)
+        if entry is None:
+            self.unattributed_leads += n
+            return
+        if previous == 0 and n > 0:
+            self.attributed_spend += entry['spend']
+        elif previous > 0 and previous + n <= 0:
+            self.attributed_spend -= entry['spend']  # Its last lead was taken back
+        self.attributed_leads += n
+
+class LeadAttribution:
+    """
+    Live CPA per campaign: webhook lead counts joined to uploaded spend through
+    in-memory hash maps. Each lead is one dict increment plus one probe per loaded
+    dataset index; reports read the maps instead of re-joining the tables.
+    `recompute` replaces the counts from the database (startup, backfills).
+    """
+
+    def __init__(self, max_indexes: int = MAX_SPEND_INDEXES):
+        self.max_indexes = max_indexes
+        self.lead_counts: Dict[str, int] = {}
+        self._indexes: "OrderedDict[Tuple[str, int], SpendIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record_lead(self, campaign_id: Optional[str], n: int = 1) -> None:
+        key = campaign_key(campaign_id)
+        with self._lock:
+            previous = self.lead_counts.get(key, 0)
+            self.lead_counts[key] = previous + n
+            for index in self._indexes.values():
+                index.add_leads(key, n, previous)
+
+    def recompute(self, lead_counts: Dict[str, int]) -> None:
+        with self._lock:
+            self.lead_counts = dict(lead_counts)
+            for index in self._indexes.values():
+                index.recount(self.lead_counts)
+
+    def index(self, dataset_id: str, version: int, load_spend) -> SpendIndex:
+        """Spend index of a dataset version, built with `load_spend()` on first use."""
+        cache_key = (dataset_id, version)
+        with self._lock:
+            index = self._indexes.get(cache_key)
+            if index is not None:
+                self._indexes.move_to_end(cache_key)
+                return index
+
+        spend = load_spend()
+        with self._lock:
+            index = self._indexes[cache_key] = SpendIndex(spend, self.lead_counts)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+            return index
+
+    def report(self, index: SpendIndex, campaign: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """Per-campaign spend, leads and CPA (biggest spend first) plus attributed totals."""
+        with self._lock:
+            if campaign is not None:
+                key = campaign_key(campaign)
+                keys = [key] if key in index.campaigns else []
+            else:
+                keys = sorted(index.campaigns, key=lambda k: index.campaigns[k]['spend'], reverse=True)[:limit]
+
+            rows = []
+            for key in keys:
+                entry = index.campaigns[key]
+                leads = self.lead_counts.get(key, 0)
+                rows.append({
+                    'campaign_name': entry['campaign_name'],
+                    'channels': entry['channels'],
+                    'spend': round(float(entry['spend']), 2),
+                    'revenue': round(float(entry['revenue']), 2),
+                    'leads': leads,
+                    'cpa': round(float(entry['spend']) / leads, 2) if leads else None,
+                })
+
+            return {
+                'total_spend': round(index.total_spend, 2),
+                'attributed_spend': round(index.attributed_spend, 2),
+                'attributed_leads': index.attributed_leads,
+                'unattributed_leads': index.unattributed_leads,
+                'attributed_cpa': round(index.attributed_spend / index.attributed_leads, 2) if index.attributed_leads else None,
+                'campaigns': rows,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'campaign_keys': len(self.lead_counts),
+                'leads_total': sum(self.lead_counts.values()),
+                'spend_indexes': len(self._indexes),
+            }
+
+# Process-wide attribution state, fed by the webhook endpoints
+lead_attribution = LeadAttribution()
@@ -0,0 +1,401 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# --- KEYS ---
+
+def _normalize(value: Any, float_digits: int) -> Any:
+    """Canonical form of a JSON-like value: rounded floats, order-insensitive lists of records."""
+    if isinstance(value, float):
+        return round(value, float_digits)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v, float_digits) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(v, float_digits) for v in value]
+        if items and all(isinstance(v, dict) for v in items):
+            items.sort(key=lambda v: json.dumps(v, sort_keys=True))
+        return items
+    return value
+
+def content_key(*parts: Any, float_digits: int = 6) -> str:
+    """
+    SHA-256 of the canonical JSON of `parts`. Equivalent payloads (same data,
+    different key or record order, float noise) map to the same key.
+    """
+    canonical = json.dumps([_normalize(p, float_digits) for p in parts], sort_keys=True,
+                           separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+# --- IN-MEMORY TIER ---
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional TTL, entry-count bound and byte bound.
+    `sizeof` measures a value in bytes (only used when `max_bytes` is set).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None, sizeof: Callable[[Any], int] = len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at and expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return  # Would evict everything else; not worth caching
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, size, value)
+            self.current_bytes += size
+            self._evict()
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes every key matching `predicate`. Returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self.current_bytes -= size
+
+    def _evict(self) -> None:
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries)
+            or (self.max_bytes and self.current_bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+# --- ON-DISK TIER ---
+
+class DiskCache:
+    """
+    One JSON file per key under `directory`, with TTL and a total-size bound
+    (least recently used files are evicted first: hits refresh the file time).
+    Survives restarts and is shared by all workers on the same machine.
+    Writes keep a running byte total; the directory is only listed when that
+    total goes over budget (the listing also counts other workers' files).
+    Thread-safe.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = sum(size for _, size, _ in self._files())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._count("misses")
+            return None
+        if entry.get("expires_at") and entry["expires_at"] < time.time():
+            self._unlink(self._path(key))
+            self._count("misses")
+            return None
+        self._count("hits")
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass  # Evicted by another worker since it was read
+        return entry["value"]
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        path = self._path(key)
+        tmp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}")
+        with open(tmp_path, "w") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f)
+        size = os.path.getsize(tmp_path)
+        replaced = _file_size(path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.current_bytes += size - replaced
+            over_budget = self.current_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, name) of every cache file."""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        return files
+
+    def _evict(self) -> None:
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._unlink(os.path.join(self.directory, name), track=False)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.current_bytes = total
+            self.evictions += evicted
+
+    def delete_where(self, predicate: Callable[[str], bool]) -> int:
+        """Removes the files of every key matching `predicate`. Returns how many were removed."""
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") and predicate(name[:-len(".json")]):
+                self._unlink(os.path.join(self.directory, name))
+                removed += 1
+        return removed
+
+    def _unlink(self, path: str, track: bool = True) -> None:
+        size = _file_size(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        if track:
+            with self._lock:
+                self.current_bytes = max(0, self.current_bytes - size)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "bytes": self.current_bytes}
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+class TieredCache:
+    """Memory tier in front of an optional disk tier; disk hits are promoted to memory."""
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def delete_where(self, predicate: Callable[[str], bool]) -> int:
+        removed = self.memory.delete_where(predicate)
+        if self.disk is not None:
+            removed += self.disk.delete_where(predicate)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+# --- REQUEST COALESCING ---
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time: concurrent callers with the same
+    key wait for the in-flight call and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+        return future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"executions": self.executions, "coalesced": self.coalesced}
+
+# Last item delivered to a stream listener when the stream completed normally
+STREAM_DONE = object()
+
+class SharedStream:
+    """One upstream stream: the chunks produced so far and who is listening."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.listeners: List[Callable[[Any], None]] = []
+
+class StreamFlight:
+    """
+    Streaming counterpart of SingleFlight: at most one producer per key, its
+    chunks fanned out to every listener of that key. A listener joining late
+    first receives the chunks produced so far. Listeners get each chunk, then
+    STREAM_DONE or the producer's exception. `publish` returns False once
+    nobody listens anymore, so the producer can stop early.
+    Deliver callbacks are called under a lock: they must not block.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: Dict[Hashable, SharedStream] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def subscribe(self, key: Hashable, deliver: Callable[[Any], None],
+                  start: Callable[[SharedStream], None]) -> SharedStream:
+        """Listens to the stream of `key`, calling `start(stream)` to produce it if none is running."""
+        with self._lock:
+            stream = self._streams.get(key)
+            leader = stream is None
+            if leader:
+                stream = self._streams[key] = SharedStream()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+            for chunk in stream.chunks:
+                deliver(chunk)
+            stream.listeners.append(deliver)
+        if leader:
+            try:
+                start(stream)
+            except BaseException as e:
+                self.finish(key, stream, e)
+                raise
+        return stream
+
+    def unsubscribe(self, stream: SharedStream, deliver: Callable[[Any], None]) -> None:
+        with self._lock:
+            if deliver in stream.listeners:
+                stream.listeners.remove(deliver)
+
+    def _close(self, key: Hashable, stream: SharedStream) -> None:
+        if self._streams.get(key) is stream:
+            del self._streams[key]
+
+    def publish(self, key: Hashable, stream: SharedStream, chunk: Any) -> bool:
+        """Sends a chunk to every listener. False if none is left (the stream is then dropped)."""
+        with self._lock:
+            if not stream.listeners:
+                self._close(key, stream)
+                self.abandoned += 1
+                return False
+            stream.chunks.append(chunk)
+            for deliver in stream.listeners:
+                deliver(chunk)
+            return True
+
+    def finish(self, key: Hashable, stream: SharedStream, error: Optional[BaseException] = None) -> None:
+        """Ends the stream (with the producer's exception, if any); the next subscriber starts a new one."""
+        with self._lock:
+            self._close(key, stream)
+            for deliver in stream.listeners:
+                deliver(error if error is not None else STREAM_DONE)
+            stream.listeners.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"executions": self.executions, "coalesced": self.coalesced, "abandoned": self.abandoned}
@@ -0,0 +1,221 @@
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..core.config import settings
+from .cache import LRUCache, SingleFlight
+from .rollups import ROLLUP_MEASURES
+
+# Categorical dimensions of the cube (the date is handled through its grain)
+DIMENSIONS = ('channel', 'campaign_name')
+
+# Date grain -> pandas period (weeks start on Monday, as in the time series)
+DATE_GRAINS = {"day": "D", "week": "W-SUN", "month": "M", "quarter": "Q"}
+
+# Grains each grain can be rolled up into without going back to the days
+# (weeks straddle months and quarters, so only days roll up into weeks)
+ROLLS_UP_TO = {
+    "day": {"day", "week", "month", "quarter"},
+    "week": {"week"},
+    "month": {"month", "quarter"},
+    "quarter": {"quarter"},
+}
+
+# Metrics a query can ask for: the sums, and ratios derived after summing
+SUMMED_METRICS = {"spend": "spend", "revenue": "revenue", "clicks": "clicks",
+                  "conversions": "conversions", "rows": "row_count"}
+DERIVED_METRICS = ("roas", "cpa", "conversion_rate")
+
+# A cuboid is one group-by combination: (categorical dimensions, date grain or None)
+CuboidKey = Tuple[Tuple[str, ...], Optional[str]]
+
+def cuboid_name(key: CuboidKey) -> str:
+    dims, grain = key
+    parts = list(dims) + ([f"date:{grain}"] if grain else [])
+    return "+".join(parts) or "total"
+
+def truncate_dates(dates: pd.Series, grain: str) -> pd.Series:
+    """First day of the day/week/month/quarter each date falls in."""
+    if grain == "day":
+        return dates
+    return dates.dt.to_period(DATE_GRAINS[grain]).dt.start_time
+
+def _aligned(grain: str, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]) -> bool:
+    """True if the date filter only cuts at boundaries of `grain` (so whole cells are kept or dropped)."""
+    period = DATE_GRAINS[grain]
+    if start is not None and start.to_period(period).start_time != start:
+        return False
+    if end is not None and end.to_period(period).end_time.normalize() != end:
+        return False
+    return True
+
+def _derivable(parent: CuboidKey, child: CuboidKey) -> bool:
+    """True if `child` can be computed by summing the cells of `parent`."""
+    parent_dims, parent_grain = parent
+    dims, grain = child
+    if not set(dims) <= set(parent_dims):
+        return False
+    if grain is None:
+        return True
+    return parent_grain is not None and grain in ROLLS_UP_TO[parent_grain]
+
+def _all_cuboids() -> List[CuboidKey]:
+    """Every cuboid, finest first (a cuboid's parents always come before it)."""
+    grains = [*DATE_GRAINS, None]
+    subsets = [dims for size in range(len(DIMENSIONS), -1, -1) for dims in itertools.combinations(DIMENSIONS, size)]
+    return [(dims, grain) for grain in grains for dims in subsets]
+
+class AggregationCube:
+    """
+    All group-by combinations of one dataset version, precomputed from its
+    rollup cells (date x channel x campaign_name): every subset of
+    {channel, campaign_name} crossed with no date / day / week / month / quarter.
+    Each cuboid is summed from its smallest already-built parent, never from
+    the raw rows, and queries are answered from the smallest cuboid that holds
+    the requested dimensions and filters.
+    """
+
+    def __init__(self, cells: pd.DataFrame):
+        base = pd.DataFrame({
+            'date': pd.to_datetime(cells['date']),
+            'channel': cells['channel'].astype('category'),
+            'campaign_name': cells['campaign_name'].astype('category'),
+            **{m: cells[m].to_numpy(dtype='float64' if m in ('spend', 'revenue') else 'int64') for m in ROLLUP_MEASURES},
+        })
+        self.cuboids: Dict[CuboidKey, pd.DataFrame] = {}
+        for key in _all_cuboids():
+            self.cuboids[key] = self._build(key, base)
+        self.memory_bytes = int(sum(frame.memory_usage(deep=True).sum() for frame in self.cuboids.values()))
+
+    def _build(self, key: CuboidKey, base: pd.DataFrame) -> pd.DataFrame:
+        dims, grain = key
+        if key == (DIMENSIONS, "day"):
+            parent = base
+        else:
+            parents = [k for k in self.cuboids if _derivable(k, key)]
+            parent = min((self.cuboids[k] for k in parents), key=len)
+        return _group(parent, dims, grain)
+
+    def pick(self, dims: Sequence[str], grain: Optional[str], start: Optional[pd.Timestamp] = None,
+             end: Optional[pd.Timestamp] = None) -> CuboidKey:
+        """
+        Smallest cuboid that has `dims`, can be rolled up to `grain` and whose
+        cells fall entirely inside or outside the [start, end] date range.
+        """
+        if start is None and end is None:
+            grains = [grain]
+        else:
+            grains = [g for g in DATE_GRAINS if (grain is None or grain in ROLLS_UP_TO[g]) and _aligned(g, start, end)]
+        candidates = [
+            key for key in self.cuboids
+            if key[1] in grains and set(dims) <= set(key[0])
+        ]
+        return min(candidates, key=lambda k: (len(self.cuboids[k]), len(k[0])))
+
+    def query(self, dimensions: Sequence[str], date_grain: str = "day", metrics: Sequence[str] = ("spend", "revenue"),
+              start_date=None, end_date=None, channels: Optional[Sequence[str]] = None,
+              campaigns: Optional[Sequence[str]] = None) -> Tuple[pd.DataFrame, CuboidKey, int]:
+        """
+        Totals per `dimensions` (channel, campaign_name and/or date at `date_grain`)
+        over the filtered cells, with the requested metrics.
+        Returns the rows (sorted by dimension), the cuboid used and how many of its cells were read.
+        """
+        dims = [d for d in DIMENSIONS if d in dimensions]
+        grain = date_grain if 'date' in dimensions else None
+        filter_dims = [d for d, values in (('channel', channels), ('campaign_name', campaigns)) if values]
+        start = pd.Timestamp(start_date) if start_date else None
+        end = pd.Timestamp(end_date) if end_date else None
+
+        key = self.pick(set(dims) | set(filter_dims), grain, start, end)
+        frame = self.cuboids[key]
+        cells = len(frame)
+
+        mask = np.ones(len(frame), dtype=bool)
+        if start is not None:
+            mask &= (frame['date'] >= start).to_numpy()
+        if end is not None:
+            mask &= (frame['date'] <= end).to_numpy()
+        if channels:
+            mask &= frame['channel'].isin(channels).to_numpy()
+        if campaigns:
+            mask &= frame['campaign_name'].isin(campaigns).to_numpy()
+        if not mask.all():
+            frame = frame[mask]
+
+        totals = _group(frame, dims, grain)
+        return _with_metrics(totals, dims + (['date'] if grain else []), metrics), key, cells
+
+def _group(frame: pd.DataFrame, dims: Sequence[str], grain: Optional[str]) -> pd.DataFrame:
+    """Sums the measures of `frame` per `dims` (and per date truncated to `grain`)."""
+    keys = list(dims)
+    if grain:
+        frame = frame.assign(date=truncate_dates(frame['date'], grain))
+        keys.append('date')
+    if not keys:
+        return pd.DataFrame({m: [frame[m].sum()] for m in ROLLUP_MEASURES})
+    return frame.groupby(keys, observed=True, sort=True)[ROLLUP_MEASURES].sum().reset_index()
+
+def _with_metrics(totals: pd.DataFrame, keys: List[str], metrics: Sequence[str]) -> pd.DataFrame:
+    """Dimension columns (plain strings and dates) followed by the requested metrics, rounded."""
+    spend = totals['spend'].to_numpy(dtype='float64')
+    revenue = totals['revenue'].to_numpy(dtype='float64')
+    clicks = totals['clicks'].to_numpy(dtype='float64')
+    conversions = totals['conversions'].to_numpy(dtype='float64')
+
+    # Ratios of the sums (not sums of ratios); 0 when the denominator is 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        derived = {
+            "roas": np.where(spend > 0, revenue / spend, 0.0),
+            "cpa": np.where(conversions > 0, spend / conversions, 0.0),
+            "conversion_rate": np.where(clicks > 0, conversions / clicks * 100, 0.0),
+        }
+
+    columns: Dict[str, Any] = {}
+    for key in keys:
+        columns[key] = totals[key].dt.date.to_numpy() if key == 'date' else totals[key].astype(str).to_numpy()
+    for metric in metrics:
+        if metric in derived:
+            columns[metric] = np.round(derived[metric], 2)
+        elif metric in ('spend', 'revenue'):
+            columns[metric] = np.round(totals[metric].to_numpy(dtype='float64'), 2)
+        else:
+            columns[metric] = totals[SUMMED_METRICS[metric]].to_numpy(dtype='int64')
+    return pd.DataFrame(columns)
+
+# --- CUBES PER DATASET VERSION ---
+
+class CubeCache:
+    """
+    Cubes kept in memory per (dataset_id, version), least recently used evicted
+    beyond `max_bytes`. Concurrent first queries on a version build it once.
+    A new version of a dataset gets a new cube; the old one ages out.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.cubes = LRUCache(max_bytes=max_bytes, sizeof=lambda cube: cube.memory_bytes)
+        self.flights = SingleFlight()
+
+    def get(self, dataset_id: str, version: int, load_cells: Callable[[], pd.DataFrame]) -> AggregationCube:
+        """Cube of a dataset version, built from `load_cells()` on first use."""
+        key = (dataset_id, version)
+        cube = self.cubes.get(key)
+        if cube is not None:
+            return cube
+
+        def build() -> AggregationCube:
+            cube = AggregationCube(load_cells())
+            self.cubes.set(key, cube)
+            return cube
+
+        return self.flights.do(key, build)
+
+    def invalidate(self, dataset_id: str) -> int:
+        """Drops the cubes of every version of a dataset."""
+        return self.cubes.delete_where(lambda key: key[0] == dataset_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cubes.stats(), "builds": self.flights.stats()}
+
+cube_cache = CubeCache(settings.CUBE_CACHE_MAX_BYTES)
@@ -0,0 +1,391 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ..core.config import settings
+from ..models.schemas import AnalysisResponse, DatasetInfo, DatasetQuery
+
+# Canonical on-disk layout of a validated dataset
+SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('channel', pa.string()),
+    ('campaign_name', pa.string()),
+    ('spend', pa.float64()),
+    ('revenue', pa.float64()),
+    ('clicks', pa.int64()),
+    ('conversions', pa.int64()),
+])
+
+META_FILE = "meta.json"
+# Content hash of an upload -> ID of the dataset stored from it (hidden from list())
+UPLOAD_INDEX = ".uploads"
+COMPRESSION = "zstd"
+
+# Upsert key of appended rows: new rows replace every stored row with the same key
+MERGE_KEY = ['date', 'channel', 'campaign_name']
+
+class DatasetNotFoundError(KeyError):
+    """Raised when a dataset ID does not exist in the store."""
+
+def _partition_key(dates: pd.Series) -> pd.Series:
+    """Month partition name for each row, e.g. 'part-2024-01.parquet'."""
+    return "part-" + dates.dt.strftime("%Y-%m") + ".parquet"
+
+def _row_digests(frame: pd.DataFrame) -> bytes:
+    """
+    Per-row content hashes of a validated frame, independent of chunking,
+    column order in the source file and datetime resolution.
+    """
+    canonical = pd.DataFrame({
+        'date': frame['date'].to_numpy().astype('datetime64[D]').astype('int64'),
+        'channel': frame['channel'],
+        'campaign_name': frame['campaign_name'],
+        'spend': frame['spend'],
+        'revenue': frame['revenue'],
+        'clicks': frame['clicks'],
+        'conversions': frame['conversions'],
+    })
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy().tobytes()
+
+def _version_dir(version: int) -> str:
+    return f"v{version}"
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hard-links an unchanged partition into a new version (copies it where links are not supported)."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+class DatasetWriter:
+    """
+    Streams validated chunks into month-partitioned Parquet files in a staging
+    folder. On commit the folder becomes a new dataset (version 1), unless a
+    stored dataset still holds exactly the same rows: uploading the same data
+    twice yields the same dataset ID.
+    """
+
+    def __init__(self, store: "DatasetStore"):
+        self.store = store
+        self.directory = os.path.join(store.root, f".staging-{uuid.uuid4().hex}")
+        self.staging_dir = os.path.join(self.directory, _version_dir(1))
+        os.makedirs(self.staging_dir)
+        self._writers: Dict[str, pq.ParquetWriter] = {}
+        self._hasher = hashlib.sha256()
+        self.row_count = 0
+        self.start_date = None
+        self.end_date = None
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """Appends one validated chunk to its month partitions."""
+        if frame.empty:
+            return
+
+        self._hasher.update(_row_digests(frame))
+        self.row_count += len(frame)
+
+        chunk_start, chunk_end = frame['date'].min().date(), frame['date'].max().date()
+        self.start_date = chunk_start if self.start_date is None else min(self.start_date, chunk_start)
+        self.end_date = chunk_end if self.end_date is None else max(self.end_date, chunk_end)
+
+        for partition, rows in frame.groupby(_partition_key(frame['date']), sort=False):
+            writer = self._writers.get(partition)
+            if writer is None:
+                path = os.path.join(self.staging_dir, partition)
+                writer = pq.ParquetWriter(path, SCHEMA, compression=COMPRESSION)
+                self._writers[partition] = writer
+            writer.write_table(pa.Table.from_pandas(rows, schema=SCHEMA, preserve_index=False))
+
+    def _close_writers(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+
+    def digest(self) -> str:
+        """Content hash of the rows written so far."""
+        return self._hasher.hexdigest()
+
+    def staged_partitions(self) -> Dict[str, str]:
+        """Closes the files and returns {partition name: staged file path}."""
+        self._close_writers()
+        return {partition: os.path.join(self.staging_dir, partition) for partition in sorted(self._writers)}
+
+    def commit(self, summary: AnalysisResponse) -> DatasetInfo:
+        """
+        Finalizes the files and registers the dataset under a new ID.
+        If a stored dataset holds identical data, the staged copy is discarded and that one is returned.
+        """
+        self._close_writers()
+        content_hash = self.digest()
+        with self.store.lock(content_hash):
+            existing = self.store.find_upload(content_hash)
+            if existing is not None:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                return existing
+
+            dataset_id = uuid.uuid4().hex[:16]
+            now = datetime.now()
+            info = DatasetInfo(
+                dataset_id=dataset_id,
+                created_at=now,
+                updated_at=now,
+                row_count=self.row_count,
+                channels=sorted(r.channel for r in summary.summary),
+                start_date=self.start_date,
+                end_date=self.end_date,
+                partitions=sorted(self._writers),
+                content_hash=content_hash,
+                summary=summary.model_copy(update={"validation": None, "dataset_id": dataset_id})
+            )
+            self.store.write_meta(info, directory=self.directory)
+            os.rename(self.directory, self.store.path(dataset_id))
+            self.store.register_upload(content_hash, dataset_id)
+        return info
+
+    def abort(self) -> None:
+        """Drops everything written so far."""
+        self._close_writers()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class DatasetMerge:
+    """
+    Upserts staged rows (a DatasetWriter) into a stored dataset, keyed by
+    MERGE_KEY. Only the month partitions the new rows fall in are read and
+    rewritten; the others are left untouched, so the cost follows the size of
+    the upload, not of the history. `prepare` writes the merged partitions to
+    the folder of the next version, `commit` links the untouched ones in and
+    switches the dataset to it in one step (its meta.json). The dataset keeps
+    its ID; readers of the previous version keep reading its own folder.
+    """
+
+    def __init__(self, store: "DatasetStore", info: DatasetInfo, writer: DatasetWriter):
+        self.store = store
+        self.info = info
+        self.writer = writer
+        self.directory = store.path(info.dataset_id)
+        self.live_dir = store.data_dir(info)
+        self.staging_dir = os.path.join(self.directory, f".{_version_dir(info.version + 1)}-{uuid.uuid4().hex}")
+        self.partitions: List[str] = []  # Partitions rewritten (or created) by the merge
+        self.keys = pd.DataFrame(columns=MERGE_KEY)
+        self.rows_added = 0
+        self.rows_replaced = 0
+        self.keys_inserted = 0
+        self.keys_updated = 0
+
+    def prepare(self) -> "DatasetMerge":
+        """Merges every staged partition with its live counterpart into the next version's folder."""
+        os.makedirs(self.staging_dir)
+        keys = []
+        for partition, staged_path in self.writer.staged_partitions().items():
+            new = pq.read_table(staged_path, schema=SCHEMA)
+            new_keys = new.select(MERGE_KEY).group_by(MERGE_KEY).aggregate([])
+
+            if partition in self.info.partitions:
+                old = pq.read_table(os.path.join(self.live_dir, partition), schema=SCHEMA)
+                kept = old.join(new_keys, MERGE_KEY, join_type="left anti").select(SCHEMA.names)
+                self.rows_replaced += old.num_rows - kept.num_rows
+                self.keys_updated += new_keys.join(old.select(MERGE_KEY), MERGE_KEY, join_type="left semi").num_rows
+                merged = pa.concat_tables([kept.cast(SCHEMA), new]).sort_by([("date", "ascending")])
+            else:
+                merged = new
+
+            pq.write_table(merged, os.path.join(self.staging_dir, partition), compression=COMPRESSION)
+            self.partitions.append(partition)
+            self.rows_added += new.num_rows
+            self.keys_inserted += new_keys.num_rows
+            keys.append(new_keys.to_pandas())
+
+        self.keys_inserted -= self.keys_updated
+        self.partitions.sort()
+        if keys:
+            self.keys = pd.concat(keys, ignore_index=True)
+        return self
+
+    def new_rows(self, batch_size: int) -> Iterator[pd.DataFrame]:
+        """Streams the appended rows (what the facts and rollups need to apply the change)."""
+        files = list(self.writer.staged_partitions().values())
+        if not files:
+            return
+        for batch in ds.dataset(files, schema=SCHEMA, format="parquet").to_batches(batch_size=batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def commit(self, summary: AnalysisResponse) -> DatasetInfo:
+        """
+        Completes the next version's folder and registers it: until meta.json
+        is replaced, readers see the previous version, after it the new one.
+        Folders older than the previous version are then removed.
+        """
+        for partition in self.info.partitions:
+            if partition not in self.partitions:
+                _link_or_copy(os.path.join(self.live_dir, partition), os.path.join(self.staging_dir, partition))
+
+        dates = [d for d in (self.info.start_date, self.info.end_date, self.writer.start_date, self.writer.end_date)
+                 if d is not None]
+        info = self.info.model_copy(update={
+            "version": self.info.version + 1,
+            "updated_at": datetime.now(),
+            "row_count": self.info.row_count - self.rows_replaced + self.rows_added,
+            "channels": sorted(r.channel for r in summary.summary),
+            "start_date": min(dates) if dates else None,
+            "end_date": max(dates) if dates else None,
+            "partitions": sorted(set(self.info.partitions) | set(self.partitions)),
+            "content_hash": None,  # No longer the content of an upload
+            "summary": summary.model_copy(update={"validation": None, "dataset_id": self.info.dataset_id}),
+        })
+        # Left over by an append that failed before registering it
+        target = self.store.data_dir(info)
+        shutil.rmtree(target, ignore_errors=True)
+        os.rename(self.staging_dir, target)
+        self.store.write_meta(info)
+        self.writer.abort()
+
+        for name in os.listdir(self.directory):
+            if name.startswith("v") and name[1:].isdigit() and int(name[1:]) < self.info.version:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        return info
+
+    def abort(self) -> None:
+        """Drops the merged files and the staged rows; the stored dataset is unchanged."""
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.writer.abort()
+
+# Striped locks serializing appends to a dataset (and commits of one upload's content):
+# a fixed set shared by hash, so memory stays flat however many datasets are stored
+_merge_locks = [threading.Lock() for _ in range(64)]
+
+class DatasetStore:
+    """
+    Persists uploads as compressed, month-partitioned Parquet datasets so they
+    are parsed once and queried many times by ID. A dataset folder holds its
+    meta.json and one folder per version (v1, v2, ...) of its partitions.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, UPLOAD_INDEX), exist_ok=True)
+
+    def path(self, dataset_id: str) -> str:
+        # IDs are hex digests; anything else could escape the store root
+        if not dataset_id or not all(c in "0123456789abcdef" for c in dataset_id):
+            raise DatasetNotFoundError(dataset_id)
+        return os.path.join(self.root, dataset_id)
+
+    def writer(self) -> DatasetWriter:
+        return DatasetWriter(self)
+
+    def merge(self, info: DatasetInfo, writer: DatasetWriter) -> DatasetMerge:
+        return DatasetMerge(self, info, writer)
+
+    def data_dir(self, info: DatasetInfo) -> str:
+        """Folder of the partitions of a dataset version."""
+        return os.path.join(self.path(info.dataset_id), _version_dir(info.version))
+
+    def lock(self, key: str) -> threading.Lock:
+        """Serializes writes to one dataset, or to one upload's content hash (within this process)."""
+        return _merge_locks[hash(key) % len(_merge_locks)]
+
+    def _upload_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, UPLOAD_INDEX, content_hash)
+
+    def find_upload(self, content_hash: str) -> Optional[DatasetInfo]:
+        """The dataset stored from an upload with this content hash, if it still holds exactly those rows."""
+        try:
+            with open(self._upload_path(content_hash)) as f:
+                info = self.get(f.read().strip())
+        except (FileNotFoundError, DatasetNotFoundError):
+            return None
+        return info if info.content_hash == content_hash else None
+
+    def register_upload(self, content_hash: str, dataset_id: str) -> None:
+        path = self._upload_path(content_hash)
+        tmp_path = f"{path}.{uuid.uuid4().hex}"
+        with open(tmp_path, "w") as f:
+            f.write(dataset_id)
+        os.replace(tmp_path, path)
+
+    def write_meta(self, info: DatasetInfo, directory: Optional[str] = None) -> None:
+        directory = directory or self.path(info.dataset_id)
+        tmp_path = os.path.join(directory, f".{META_FILE}.{uuid.uuid4().hex}")
+        with open(tmp_path, "w") as f:
+            f.write(info.model_dump_json())
+        os.replace(tmp_path, os.path.join(directory, META_FILE))
+
+    def get(self, dataset_id: str) -> DatasetInfo:
+        meta_path = os.path.join(self.path(dataset_id), META_FILE)
+        try:
+            with open(meta_path) as f:
+                return DatasetInfo.model_validate(json.load(f))
+        except FileNotFoundError:
+            raise DatasetNotFoundError(dataset_id)
+
+    def list(self) -> List[DatasetInfo]:
+        datasets = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            try:
+                datasets.append(self.get(name))
+            except DatasetNotFoundError:
+                continue
+        return sorted(datasets, key=lambda d: d.updated_at, reverse=True)
+
+    def scan(self, info: DatasetInfo, query: Optional[DatasetQuery] = None,
+             columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        Reads the rows of a dataset matching the query filters.
+        Filters are pushed down to Parquet, so untouched row groups are skipped.
+        """
+        directory = self.data_dir(info)
+        files = [os.path.join(directory, p) for p in info.partitions]
+        if not files:
+            return SCHEMA.empty_table()
+
+        dataset = ds.dataset(files, schema=SCHEMA, format="parquet")
+        return dataset.to_table(columns=columns, filter=_build_filter(query))
+
+    def iter_batches(self, info: DatasetInfo, batch_size: int) -> Iterator[pd.DataFrame]:
+        """Streams the stored rows as DataFrames of at most `batch_size` rows."""
+        directory = self.data_dir(info)
+        files = [os.path.join(directory, p) for p in info.partitions]
+        if not files:
+            return
+        dataset = ds.dataset(files, schema=SCHEMA, format="parquet")
+        for batch in dataset.to_batches(batch_size=batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+def _build_filter(query: Optional[DatasetQuery]):
+    if query is None:
+        return None
+
+    conditions = []
+    if query.start_date:
+        conditions.append(pc.field('date') >= pa.scalar(query.start_date, pa.date32()))
+    if query.end_date:
+        conditions.append(pc.field('date') <= pa.scalar(query.end_date, pa.date32()))
+    if query.channels:
+        conditions.append(pc.field('channel').isin(query.channels))
+    if query.campaigns:
+        conditions.append(pc.field('campaign_name').isin(query.campaigns))
+
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+def get_store() -> DatasetStore:
+    """Returns the store configured in settings."""
+    return DatasetStore(settings.DATASET_DIR)
@@ -0,0 +1,200 @@
+import hashlib
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+# --- FINGERPRINTS ---
+
+def lead_fingerprint(lead_email: str, campaign_id: Optional[str], source: str) -> str:
+    """
+    Stable identity of a lead: normalized (email, campaign, source) -> 128-bit hex digest.
+    """
+    normalized = "\x1f".join([
+        lead_email.strip().lower(),
+        (campaign_id or "").strip().lower(),
+        source.strip().lower(),
+    ])
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+def record_keys(record: Dict[str, Any]) -> List[str]:
+    """Dedupe keys of a lead row: its content fingerprint and, if sent, its idempotency key."""
+    keys = [f"fp:{record['fingerprint']}"]
+    if record.get("idempotency_key"):
+        keys.append(f"idem:{record['idempotency_key']}")
+    return keys
+
+# --- BLOOM FILTERS ---
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter on a numpy bit array.
+    Sized for `capacity` items at `error_rate` false positives; never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        # Double hashing: k positions from two 64-bit hashes of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= np.uint8(1 << (pos & 7))
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._bits.nbytes
+
+    def fill_ratio(self) -> float:
+        return float(np.unpackbits(self._bits).sum()) / self.num_bits
+
+class RotatingBloomFilter:
+    """
+    Time-windowed Bloom filter: `generations` filters, the oldest one replaced
+    every window / (generations - 1) seconds. A key is remembered for at least
+    `window_seconds`, and memory stays constant however many keys stream through.
+    """
+
+    def __init__(self, window_seconds: float, capacity: int, error_rate: float,
+                 generations: int = 2, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_every = window_seconds / max(1, generations - 1)
+        self.clock = clock
+        self._filters = [BloomFilter(capacity, error_rate) for _ in range(generations)]
+        self._rotated_at = clock()
+        self.rotations = 0
+
+    def _maybe_rotate(self) -> None:
+        now = self.clock()
+        while now - self._rotated_at >= self.rotate_every:
+            self._filters.pop()
+            self._filters.insert(0, BloomFilter(self.capacity, self.error_rate))
+            self._rotated_at += self.rotate_every
+            self.rotations += 1
+
+    def add(self, key: str) -> None:
+        self._maybe_rotate()
+        self._filters[0].add(key)
+
+    def __contains__(self, key: str) -> bool:
+        self._maybe_rotate()
+        return any(key in f for f in self._filters)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(f.memory_bytes for f in self._filters)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "window_seconds": self.window_seconds,
+            "generations": len(self._filters),
+            "filter_memory_bytes": self.memory_bytes,
+            "current_generation_items": self._filters[0].count,
+            "current_generation_fill_ratio": round(self._filters[0].fill_ratio(), 4),
+            "rotations": self.rotations,
+        }
+
+# --- DEDUPLICATOR ---
+
+class LeadDeduplicator:
+    """
+    Two-level duplicate filter for webhook leads.
+    1. The rotating Bloom filter answers "definitely new" for most leads in O(1)
+       without touching the database.
+    2. Only when it says "maybe seen" is the exact check run: first against the
+       leads still waiting in the write-behind buffer, then in the database.
+    Each candidate is a list of keys (content fingerprint, optional idempotency
+    key); it is a duplicate if any of its keys was already accepted.
+    """
+
+    def __init__(self, bloom: RotatingBloomFilter,
+                 is_pending: Callable[[str], bool],
+                 find_stored: Callable[[List[str]], Set[str]]):
+        self.bloom = bloom
+        self.is_pending = is_pending
+        self.find_stored = find_stored
+        self.checked = 0
+        self.duplicates = 0
+        self.bloom_positives = 0
+        self.false_positives = 0
+
+    def warm(self, candidates: Iterable[Sequence[str]]) -> int:
+        """
+        Adds already stored leads to the Bloom filter (startup), so a restart does
+        not turn every lead of the window into a "definitely new" miss.
+        """
+        count = 0
+        for keys in candidates:
+            for key in keys:
+                self.bloom.add(key)
+            count += 1
+        return count
+
+    def maybe_seen(self, candidates: Sequence[Sequence[str]]) -> List[str]:
+        """Keys the Bloom filter cannot rule out (these need the exact check)."""
+        return [key for keys in candidates for key in keys if key in self.bloom]
+
+    async def check(self, candidates: Sequence[Sequence[str]]) -> List[bool]:
+        """
+        Duplicate flag per candidate. The database is only queried (off the event
+        loop, in one round trip) for keys the Bloom filter reports as maybe seen.
+        Callers must queue the accepted leads right after, without awaiting in
+        between, so concurrent requests see them as pending.
+        """
+        maybe = self.maybe_seen(candidates)
+        stored = await run_in_threadpool(self.find_stored, maybe) if maybe else set()
+        return self.resolve(candidates, stored)
+
+    def resolve(self, candidates: Sequence[Sequence[str]], stored: Set[str]) -> List[bool]:
+        """
+        Decides every candidate given the keys found in the database.
+        Returns one flag per candidate (True = duplicate) and remembers the new ones.
+        """
+        flags = []
+        batch_keys: Set[str] = set()
+        for keys in candidates:
+            self.checked += 1
+            duplicate = False
+            for key in keys:
+                if key in batch_keys:
+                    duplicate = True
+                elif key in self.bloom:
+                    self.bloom_positives += 1
+                    if key in stored or self.is_pending(key):
+                        duplicate = True
+                    else:
+                        self.false_positives += 1
+            if duplicate:
+                self.duplicates += 1
+            else:
+                for key in keys:
+                    self.bloom.add(key)
+            batch_keys.update(keys)
+            flags.append(duplicate)
+        return flags
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "checked": self.checked,
+            "duplicates_rejected": self.duplicates,
+            "duplicate_rate": round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+            "bloom_positives": self.bloom_positives,
+            "bloom_false_positives": self.false_positives,
+            **self.bloom.stats(),
+        }
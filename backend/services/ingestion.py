@@ -0,0 +1,214 @@
+import gzip
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import IO, Dict, Iterator, Iterable, List
+from ..models.schemas import ValidationReport
+
+# Columns every upload must contain (after normalization)
+REQUIRED_COLUMNS = {'date', 'channel', 'spend', 'revenue', 'clicks', 'conversions'}
+
+class IngestionError(ValueError):
+    """Raised when an uploaded file has an invalid structure or invalid rows."""
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizes column names in place.
+    Example: "  Revenue " -> "revenue"
+    """
+    df.columns = [str(c).lower().strip().replace(' ', '_') for c in df.columns]
+    return df
+
+def check_required_columns(columns: Iterable[str]) -> None:
+    """Raises IngestionError if any required column is missing."""
+    missing = REQUIRED_COLUMNS - set(columns)
+    if missing:
+        raise IngestionError(f"Missing required columns in uploaded file: {missing}")
+
+def read_csv_chunks(source: IO[bytes], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Parses a CSV file-like object in chunks of `chunk_size` rows.
+    Only one chunk is held in memory at a time. The row index keeps counting
+    across chunks, so `index + 1` is always the data row number in the file.
+    """
+    try:
+        reader = pd.read_csv(source, chunksize=chunk_size)
+    except pd.errors.EmptyDataError:
+        raise IngestionError("The uploaded file is empty.")
+
+    with reader:
+        first_chunk = True
+        for chunk in reader:
+            normalize_columns(chunk)
+            if first_chunk:
+                check_required_columns(chunk.columns)
+                first_chunk = False
+            yield chunk
+
+# Leading bytes that identify each supported upload format (anything else is read as plain CSV)
+MAGIC_BYTES = [
+    (b"\x1f\x8b", "csv.gz"),
+    (b"\x28\xb5\x2f\xfd", "csv.zst"),
+    (b"PAR1", "parquet"),
+    (b"ARROW1", "arrow"),             # Arrow IPC file / Feather v2
+    (b"\xff\xff\xff\xff", "arrow-stream"),  # Arrow IPC stream (continuation marker)
+]
+
+def detect_format(source: IO[bytes]) -> str:
+    """Sniffs the upload format from its first bytes and rewinds the file."""
+    head = source.read(8)
+    source.seek(0)
+    for magic, name in MAGIC_BYTES:
+        if head.startswith(magic):
+            return name
+    return "csv"
+
+def _arrow_chunks(batches: Iterable, column_names: List[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Columnar inputs: record batches go straight to typed DataFrames (no text parsing),
+    re-sliced to `chunk_size` rows with a running row index like the CSV path.
+    """
+    check_required_columns(normalize_columns(pd.DataFrame(columns=column_names)).columns)
+    offset = 0
+    for batch in batches:
+        for start in range(0, batch.num_rows, chunk_size):
+            chunk = normalize_columns(batch.slice(start, chunk_size).to_pandas())
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+
+def read_upload_chunks(source: IO[bytes], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Reads any supported upload in chunks of at most `chunk_size` rows:
+    plain / gzip / zstd CSV, Parquet, Arrow IPC (file or stream) and Feather.
+    The format is detected from the magic bytes, not the file name. Every
+    format yields normalized chunks checked for REQUIRED_COLUMNS, so the same
+    validate_frame rules apply downstream.
+    """
+    fmt = detect_format(source)
+    if fmt == "csv":
+        yield from read_csv_chunks(source, chunk_size)
+        return
+
+    try:
+        if fmt == "csv.gz":
+            yield from read_csv_chunks(gzip.GzipFile(fileobj=source), chunk_size)
+        elif fmt == "csv.zst":
+            yield from read_csv_chunks(pa.CompressedInputStream(pa.PythonFile(source, mode='r'), 'zstd'), chunk_size)
+        elif fmt == "parquet":
+            parquet = pq.ParquetFile(source)
+            yield from _arrow_chunks(parquet.iter_batches(batch_size=chunk_size), parquet.schema_arrow.names, chunk_size)
+        elif fmt == "arrow":
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            yield from _arrow_chunks(batches, reader.schema.names, chunk_size)
+        else:
+            reader = pa.ipc.open_stream(source)
+            yield from _arrow_chunks(reader, reader.schema.names, chunk_size)
+    except (pa.ArrowInvalid, OSError, EOFError) as e:
+        # Truncated/corrupt archives and unreadable columnar files
+        raise IngestionError(f"Could not read {fmt} file: {e}")
+
+class ValidationResult:
+    """
+    Outcome of validating one chunk column by column.
+    `error_mask` is True for every row that broke at least one rule;
+    `field_errors` holds one such mask per field.
+    """
+
+    def __init__(self, frame: pd.DataFrame, error_mask: np.ndarray,
+                 field_errors: Dict[str, np.ndarray], row_numbers: np.ndarray):
+        self.frame = frame
+        self.error_mask = error_mask
+        self.field_errors = field_errors
+        self.row_numbers = row_numbers
+
+    @property
+    def failing_rows(self) -> np.ndarray:
+        return self.row_numbers[self.error_mask]
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.tz_localize(None) if values.dt.tz is not None else values
+    return pd.to_datetime(values, errors='coerce', format='ISO8601')
+
+def validate_frame(chunk: pd.DataFrame) -> ValidationResult:
+    """
+    Applies the CampaignRecord rules directly on DataFrame columns:
+    - `date` must parse as an ISO date (a time part is only accepted if it is midnight).
+    - `channel` is required.
+    - `campaign_name` defaults to "General".
+    - `spend`/`revenue` must be numbers >= 0.
+    - `clicks`/`conversions` must be whole numbers >= 0.
+    Every row is checked (no abort on the first bad one); invalid rows are
+    excluded from `frame`, which comes back typed and ready for the engine.
+    """
+    field_errors = {}
+
+    dates = _parse_dates(chunk['date'])
+    # Like CampaignRecord.date: '2024-01-01T00:00:00' is a date, '2024-01-01T13:45:00' is not
+    field_errors['date'] = (dates.isna() | (dates != dates.dt.normalize())).to_numpy()
+
+    channels = chunk['channel']
+    field_errors['channel'] = channels.isna().to_numpy()
+
+    if 'campaign_name' in chunk.columns:
+        campaigns = chunk['campaign_name'].fillna("General").astype(str)
+    else:
+        campaigns = pd.Series("General", index=chunk.index)
+
+    numbers = {}
+    for column in ('spend', 'revenue', 'clicks', 'conversions'):
+        values = pd.to_numeric(chunk[column], errors='coerce').astype('float64')
+        bad = ~np.isfinite(values) | (values < 0)
+        if column in ('clicks', 'conversions'):
+            bad |= values != np.floor(values)
+        field_errors[column] = bad.to_numpy()
+        numbers[column] = values
+
+    error_mask = np.logical_or.reduce(list(field_errors.values()))
+    valid = ~error_mask
+
+    frame = pd.DataFrame({
+        'date': dates[valid].dt.normalize(),
+        'channel': channels[valid].astype(str),
+        'campaign_name': campaigns[valid],
+        'spend': numbers['spend'][valid],
+        'revenue': numbers['revenue'][valid],
+        'clicks': numbers['clicks'][valid].astype('int64'),
+        'conversions': numbers['conversions'][valid].astype('int64'),
+    })
+
+    return ValidationResult(frame, error_mask, field_errors, chunk.index.to_numpy() + 1)
+
+class ValidationReportBuilder:
+    """Accumulates chunk results into a single ValidationReport."""
+
+    def __init__(self, max_reported_rows: int):
+        self.max_reported_rows = max_reported_rows
+        self.total_rows = 0
+        self.invalid_rows = 0
+        self.failing_rows: List[int] = []
+        self.errors_by_field: Dict[str, int] = {}
+
+    def add(self, result: ValidationResult) -> None:
+        self.total_rows += len(result.error_mask)
+        self.invalid_rows += int(result.error_mask.sum())
+
+        room = self.max_reported_rows - len(self.failing_rows)
+        if room > 0:
+            self.failing_rows.extend(int(n) for n in result.failing_rows[:room])
+
+        for field, mask in result.field_errors.items():
+            count = int(mask.sum())
+            if count:
+                self.errors_by_field[field] = self.errors_by_field.get(field, 0) + count
+
+    def build(self) -> ValidationReport:
+        return ValidationReport(
+            total_rows=self.total_rows,
+            invalid_rows=self.invalid_rows,
+            failing_rows=self.failing_rows,
+            errors_by_field=self.errors_by_field
+        )
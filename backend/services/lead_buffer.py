@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import exc, select
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.concurrency import run_in_threadpool
+
+from ..core import metrics
+from ..core.config import settings
+from ..database.db import SessionLocal
+from ..database.models import Lead
+from .dedupe import LeadDeduplicator, RotatingBloomFilter, record_keys
+
+logger = logging.getLogger(__name__)
+
+class BufferFullError(Exception):
+    """Raised when accepting more leads would exceed the queue depth (HTTP 429)."""
+
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# Dead-lettered leads kept in memory for inspection (oldest dropped first)
+DEAD_LETTER_MAX = 1000
+
+def is_transient(error: Exception) -> bool:
+    """True for failures of the database itself (down, locked, disconnected), not of the rows written."""
+    return isinstance(error, (exc.OperationalError, exc.InterfaceError, exc.DisconnectionError,
+                              ConnectionError, TimeoutError))
+
+def write_leads(records: List[Dict[str, Any]]) -> Set[str]:
+    """
+    Inserts one batch of leads with a single executemany.
+    Rows whose fingerprint is already stored are skipped (ON CONFLICT DO NOTHING),
+    so duplicates older than the Bloom filter window never reach the table twice.
+    Returns the fingerprints actually inserted.
+    """
+    db = SessionLocal()
+    try:
+        dialect = db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = insert(Lead.__table__).on_conflict_do_nothing(index_elements=["fingerprint"])
+            inserted = set(db.execute(stmt.returning(Lead.fingerprint), records).scalars())
+        else:
+            db.execute(Lead.__table__.insert(), records)
+            inserted = {record["fingerprint"] for record in records}
+        db.commit()
+        return inserted
+    finally:
+        db.close()
+
+def load_recent_keys(window_seconds: float, batch_size: int = 10_000) -> Iterator[List[str]]:
+    """Dedupe keys of the leads received within the last `window_seconds` (to warm the Bloom filter)."""
+    since = datetime.now() - timedelta(seconds=window_seconds)
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Lead.fingerprint, Lead.idempotency_key).where(Lead.received_at >= since)
+            .execution_options(yield_per=batch_size)
+        )
+        for fingerprint, idempotency_key in rows:
+            yield record_keys({"fingerprint": fingerprint, "idempotency_key": idempotency_key})
+    finally:
+        db.close()
+
+def find_stored_keys(keys: List[str]) -> Set[str]:
+    """Exact check: which of the given dedupe keys ("fp:..."/"idem:...") are already in the leads table."""
+    columns = {"fp": Lead.fingerprint, "idem": Lead.idempotency_key}
+    found = set()
+    db = SessionLocal()
+    try:
+        for prefix, column in columns.items():
+            values = list({k.split(":", 1)[1] for k in keys if k.startswith(prefix + ":")})
+            for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+                rows = db.execute(select(column).where(column.in_(chunk)).distinct())
+                found.update(f"{prefix}:{value}" for (value,) in rows)
+    finally:
+        db.close()
+    return found
+
+class LeadWriteBuffer:
+    """
+    Write-behind buffer for webhook leads.
+    Endpoints only append to an in-memory queue (O(1), no I/O); a background
+    task flushes it to the database in batches when `batch_size` leads are
+    waiting or every `flush_interval` seconds, whichever comes first.
+    The queue is bounded: when full, `offer` raises BufferFullError.
+    `writer` returns the fingerprints it inserted; queued leads the database
+    already held, or that it refused (dead-lettered), are passed to
+    `on_dropped` (e.g. to take them off live counters).
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self, max_depth: int, batch_size: int, flush_interval: float,
+                 writer: Callable[[List[Dict[str, Any]]], Set[str]] = write_leads,
+                 on_dropped: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 max_attempts: int = 3):
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer = writer
+        self.on_dropped = on_dropped
+        self.max_attempts = max_attempts
+        self._pending: Deque[Dict[str, Any]] = deque()
+        # Batches that failed, written before the queue: (records, failed attempts)
+        self._retries: Deque[Tuple[List[Dict[str, Any]], int]] = deque()
+        self._retry_depth = 0
+        self._writing = 0  # Leads of the batch being written
+        self.dead_letters: Deque[Dict[str, Any]] = deque(maxlen=DEAD_LETTER_MAX)
+        # Dedupe keys of queued + in-flight leads (not yet visible in the database)
+        self._pending_keys: Dict[str, int] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.accepted_total = 0
+        self.flushed_total = 0
+        self.rejected_total = 0
+        self.batches_flushed = 0
+        self.failed_flushes = 0
+        self.dropped_total = 0
+        self.dead_letter_total = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Leads not yet written: queued, waiting for a retry or being written."""
+        return len(self._pending) + self._retry_depth + self._writing
+
+    def is_pending(self, key: str) -> bool:
+        return key in self._pending_keys
+
+    def _track(self, records: List[Dict[str, Any]], delta: int) -> None:
+        for record in records:
+            for key in record_keys(record):
+                count = self._pending_keys.get(key, 0) + delta
+                if count > 0:
+                    self._pending_keys[key] = count
+                else:
+                    self._pending_keys.pop(key, None)
+
+    def offer(self, records: List[Dict[str, Any]]) -> None:
+        """Queues all records, or none of them if the queue would overflow."""
+        if self.depth + len(records) > self.max_depth:
+            self.rejected_total += len(records)
+            raise BufferFullError(f"Lead queue is full ({self.depth}/{self.max_depth}).")
+        self._pending.extend(records)
+        self._track(records, 1)
+        self.accepted_total += len(records)
+        if self._wake is not None and self.depth >= self.batch_size:
+            self._wake.set()
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops the background task once its current write is done (it is never
+        cancelled mid-batch), then flushes whatever is still queued.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self.depth:
+            logger.error("Shutdown with %d unflushed leads", self.depth)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._stopping:
+                return
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Lead flush loop error")
+
+    def _next_batch(self) -> Tuple[List[Dict[str, Any]], int]:
+        if self._retries:
+            batch, attempts = self._retries.popleft()
+            self._retry_depth -= len(batch)
+            return batch, attempts
+        return [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))], 0
+
+    def _retry(self, *batches: Tuple[List[Dict[str, Any]], int]) -> None:
+        """Puts failed batches back in front of the queue, in the given order."""
+        for batch, attempts in reversed(batches):
+            self._retries.appendleft((batch, attempts))
+            self._retry_depth += len(batch)
+
+    def _drop(self, records: List[Dict[str, Any]]) -> None:
+        if self.on_dropped is not None:
+            self.on_dropped(records)
+
+    async def flush(self) -> None:
+        """
+        Writes queued leads in batches. A batch that fails is put back in front
+        of the queue. Database outages are waited out (the next flush retries);
+        a batch the database refuses `max_attempts` times in a row is split in
+        two, so the rows it cannot store end up alone and are dead-lettered
+        instead of blocking the queue.
+        """
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            while self._retries or self._pending:
+                batch, attempts = self._next_batch()
+                started = time.perf_counter()
+                self._writing = len(batch)
+                try:
+                    inserted = await run_in_threadpool(self.writer, batch)
+                except Exception as e:
+                    self._writing = 0
+                    self.failed_flushes += 1
+                    attempts += 1
+                    if is_transient(e):
+                        logger.exception("Lead batch flush failed; %d leads re-queued", len(batch))
+                        self._retry((batch, attempts))
+                        return
+                    if attempts < self.max_attempts:
+                        logger.warning("Lead batch refused (attempt %d/%d): %s", attempts, self.max_attempts, e)
+                        self._retry((batch, attempts))
+                    elif len(batch) > 1:
+                        half = len(batch) // 2
+                        logger.warning("Lead batch refused %d times; split into %d + %d leads",
+                                       attempts, half, len(batch) - half)
+                        self._retry((batch[:half], 0), (batch[half:], 0))
+                    else:
+                        logger.error("Lead dead-lettered after %d attempts (fingerprint %s): %s",
+                                     attempts, batch[0]["fingerprint"], e)
+                        self._track(batch, -1)
+                        self.dead_letters.append(batch[0])
+                        self.dead_letter_total += 1
+                        self._drop(batch)
+                    continue
+                self._writing = 0
+                self._track(batch, -1)
+                dropped = [record for record in batch if record["fingerprint"] not in inserted]
+                if dropped:
+                    # Already stored (older than the Bloom window): accepted, but not new
+                    self.dropped_total += len(dropped)
+                    self._drop(dropped)
+                self.last_flush_seconds = time.perf_counter() - started
+                metrics.WEBHOOK_FLUSH_LATENCY.observe(self.last_flush_seconds)
+                self.flushed_total += len(batch) - len(dropped)
+                self.batches_flushed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.depth,
+            "max_depth": self.max_depth,
+            "accepted_total": self.accepted_total,
+            "flushed_total": self.flushed_total,
+            "rejected_total": self.rejected_total,
+            "batches_flushed": self.batches_flushed,
+            "failed_flushes": self.failed_flushes,
+            "dropped_already_stored": self.dropped_total,
+            "dead_lettered": self.dead_letter_total,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+# Process-wide buffer, started/stopped by the app lifespan
+lead_buffer = LeadWriteBuffer(
+    max_depth=settings.WEBHOOK_QUEUE_MAX_DEPTH,
+    batch_size=settings.WEBHOOK_BATCH_SIZE,
+    flush_interval=settings.WEBHOOK_FLUSH_INTERVAL_SECONDS,
+    max_attempts=settings.WEBHOOK_MAX_FLUSH_ATTEMPTS
+)
+
+# Process-wide duplicate filter: Bloom window in memory, exact check against queue + table
+lead_deduplicator = LeadDeduplicator(
+    RotatingBloomFilter(
+        window_seconds=settings.DEDUPE_WINDOW_SECONDS,
+        capacity=settings.DEDUPE_CAPACITY,
+        error_rate=settings.DEDUPE_ERROR_RATE
+    ),
+    is_pending=lead_buffer.is_pending,
+    find_stored=find_stored_keys
+)
+
+# Read when /metrics is scraped (nothing extra on the webhook path)
+metrics.callback("webhook_queue_depth", "Leads queued for the database.", "gauge", lambda: lead_buffer.depth)
+metrics.callback("webhook_queue_max_depth", "Queue size above which webhooks get HTTP 429.", "gauge",
+                 lambda: lead_buffer.max_depth)
+metrics.callback("webhook_leads_total", "Webhook leads by outcome.", "counter", lambda: {
+    ("accepted",): lead_buffer.accepted_total,
+    ("flushed",): lead_buffer.flushed_total,
+    ("queue_full",): lead_buffer.rejected_total,
+    ("duplicate",): lead_deduplicator.duplicates,
+    ("already_stored",): lead_buffer.dropped_total,
+}, labelnames=["outcome"])
+metrics.callback("webhook_failed_flushes_total", "Lead batches that failed to write (re-queued).", "counter",
+                 lambda: lead_buffer.failed_flushes)
+metrics.callback("webhook_dead_letters_total", "Leads the database refused on every attempt (not stored).", "counter",
+                 lambda: lead_buffer.dead_letter_total)
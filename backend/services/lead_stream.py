@@ -0,0 +1,119 @@
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+# name -> (window length, bucket width) in seconds.
+# Sliding counts are exact to one bucket; tumbling windows are aligned to the epoch.
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "5m": (300, 10),
+    "1h": (3600, 60),
+    "24h": (86400, 900),
+}
+
+DIMENSIONS = ("source", "campaign_id")
+
+class WindowCounter:
+    """
+    Ring of time buckets covering one window.
+    `add` is O(1): a stale slot (older than the window) is reset on reuse.
+    Queries sum at most window / bucket slots, never the event history.
+    """
+
+    def __init__(self, window_seconds: int, bucket_seconds: int):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.size = window_seconds // bucket_seconds
+        self._counts = array("q", [0] * self.size)
+        self._epochs = array("q", [-1] * self.size)
+
+    def add(self, ts: float, n: int = 1) -> None:
+        epoch = int(ts // self.bucket_seconds)
+        slot = epoch % self.size
+        if self._epochs[slot] != epoch:
+            if self._epochs[slot] > epoch:
+                return  # Older than the window: already expired
+            self._epochs[slot] = epoch
+            self._counts[slot] = 0
+        self._counts[slot] += n
+
+    def _sum_since(self, first_epoch: int, last_epoch: int) -> int:
+        return sum(c for c, e in zip(self._counts, self._epochs) if first_epoch <= e <= last_epoch)
+
+    def sliding(self, now: float) -> int:
+        """Events in the last `window_seconds` (bucket granularity)."""
+        current = int(now // self.bucket_seconds)
+        return self._sum_since(current - self.size + 1, current)
+
+    def tumbling(self, now: float) -> int:
+        """Events since the start of the current aligned window (e.g. this hour)."""
+        window_start = int(now // self.window_seconds) * self.window_seconds
+        return self._sum_since(window_start // self.bucket_seconds, int(now // self.bucket_seconds))
+
+class LeadStreamAggregator:
+    """
+    Real-time lead counters, overall and per source / campaign_id.
+    Each event updates one counter per window and key (O(1) per event);
+    velocity queries read the counters only. Must be used from the event loop thread.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.events_total = 0
+        self._total = self._new_counters()
+        self._groups: Dict[str, Dict[str, Dict[str, WindowCounter]]] = {d: {} for d in DIMENSIONS}
+
+    @staticmethod
+    def _new_counters() -> Dict[str, WindowCounter]:
+        return {name: WindowCounter(*spec) for name, spec in WINDOWS.items()}
+
+    def record(self, source: str, campaign_id: Optional[str], ts: Optional[float] = None, n: int = 1) -> None:
+        ts = self.clock() if ts is None else ts
+        self.events_total += n
+        keys = {"source": source, "campaign_id": campaign_id or "(none)"}
+        targets = [self._total]
+        for dimension in DIMENSIONS:
+            counters = self._groups[dimension].get(keys[dimension])
+            if counters is None:
+                counters = self._groups[dimension][keys[dimension]] = self._new_counters()
+            targets.append(counters)
+        for counters in targets:
+            for counter in counters.values():
+                counter.add(ts, n)
+
+    @staticmethod
+    def _windows(counters: Dict[str, WindowCounter], now: float) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, counter in counters.items():
+            count = counter.sliding(now)
+            result[name] = {
+                "count": count,
+                "per_minute": round(count / (counter.window_seconds / 60), 4),
+                "tumbling_count": counter.tumbling(now),
+            }
+        return result
+
+    def velocity(self, dimension: str = "source", key: Optional[str] = None, limit: int = 20) -> Dict[str, object]:
+        """
+        Current lead velocity: overall plus per key of `dimension`, busiest
+        (by the shortest window) first. `key` narrows the groups to one value.
+        """
+        now = self.clock()
+        groups = self._groups[dimension]
+        if key is None:
+            items = groups.items()
+        else:
+            items = [(key, groups[key])] if key in groups else []
+        rows = [{"key": k, "windows": self._windows(c, now)} for k, c in items]
+        shortest = next(iter(WINDOWS))
+        rows.sort(key=lambda r: r["windows"][shortest]["count"], reverse=True)
+        return {
+            "as_of": datetime.fromtimestamp(now, tz=timezone.utc).isoformat(),
+            "events_total": self.events_total,
+            "total": self._windows(self._total, now),
+            "dimension": dimension,
+            "groups": rows[:limit],
+        }
+
+# Process-wide aggregator fed by the webhook endpoints
+lead_stream = LeadStreamAggregator()
@@ -1,59 +1,175 @@
 import pandas as pd
 import numpy as np
-from typing import List
+from collections import deque
+from pydantic import TypeAdapter
+from typing import TYPE_CHECKING, Deque, List, Sequence, Union
+from ..core.config import settings
 from ..models.schemas import CampaignRecord, MetricResult, AnalysisResponse
+from .parallel_aggregation import PendingSum, aggregate_parallel, resolve_workers
 
-def calculate_performance(data: List[CampaignRecord]) -> AnalysisResponse:
+if TYPE_CHECKING:
+    import pyarrow
+
+# Additive columns: these can be summed per chunk and merged later
+AGGREGATE_COLUMNS = ['spend', 'revenue', 'conversions', 'clicks']
+
+def aggregate_by_channel(df: pd.DataFrame) -> pd.DataFrame:
     """
-    It receives validated data, transforms it into a DataFrame, and calculates business KPIs.
+    Sums the additive columns per channel. The result is indexed by channel.
+    Frames of at least PARALLEL_AGGREGATION_MIN_ROWS rows are summed in a
+    process pool (partial sums per row range, merged here).
     """
-    # 1. Convert list of Pydantic objects to Pandas DataFrame
-    # We use model_dump() which is the modern way in Pydantic v2
-    df = pd.DataFrame([record.model_dump() for record in data])
-    
-    if df.empty:
+    workers = resolve_workers(settings.PARALLEL_AGGREGATION_WORKERS)
+    if workers > 1 and len(df) >= settings.PARALLEL_AGGREGATION_MIN_ROWS:
+        return aggregate_parallel(df, 'channel', AGGREGATE_COLUMNS, workers)
+    return df.groupby('channel')[AGGREGATE_COLUMNS].sum()
+
+# Traffic-light thresholds on ROAS
+ROAS_WARNING_THRESHOLD = 2.0
+ROAS_CRITICAL_THRESHOLD = 1.0
+
+# Bulk validator: builds every MetricResult in one call instead of one constructor per row
+_metric_results = TypeAdapter(List[MetricResult])
+
+def compute_metrics(totals: pd.DataFrame, keys: Sequence[str] = ('channel',)) -> pd.DataFrame:
+    """
+    Derives ROAS, CPA, CR and the traffic-light status from per-group totals.
+    Fully vectorized: no Python loop over the groups.
+    Returns a new DataFrame with the `keys` columns followed by the MetricResult columns (rounded).
+    """
+    spend = totals['spend'].to_numpy(dtype='float64')
+    revenue = totals['revenue'].to_numpy(dtype='float64')
+    conversions = totals['conversions'].to_numpy(dtype='float64')
+    clicks = totals['clicks'].to_numpy(dtype='float64')
+
+    # Safe Handling of Division by Zero (errstate silences the discarded branch)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # ROAS = Revenue / Spend
+        roas = np.where(spend > 0, revenue / spend, 0.0)
+        # CPA = Spend / Conversions
+        cpa = np.where(conversions > 0, spend / conversions, 0.0)
+        # CR = Conversions / Clicks (in percentage)
+        cr = np.where(clicks > 0, (conversions / clicks) * 100, 0.0)
+
+    # Simple business rule for the MVP (Traffic Light)
+    status = np.select(
+        [roas < ROAS_CRITICAL_THRESHOLD, roas < ROAS_WARNING_THRESHOLD],
+        ["Critical", "Warning"],
+        default="Good"
+    )
+
+    columns = {key: totals[key].to_numpy() for key in keys}
+    if 'channel' in columns:
+        columns['channel'] = totals['channel'].astype(str).to_numpy()
+
+    return pd.DataFrame({
+        **columns,
+        'total_spend': np.round(spend, 2),
+        'total_revenue': np.round(revenue, 2),
+        'total_conversions': conversions.astype('int64'),
+        'roas': np.round(roas, 2),
+        'cpa': np.round(cpa, 2),
+        'conversion_rate': np.round(cr, 2),
+        'recommendation_status': status,
+    })
+
+def summarize_totals(totals: pd.DataFrame) -> AnalysisResponse:
+    """
+    Builds the API response from per-channel totals.
+    `totals` must have a 'channel' column plus the AGGREGATE_COLUMNS sums.
+    """
+    if totals.empty:
         return AnalysisResponse(summary=[], global_roas=0.0)
 
-    # 2. Grouping by Channel
-    metrics = df.groupby('channel').agg({
-        'spend': 'sum',
-        'revenue': 'sum',
-        'conversions': 'sum',
-        'clicks': 'sum'
-    }).reset_index()
-
-    # 3. Vectorized Calculations (Safe Handling of Division by Zero)
-    # ROAS = Revenue / Spend
-    metrics['roas'] = np.where(metrics['spend'] > 0, metrics['revenue'] / metrics['spend'], 0)
-    
-    # CPA = Spend / Conversions
-    metrics['cpa'] = np.where(metrics['conversions'] > 0, metrics['spend'] / metrics['conversions'], 0)
-    
-    # CR = Conversions / Clicks (in percentage)
-    metrics['cr'] = np.where(metrics['clicks'] > 0, (metrics['conversions'] / metrics['clicks']) * 100, 0)
-
-    # 4. Generate a results list using business logic (Traffic Light)
-    results = []
-    for _, row in metrics.iterrows():
-        # Simple business rule for the MVP
-        status = "Good"
-        if row['roas'] < 2.0: status = "Warning"
-        if row['roas'] < 1.0: status = "Critical"
-        
-        results.append(MetricResult(
-            channel=row['channel'],
-            total_spend=round(row['spend'], 2),
-            total_revenue=round(row['revenue'], 2),
-            total_conversions=int(row['conversions']),
-            roas=round(row['roas'], 2),
-            cpa=round(row['cpa'], 2),
-            conversion_rate=round(row['cr'], 2),
-            recommendation_status=status
-        ))
-    
-    # 5. Global Business KPI
-    total_spend_all = metrics['spend'].sum()
-    total_rev_all = metrics['revenue'].sum()
+    metrics = compute_metrics(totals)
+
+    # Serialize all rows in bulk
+    results = _metric_results.validate_python(metrics.to_dict(orient='records'))
+
+    # Global Business KPI
+    total_spend_all = float(totals['spend'].sum())
+    total_rev_all = float(totals['revenue'].sum())
     global_roas = total_rev_all / total_spend_all if total_spend_all > 0 else 0.0
 
-    return AnalysisResponse(summary=results, global_roas=round(global_roas, 2))
\ No newline at end of file
+    return AnalysisResponse(summary=results, global_roas=round(global_roas, 2))
+
+def _aggregate_arrow(table) -> pd.DataFrame:
+    """
+    Groups an Arrow table by channel inside Arrow, so only the per-channel
+    totals (not the raw rows) are converted to pandas.
+    """
+    grouped = table.group_by('channel').aggregate([(c, 'sum') for c in AGGREGATE_COLUMNS])
+    totals = grouped.to_pandas().rename(columns={f"{c}_sum": c for c in AGGREGATE_COLUMNS})
+    # Match pandas groupby ordering
+    return totals.sort_values('channel', ignore_index=True)
+
+def calculate_performance_frame(data: Union[pd.DataFrame, "pyarrow.Table"]) -> AnalysisResponse:
+    """
+    Columnar entry point: accepts a validated DataFrame or a pyarrow Table with
+    at least 'channel' and the AGGREGATE_COLUMNS, and calculates business KPIs.
+    """
+    if len(data) == 0:
+        return AnalysisResponse(summary=[], global_roas=0.0)
+
+    if isinstance(data, pd.DataFrame):
+        totals = aggregate_by_channel(data).reset_index()
+    else:
+        totals = _aggregate_arrow(data)
+
+    return summarize_totals(totals)
+
+class PerformanceAccumulator:
+    """
+    Keeps running per-channel totals so a file can be processed chunk by chunk.
+    Memory grows with the number of channels, never with the number of rows.
+    Once the file reaches PARALLEL_AGGREGATION_MIN_ROWS rows, each further chunk
+    is summed in the process pool while the next one is read (at most one chunk
+    in flight per worker); call `close()` if the totals are abandoned.
+    """
+
+    def __init__(self):
+        self._totals = None
+        self.rows = 0
+        self.workers = resolve_workers(settings.PARALLEL_AGGREGATION_WORKERS)
+        self.min_rows = settings.PARALLEL_AGGREGATION_MIN_ROWS
+        self._in_flight: Deque[PendingSum] = deque()
+
+    def _fold(self, partial: pd.DataFrame) -> None:
+        if self._totals is None:
+            self._totals = partial
+        else:
+            self._totals = self._totals.add(partial, fill_value=0)
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Folds one validated chunk into the running totals."""
+        if df.empty:
+            return
+        if self.workers > 1 and self.rows + len(df) >= self.min_rows:
+            self._in_flight.append(PendingSum(df, 'channel', AGGREGATE_COLUMNS, self.workers))
+            if len(self._in_flight) > self.workers:
+                self._fold(self._in_flight.popleft().result())
+        else:
+            self._fold(aggregate_by_channel(df))
+        self.rows += len(df)
+
+    def result(self) -> AnalysisResponse:
+        """Builds the final response from the totals accumulated so far."""
+        while self._in_flight:
+            self._fold(self._in_flight.popleft().result())
+        if self._totals is None:
+            return AnalysisResponse(summary=[], global_roas=0.0)
+        return summarize_totals(self._totals.reset_index())
+
+    def close(self) -> None:
+        """Drops the chunks still being summed (failed uploads)."""
+        while self._in_flight:
+            self._in_flight.popleft().discard()
+
+def calculate_performance(data: List[CampaignRecord]) -> AnalysisResponse:
+    """
+    It receives validated data, transforms it into a DataFrame, and calculates business KPIs.
+    Thin wrapper around calculate_performance_frame for callers holding Pydantic records.
+    """
+    # We use model_dump() which is the modern way in Pydantic v2
+    df = pd.DataFrame([record.model_dump() for record in data])
+    return calculate_performance_frame(df)
@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Kept free of app imports: spawned workers import only this module.
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool reused across calls (spawned once, resized if `workers` changes)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: forking a threaded server process is unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+def resolve_workers(workers: int) -> int:
+    """0 means one worker per CPU."""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def _partial_sums(shm_name: str, n_rows: int, n_columns: int, n_groups: int, start: int, stop: int) -> np.ndarray:
+    """
+    Worker: sums rows [start, stop) of every measure per group code.
+    Reads the parent's shared-memory block in place; only the
+    (n_columns x n_groups) result is sent back.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        codes = np.ndarray((n_rows,), dtype=np.int64, buffer=shm.buf)
+        measures = np.ndarray((n_columns, n_rows), dtype=np.float64, buffer=shm.buf, offset=codes.nbytes)
+        part = codes[start:stop]
+        sums = np.stack([
+            np.bincount(part, weights=measures[i, start:stop], minlength=n_groups)
+            for i in range(n_columns)
+        ])
+        del codes, measures, part  # Release the buffer before closing it
+        return sums
+    finally:
+        shm.close()
+
+def _row_ranges(n_rows: int, partitions: int) -> List[tuple]:
+    bounds = np.linspace(0, n_rows, partitions + 1, dtype=np.int64)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def _share(df: pd.DataFrame, key: str, columns: Sequence[str]) -> Tuple[shared_memory.SharedMemory, int, pd.Index]:
+    """
+    Factorizes the key (sorted, like groupby) into int codes and copies codes and
+    measures once into a new shared-memory block. Returns (block, rows, groups).
+    """
+    codes, groups = pd.factorize(df[key], sort=True)
+    valid = codes >= 0  # groupby drops missing keys
+    if not valid.all():
+        df, codes = df[valid], codes[valid]
+
+    n_rows, n_columns = len(codes), len(columns)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n_rows * 8 * (n_columns + 1)))
+    shared_codes = np.ndarray((n_rows,), dtype=np.int64, buffer=shm.buf)
+    shared_codes[:] = codes
+    shared_measures = np.ndarray((n_columns, n_rows), dtype=np.float64, buffer=shm.buf, offset=shared_codes.nbytes)
+    for i, column in enumerate(columns):
+        shared_measures[i] = df[column].to_numpy(dtype=np.float64)
+    del shared_codes, shared_measures
+    return shm, n_rows, pd.Index(groups)
+
+def _release(shm: shared_memory.SharedMemory) -> None:
+    shm.close()
+    shm.unlink()
+
+def _sums_frame(totals: np.ndarray, groups: pd.Index, key: str, columns: Sequence[str], dtypes) -> pd.DataFrame:
+    """Per-group totals as groupby would return them (integer columns cast back to their dtype)."""
+    result = pd.DataFrame(
+        {column: totals[i] for i, column in enumerate(columns)},
+        index=pd.Index(groups, name=key)
+    )
+    for column in columns:
+        if pd.api.types.is_integer_dtype(dtypes[column]):
+            result[column] = result[column].round().astype(dtypes[column])
+    return result
+
+def aggregate_parallel(df: pd.DataFrame, key: str, columns: Sequence[str], workers: int) -> pd.DataFrame:
+    """
+    Parallel equivalent of df.groupby(key)[columns].sum().
+    1. The key is factorized (sorted, like groupby) into int codes in the parent.
+    2. Codes and measures are copied once into a shared-memory block.
+    3. Each worker sums a contiguous row range with np.bincount.
+    4. The partials are added and integer columns cast back to their dtype.
+    """
+    shm, n_rows, groups = _share(df, key, columns)
+    try:
+        pool = _get_pool(workers)
+        futures = [
+            pool.submit(_partial_sums, shm.name, n_rows, len(columns), len(groups), start, stop)
+            for start, stop in _row_ranges(n_rows, workers)
+        ]
+        totals = np.sum([f.result() for f in futures], axis=0)
+    finally:
+        _release(shm)
+    return _sums_frame(totals, groups, key, columns, df.dtypes)
+
+class PendingSum:
+    """
+    df.groupby(key)[columns].sum() of one frame, running in the pool while the
+    caller goes on (e.g. reads the next chunk of an upload), so consecutive
+    chunks are summed in parallel. `result()` waits for the totals; the shared
+    block is freed once the worker is done with it.
+    """
+
+    def __init__(self, df: pd.DataFrame, key: str, columns: Sequence[str], workers: int):
+        self.key = key
+        self.columns = list(columns)
+        self.dtypes = df.dtypes
+        self._shm, n_rows, self._groups = _share(df, key, columns)
+        try:
+            self._future = _get_pool(workers).submit(
+                _partial_sums, self._shm.name, n_rows, len(self.columns), len(self._groups), 0, n_rows
+            )
+        except Exception:
+            _release(self._shm)
+            raise
+
+    def result(self) -> pd.DataFrame:
+        try:
+            totals = self._future.result()
+        finally:
+            _release(self._shm)
+        return _sums_frame(totals, self._groups, self.key, self.columns, self.dtypes)
+
+    def discard(self) -> None:
+        """Frees the shared block without using the result (waits for the worker first)."""
+        try:
+            self._future.result()
+        except Exception:
+            pass
+        finally:
+            _release(self._shm)
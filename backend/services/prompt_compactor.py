@@ -0,0 +1,100 @@
+import math
+from typing import Any, Dict, List
+
+# Rough but stable heuristic for English/number-heavy text (~4 characters per token)
+CHARS_PER_TOKEN = 4
+
+TABLE_HEADER = "channel|spend|revenue|conversions|roas|cpa|cr%|status"
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _money(value: float) -> str:
+    # Whole units are enough for the model to reason about budgets
+    return f"{value:,.0f}" if abs(value) >= 100 else f"{value:.2f}"
+
+def _row(metric: Dict[str, Any]) -> str:
+    return "|".join([
+        str(metric.get("channel", "?")),
+        _money(float(metric.get("total_spend", 0) or 0)),
+        _money(float(metric.get("total_revenue", 0) or 0)),
+        str(int(metric.get("total_conversions", 0) or 0)),
+        f"{float(metric.get('roas', 0) or 0):.2f}",
+        _money(float(metric.get("cpa", 0) or 0)),
+        f"{float(metric.get('conversion_rate', 0) or 0):.1f}",
+        str(metric.get("recommendation_status", "")),
+    ])
+
+def _header(rows: List[Dict[str, Any]], global_roas: Any) -> str:
+    spend = sum(float(r.get("total_spend", 0) or 0) for r in rows)
+    revenue = sum(float(r.get("total_revenue", 0) or 0) for r in rows)
+    return (f"GLOBAL ROAS: {global_roas}x | channels: {len(rows)} | "
+            f"total spend: {_money(spend)} | total revenue: {_money(revenue)}")
+
+def _long_tail(rows: List[Dict[str, Any]]) -> str:
+    spend = sum(float(r.get("total_spend", 0) or 0) for r in rows)
+    revenue = sum(float(r.get("total_revenue", 0) or 0) for r in rows)
+    conversions = sum(int(r.get("total_conversions", 0) or 0) for r in rows)
+    statuses: Dict[str, int] = {}
+    for r in rows:
+        status = r.get("recommendation_status", "?")
+        statuses[status] = statuses.get(status, 0) + 1
+    roas = revenue / spend if spend > 0 else 0.0
+    status_text = ", ".join(f"{k}={v}" for k, v in sorted(statuses.items()))
+    return (f"LONG TAIL ({len(rows)} other channels): spend={_money(spend)}, revenue={_money(revenue)}, "
+            f"conversions={conversions}, roas={roas:.2f}, status: {status_text}")
+
+def _select_performers(rows: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """Top-k and bottom-k by ROAS plus top-k by spend (deduplicated, biggest spend first)."""
+    by_roas = sorted(rows, key=lambda r: float(r.get("roas", 0) or 0), reverse=True)
+    by_spend = sorted(rows, key=lambda r: float(r.get("total_spend", 0) or 0), reverse=True)
+    picked = {id(r): r for r in by_roas[:k] + by_roas[-k:] + by_spend[:k]}
+    return sorted(picked.values(), key=lambda r: float(r.get("total_spend", 0) or 0), reverse=True)
+
+def compact_summary(data_summary: Dict[str, Any], token_budget: int, top_k: int = 5) -> Dict[str, Any]:
+    """
+    Builds a compact tabular view of an AnalysisResponse-like summary that fits
+    in `token_budget` tokens: the full table when it fits, otherwise the
+    top/bottom performers plus aggregate stats for the long tail (shrinking k
+    until it fits). Returns the text and the compaction stats.
+    """
+    original_tokens = estimate_tokens(str(data_summary))
+    rows = data_summary.get("summary") if isinstance(data_summary, dict) else None
+
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        # Unknown shape: keep it verbatim, cut to the budget
+        text = str(data_summary)[:token_budget * CHARS_PER_TOKEN]
+        shown = None
+    else:
+        header = _header(rows, data_summary.get("global_roas", "n/a"))
+        text = "\n".join([header, TABLE_HEADER] + [_row(r) for r in rows])
+        shown = len(rows)
+
+        k = top_k
+        while estimate_tokens(text) > token_budget and k >= 1:
+            performers = _select_performers(rows, k)
+            picked = {id(r) for r in performers}
+            tail = [r for r in rows if id(r) not in picked]
+            lines = [header, f"TOP/BOTTOM PERFORMERS (by ROAS and spend, k={k}):", TABLE_HEADER]
+            lines += [_row(r) for r in performers]
+            if tail:
+                lines.append(_long_tail(tail))
+            text = "\n".join(lines)
+            shown = len(performers)
+            k -= 1
+
+        if estimate_tokens(text) > token_budget:
+            text = text[:token_budget * CHARS_PER_TOKEN]
+
+    compacted_tokens = estimate_tokens(text)
+    return {
+        "text": text,
+        "stats": {
+            "original_tokens": original_tokens,
+            "compacted_tokens": compacted_tokens,
+            "compaction_ratio": round(compacted_tokens / original_tokens, 4) if original_tokens else 1.0,
+            "token_budget": token_budget,
+            "rows_total": len(rows) if isinstance(rows, list) else None,
+            "rows_shown": shown,
+        }
+    }
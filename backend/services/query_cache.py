@@ -0,0 +1,86 @@
+from typing import Any, Callable, Dict, Optional
+
+from ..core import metrics
+from ..core.config import settings
+from ..models.schemas import DatasetInfo
+from .cache import DiskCache, LRUCache, SingleFlight, TieredCache, content_key
+
+# Filters whose value order does not change the result
+UNORDERED_PARAMS = ("channels", "campaigns")
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Request parameters in canonical form: unordered filters sorted, unset values dropped."""
+    normalized = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if name in UNORDERED_PARAMS:
+            value = sorted(set(value))
+        normalized[name] = value
+    return normalized
+
+def _body_bytes(body: str) -> int:
+    return len(body.encode())
+
+class QueryCache:
+    """
+    Encoded JSON bodies of the dataset analytics endpoints, keyed by dataset ID,
+    version (and update time) and the normalized parameters. A new version of a
+    dataset never reads an entry of the previous one, and `invalidate` drops a
+    dataset's entries as soon as it changes so they stop taking space.
+    Identical concurrent misses are computed once. Bodies are cached encoded,
+    so a hit is sent as is: no validation or serialization per request.
+    """
+
+    def __init__(self, max_bytes: int, disk: Optional[DiskCache] = None):
+        # Bodies are sized by their UTF-8 encoding
+        self.tiers = TieredCache(LRUCache(max_bytes=max_bytes, sizeof=_body_bytes), disk)
+        self.flights = SingleFlight()
+        self.invalidations = 0
+
+    @staticmethod
+    def key(info: DatasetInfo, endpoint: str, params: Dict[str, Any]) -> str:
+        # Dataset ID first, so all entries of a dataset can be dropped by prefix (on disk too)
+        digest = content_key(info.version, info.updated_at.isoformat(), endpoint, normalize_params(params))
+        return f"{info.dataset_id}-{digest}"
+
+    def get_or_compute(self, info: DatasetInfo, endpoint: str, params: Dict[str, Any],
+                       compute: Callable[[], str]) -> str:
+        key = self.key(info, endpoint, params)
+        cached = self.tiers.get(key)
+        if cached is not None:
+            metrics.QUERY_CACHE_REQUESTS.labels(endpoint=endpoint, result="hit").inc()
+            return cached
+        metrics.QUERY_CACHE_REQUESTS.labels(endpoint=endpoint, result="miss").inc()
+
+        def run() -> str:
+            body = compute()
+            self.tiers.set(key, body)
+            return body
+
+        return self.flights.do(key, run)
+
+    def invalidate(self, dataset_id: str) -> int:
+        """Drops every cached result of a dataset (all versions). Returns how many entries were removed."""
+        prefix = f"{dataset_id}-"
+        self.invalidations += 1
+        return self.tiers.delete_where(lambda key: key.startswith(prefix))
+
+    def clear(self) -> None:
+        self.tiers.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.tiers.stats(), "single_flight": self.flights.stats(), "invalidations": self.invalidations}
+
+query_cache = QueryCache(
+    settings.QUERY_CACHE_MAX_BYTES,
+    DiskCache(settings.QUERY_CACHE_DIR, max_bytes=settings.QUERY_CACHE_DISK_MAX_BYTES) if settings.QUERY_CACHE_DIR else None
+)
+
+# Memory tier state, read when /metrics is scraped
+metrics.callback("query_cache_bytes", "Bytes held by the in-memory query result cache.", "gauge",
+                 lambda: query_cache.tiers.memory.current_bytes)
+metrics.callback("query_cache_entries", "Results held by the in-memory query result cache.", "gauge",
+                 lambda: len(query_cache.tiers.memory))
+metrics.callback("query_cache_evictions_total", "Results evicted from the in-memory cache to stay under its byte budget.",
+                 "counter", lambda: query_cache.tiers.memory.evictions)
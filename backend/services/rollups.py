@@ -0,0 +1,222 @@
+import threading
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Iterable
+from sqlalchemy import and_, bindparam, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..database.models import CampaignFact, CampaignRollup, IngestedDataset
+from ..models.schemas import DatasetInfo, DatasetQuery
+from . import metrics_engine
+from .dataset_store import DatasetStore
+
+# Grain of the materialized rollups
+GRAIN = ['date', 'channel', 'campaign_name']
+ROLLUP_MEASURES = ['spend', 'revenue', 'clicks', 'conversions', 'row_count']
+
+# Striped locks by dataset ID: concurrent first queries of a dataset in this process
+# wait for the first load instead of racing it for the database write lock (a fixed
+# set shared by hash, so memory stays flat however many datasets are loaded)
+_ingest_locks = [threading.Lock() for _ in range(64)]
+
+def has_dataset(db: Session, dataset_id: str) -> bool:
+    """True if the dataset's facts and rollups are already in the database."""
+    query = select(CampaignRollup.dataset_id).where(CampaignRollup.dataset_id == dataset_id).limit(1)
+    return db.execute(query).first() is not None
+
+def aggregate_to_grain(frame: pd.DataFrame) -> pd.DataFrame:
+    """Collapses validated rows to one row per date x channel x campaign_name."""
+    return frame.groupby(GRAIN, as_index=False, sort=False).agg(
+        spend=('spend', 'sum'),
+        revenue=('revenue', 'sum'),
+        clicks=('clicks', 'sum'),
+        conversions=('conversions', 'sum'),
+        row_count=('spend', 'size'),
+    )
+
+def _upsert_rollups(db: Session, dataset_id: str, grain: pd.DataFrame) -> None:
+    """
+    Adds the chunk totals to the existing rollup rows (insert or increment).
+    Uses a native ON CONFLICT upsert on SQLite and Postgres.
+    """
+    records = grain.assign(dataset_id=dataset_id).to_dict(orient='records')
+    if not records:
+        return
+
+    table = CampaignRollup.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['dataset_id', *GRAIN],
+            set_={m: table.c[m] + stmt.excluded[m] for m in ROLLUP_MEASURES}
+        )
+        db.execute(stmt, records)
+        return
+
+    # Portable fallback for other databases: update, then insert the missing keys
+    for record in records:
+        key = (table.c.dataset_id == dataset_id) & (table.c.date == record['date']) \
+            & (table.c.channel == record['channel']) & (table.c.campaign_name == record['campaign_name'])
+        updated = db.execute(
+            table.update().where(key).values({m: table.c[m] + record[m] for m in ROLLUP_MEASURES})
+        )
+        if updated.rowcount == 0:
+            db.execute(table.insert().values(record))
+
+def ingest_batches(db: Session, dataset_id: str, batches: Iterable[pd.DataFrame]) -> int:
+    """
+    Writes raw facts and incrementally updates the rollups, batch by batch,
+    in a single transaction. Returns the number of fact rows written.
+    """
+    try:
+        written = _write_batches(db, dataset_id, batches)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return written
+
+def _write_batches(db: Session, dataset_id: str, batches: Iterable[pd.DataFrame]) -> int:
+    facts = CampaignFact.__table__
+    written = 0
+    for frame in batches:
+        if frame.empty:
+            continue
+        rows = frame[GRAIN + metrics_engine.AGGREGATE_COLUMNS].assign(dataset_id=dataset_id)
+        db.execute(facts.insert(), rows.to_dict(orient='records'))
+        _upsert_rollups(db, dataset_id, aggregate_to_grain(frame))
+        written += len(frame)
+    return written
+
+def replace_keys(db: Session, dataset_id: str, keys: pd.DataFrame, batches: Iterable[pd.DataFrame]) -> int:
+    """
+    Applies an append: deletes the facts and rollups of every date x channel x
+    campaign_name in `keys`, then writes `batches` (the rows replacing them), in
+    a single transaction. Both deletes go through the grain indexes, so the cost
+    follows the number of keys, not the size of the dataset.
+    Returns the number of fact rows written.
+    """
+    params = [
+        {'k_date': d, 'k_channel': ch, 'k_campaign': cmp}
+        for d, ch, cmp in zip(pd.to_datetime(keys['date']).dt.date, keys['channel'], keys['campaign_name'])
+    ]
+    try:
+        if params:
+            for table in (CampaignFact.__table__, CampaignRollup.__table__):
+                stmt = table.delete().where(and_(
+                    table.c.dataset_id == dataset_id,
+                    table.c.date == bindparam('k_date'),
+                    table.c.channel == bindparam('k_channel'),
+                    table.c.campaign_name == bindparam('k_campaign'),
+                ))
+                db.execute(stmt, params)
+        written = _write_batches(db, dataset_id, batches)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return written
+
+def _claim(db: Session, dataset_id: str) -> bool:
+    """
+    Inserts the dataset's ingest marker in the current transaction.
+    False if another loader already committed it (the transaction must then be rolled back).
+    """
+    record = {'dataset_id': dataset_id, 'ingested_at': datetime.now(timezone.utc).replace(tzinfo=None)}
+    table = IngestedDataset.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(table).values(record).on_conflict_do_nothing(index_elements=['dataset_id'])
+        return db.execute(stmt).rowcount == 1
+
+    # Portable fallback: the primary key rejects the second marker
+    try:
+        with db.begin_nested():
+            db.execute(table.insert().values(record))
+    except IntegrityError:
+        return False
+    return True
+
+def ensure_ingested(db: Session, store: DatasetStore, info: DatasetInfo, batch_size: int) -> int:
+    """
+    Loads a stored dataset into the facts/rollup tables unless it is already there
+    (identical re-uploads and datasets created before the database existed).
+    The load is gated by the dataset's marker row, inserted in the same
+    transaction: concurrent loaders (threads or processes) wait on it and
+    only the first one writes. Returns the number of fact rows written.
+    """
+    if has_dataset(db, info.dataset_id):
+        return 0
+    with _ingest_locks[hash(info.dataset_id) % len(_ingest_locks)]:
+        try:
+            if not _claim(db, info.dataset_id):
+                db.rollback()
+                return 0
+            written = _write_batches(db, info.dataset_id, store.iter_batches(info, batch_size))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return written
+
+def channel_totals(db: Session, dataset_id: str) -> pd.DataFrame:
+    """Per-channel sums of the whole dataset (what a dataset summary is computed from)."""
+    measures = [func.sum(getattr(CampaignRollup, c)) for c in metrics_engine.AGGREGATE_COLUMNS]
+    stmt = (
+        select(CampaignRollup.channel, *measures)
+        .where(CampaignRollup.dataset_id == dataset_id)
+        .group_by(CampaignRollup.channel)
+        .order_by(CampaignRollup.channel)
+    )
+    return pd.DataFrame(db.execute(stmt).all(), columns=['channel'] + metrics_engine.AGGREGATE_COLUMNS)
+
+def daily_totals(db: Session, dataset_id: str, query: DatasetQuery) -> pd.DataFrame:
+    """Spend and revenue per date x channel (the input of the time-series endpoint)."""
+    stmt = (
+        select(CampaignRollup.date, CampaignRollup.channel,
+               func.sum(CampaignRollup.spend), func.sum(CampaignRollup.revenue))
+        .where(CampaignRollup.dataset_id == dataset_id)
+    )
+    if query.start_date:
+        stmt = stmt.where(CampaignRollup.date >= query.start_date)
+    if query.end_date:
+        stmt = stmt.where(CampaignRollup.date <= query.end_date)
+    if query.channels:
+        stmt = stmt.where(CampaignRollup.channel.in_(query.channels))
+    if query.campaigns:
+        stmt = stmt.where(CampaignRollup.campaign_name.in_(query.campaigns))
+    stmt = stmt.group_by(CampaignRollup.date, CampaignRollup.channel)
+    return pd.DataFrame(db.execute(stmt).all(), columns=['date', 'channel', 'spend', 'revenue'])
+
+def query_rollups(db: Session, dataset_id: str, query: DatasetQuery) -> pd.DataFrame:
+    """
+    Answers a DatasetQuery from the pre-aggregated rows: totals per requested
+    dimensions, with ROAS/CPA/CR derived on the result.
+    """
+    dims = [getattr(CampaignRollup, d) for d in query.group_by]
+    measures = [func.sum(getattr(CampaignRollup, c)).label(c) for c in metrics_engine.AGGREGATE_COLUMNS]
+
+    stmt = select(*dims, *measures).where(CampaignRollup.dataset_id == dataset_id)
+    if query.start_date:
+        stmt = stmt.where(CampaignRollup.date >= query.start_date)
+    if query.end_date:
+        stmt = stmt.where(CampaignRollup.date <= query.end_date)
+    if query.channels:
+        stmt = stmt.where(CampaignRollup.channel.in_(query.channels))
+    if query.campaigns:
+        stmt = stmt.where(CampaignRollup.campaign_name.in_(query.campaigns))
+    stmt = stmt.group_by(*dims).order_by(*dims)
+
+    totals = pd.DataFrame(db.execute(stmt).all(), columns=query.group_by + metrics_engine.AGGREGATE_COLUMNS)
+    return metrics_engine.compute_metrics(totals, keys=query.group_by)
+
+def rollup_cells(db: Session, dataset_id: str) -> pd.DataFrame:
+    """Every rollup row of a dataset (date x channel x campaign_name totals), unsorted."""
+    columns = [getattr(CampaignRollup, c) for c in GRAIN + ROLLUP_MEASURES]
+    stmt = select(*columns).where(CampaignRollup.dataset_id == dataset_id)
+    return pd.DataFrame(db.execute(stmt).all(), columns=GRAIN + ROLLUP_MEASURES)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+# Bucket -> pandas period (weeks start on Monday)
+BUCKET_PERIODS = {"day": "D", "week": "W-SUN", "month": "M"}
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the
+    visual shape of the series (first and last point always kept).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third vertex of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected.append(a)
+    selected.append(n - 1)
+    return np.asarray(selected)
+
+def build_series(daily: pd.DataFrame, metric: str, bucket: str, max_points: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Turns daily totals (date, channel, spend, revenue) into one series per channel:
+    sums per day/week/month bucket, derives the metric (ROAS after summing),
+    then downsamples each series to `max_points` with LTTB.
+    """
+    if daily.empty:
+        return []
+
+    dates = pd.to_datetime(daily['date'])
+    frame = daily.assign(bucket=dates.dt.to_period(BUCKET_PERIODS[bucket]).dt.start_time)
+    totals = frame.groupby(['channel', 'bucket'], sort=True)[['spend', 'revenue']].sum().reset_index()
+
+    if metric == "roas":
+        spend = totals['spend'].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(spend > 0, totals['revenue'].to_numpy(dtype='float64') / spend, 0.0)
+    else:
+        values = totals[metric].to_numpy(dtype='float64')
+    totals['value'] = np.round(values, 2)
+
+    series = []
+    for channel, group in totals.groupby('channel', sort=True):
+        x = group['bucket'].to_numpy(dtype='datetime64[D]').astype('int64').astype('float64')
+        y = group['value'].to_numpy()
+        keep = lttb_indices(x, y, max_points) if max_points else np.arange(len(group))
+        series.append({
+            'channel': str(channel),
+            'dates': group['bucket'].dt.date.to_numpy()[keep].tolist(),
+            'values': y[keep].tolist(),
+            'points_total': len(group),
+        })
+    return series
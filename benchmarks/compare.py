@@ -0,0 +1,51 @@
+"""
+Compares two benchmark result files stage by stage.
+
+    python -m benchmarks.compare base.json new.json [--threshold 0.10] [--fail-on-regression]
+
+A stage regresses when its best time grew by more than `threshold` (10% by default).
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+def _load(path: str) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    with open(path) as f:
+        report = json.load(f)
+    return {(r["stage"], r["rows"]): r for r in report["results"]}
+
+def compare(base: Dict[Tuple[str, int], Dict[str, Any]], new: Dict[Tuple[str, int], Dict[str, Any]],
+            threshold: float) -> List[Dict[str, Any]]:
+    """One row per (stage, rows) present in both runs, with the time ratio new/base."""
+    rows = []
+    for key in sorted(base.keys() & new.keys()):
+        before, after = base[key]["seconds_min"], new[key]["seconds_min"]
+        ratio = after / before if before > 0 else None
+        rows.append({
+            "stage": key[0], "rows": key[1], "base_seconds": before, "new_seconds": after, "ratio": ratio,
+            "regression": ratio is not None and ratio > 1 + threshold,
+        })
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compares two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%).")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on any regression.")
+    args = parser.parse_args(argv)
+
+    rows = compare(_load(args.base), _load(args.new), args.threshold)
+    print(f"{'stage':<30} {'rows':>12} {'base (s)':>12} {'new (s)':>12} {'ratio':>8}")
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "-"
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['stage']:<30} {row['rows']:>12,} {row['base_seconds']:>12.4f} {row['new_seconds']:>12.4f} {ratio:>8}{flag}")
+
+    regressions = sum(row["regression"] for row in rows)
+    print(f"\n{len(rows)} comparable stages, {regressions} regression(s) above {args.threshold:.0%}.")
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
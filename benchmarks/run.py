@@ -0,0 +1,156 @@
+"""
+Benchmark suite: times every stage of the pipeline on synthetic campaign data.
+
+    python -m benchmarks.run                                  # 1k, 10k, 100k rows
+    python -m benchmarks.run --scale full --output bench.json # up to 10M rows
+    python -m benchmarks.run --rows 50000 --nan-rate 0.01 --invalid-rate 0.02
+
+Runs against a throwaway database and dataset folder (never ./data). Results are
+written as JSON (sorted keys, one entry per stage and size) so two runs can be
+diffed or compared with `python -m benchmarks.compare base.json new.json`.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .startup import startup_stage
+from .synthetic import SyntheticConfig, write_csv
+
+SCALES = {
+    "small": [1_000, 10_000, 100_000],
+    "full": [1_000, 10_000, 100_000, 1_000_000, 10_000_000],
+}
+
+logger = logging.getLogger("benchmarks")
+
+# Bump when the layout of the results file changes
+RESULTS_FORMAT = 1
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _environment() -> Dict[str, Any]:
+    import fastapi, numpy, pandas, pyarrow, pydantic
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {module.__name__: module.__version__ for module in (fastapi, numpy, pandas, pyarrow, pydantic)},
+    }
+
+def _isolate(workdir: str) -> None:
+    """Points the app at a scratch database and dataset folder. Must run before the backend is imported."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["DATASET_DIR"] = os.path.join(workdir, "datasets")
+    os.environ["AI_PROVIDER"] = "stub"
+
+def _log(results: List[Dict[str, Any]], unit: str) -> None:
+    for result in results:
+        rate = result["rows_per_second"]
+        logger.info("  %-30s %10.4fs  %14s %s/s", result["stage"], result["seconds_min"],
+                     f"{rate:,.0f}" if rate else "-", unit)
+
+def run(sizes: List[int], config: SyntheticConfig, chunk_size: int, repeat: int, leads: int,
+        batch_size: int, workdir: str, stages: List[str]) -> Dict[str, Any]:
+    """Runs the selected stages at every size and returns the report (see RESULTS_FORMAT)."""
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from . import stages as bench
+
+    results = []
+    if "startup" in stages:
+        results.append(startup_stage(repeat))
+        _log(results, "rows")
+
+    with TestClient(app) as client:
+        for rows in sizes if {"pipeline", "upload"} & set(stages) else []:
+            sized = SyntheticConfig(**{**config.to_dict(), "rows": rows})
+            csv_path = os.path.join(workdir, f"campaigns_{rows}.csv")
+            start = time.perf_counter()
+            csv_bytes = write_csv(sized, csv_path)
+            logger.info("%s rows: generated %.1f MB in %.1fs", f"{rows:,}", csv_bytes / 1e6, time.perf_counter() - start)
+
+            first = len(results)
+            if "pipeline" in stages:
+                results.extend(bench.pipeline_stages(csv_path, rows, chunk_size, repeat))
+            if "upload" in stages:
+                results.append(bench.upload_stage(client, csv_path, rows, chunk_size, repeat))
+            os.remove(csv_path)
+
+            _log(results[first:], "rows")
+
+        if "webhook" in stages:
+            first = len(results)
+            results.extend(bench.webhook_stages(client, config, leads, batch_size, repeat))
+            _log(results[first:], "leads")
+
+    return {
+        "format": RESULTS_FORMAT,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "environment": _environment(),
+        "parameters": {
+            "sizes": sizes, "chunk_size": chunk_size, "repeat": repeat, "leads": leads,
+            "batch_size": batch_size, "stages": stages,
+            "data": {key: value for key, value in config.to_dict().items() if key != "rows"},
+        },
+        "results": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Times each stage of the marketing pipeline on synthetic data.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Preset list of sizes.")
+    parser.add_argument("--rows", type=int, nargs="+", help="Explicit sizes (overrides --scale).")
+    parser.add_argument("--stages", nargs="+", choices=["startup", "pipeline", "upload", "webhook"],
+                        default=["startup", "pipeline", "upload", "webhook"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (best and median are reported).")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--channels", type=int, default=6)
+    parser.add_argument("--campaigns", type=int, default=40)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--start-date", default="2024-01-01")
+    parser.add_argument("--nan-rate", type=float, default=0.0)
+    parser.add_argument("--invalid-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--leads", type=int, default=10_000, help="Leads sent to the bulk webhook per repeat.")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="Leads per bulk webhook request.")
+    parser.add_argument("--output", help="Results file (JSON). Printed to stdout when omitted.")
+    args = parser.parse_args(argv)
+
+    # Progress on stderr; the app's own (per-request) logs are silenced
+    logging.basicConfig(level=logging.WARNING, format="%(message)s", stream=sys.stderr)
+    logger.setLevel(logging.INFO)
+    config = SyntheticConfig(
+        rows=0, channels=args.channels, campaigns=args.campaigns, days=args.days, start_date=args.start_date,
+        nan_rate=args.nan_rate, invalid_rate=args.invalid_rate, seed=args.seed
+    )
+
+    with tempfile.TemporaryDirectory(prefix="marketing-bench-") as workdir:
+        _isolate(workdir)
+        report = run(args.rows or SCALES[args.scale], config, args.chunk_size, args.repeat,
+                     args.leads, args.batch_size, workdir, args.stages)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        logger.info("Results written to %s", args.output)
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
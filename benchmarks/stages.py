@@ -0,0 +1,187 @@
+import shutil
+import statistics
+import time
+import uuid
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from backend.core.config import settings
+from backend.database.db import SessionLocal
+from backend.database.models import CampaignFact, CampaignRollup, IngestedDataset
+from backend.models.schemas import CampaignRecord, QueryResponse
+from backend.services import dataset_store, ingestion, metrics_engine, rollups
+from backend.services.lead_buffer import lead_buffer
+from backend.services.query_cache import query_cache
+from .synthetic import SyntheticConfig, generate_leads
+
+# The row-object entry point builds one Pydantic model per row: only measured up to this size
+RECORDS_MAX_ROWS = 100_000
+
+# Single-lead webhook calls per repeat (the bulk endpoint is measured on every lead)
+WEBHOOK_SINGLE_MAX_CALLS = 1000
+
+def _result(stage: str, rows: int, timings: List[float], **detail: Any) -> Dict[str, Any]:
+    """One line of the report: best and median wall time over the repeats, and throughput."""
+    best = min(timings)
+    return {
+        "stage": stage,
+        "rows": rows,
+        "repeats": len(timings),
+        "seconds_min": round(best, 6),
+        "seconds_median": round(statistics.median(timings), 6),
+        "rows_per_second": round(rows / best, 1) if best > 0 else None,
+        "detail": detail,
+    }
+
+def _timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def pipeline_stages(csv_path: str, rows: int, chunk_size: int, repeat: int) -> List[Dict[str, Any]]:
+    """
+    Times the upload pipeline stage by stage, in process (no HTTP):
+    - csv_parse: reading + normalizing the chunks.
+    - validation: validate_frame on every chunk.
+    - calculate_performance: the chunked accumulator the upload endpoint uses.
+    - calculate_performance_records: the row-object entry point (small sizes only).
+    - json_serialization: the analysis and a date x channel x campaign query result.
+    Each repeat is one streaming pass over the file; stage times are summed over the chunks.
+    """
+    timings = {name: [] for name in ("csv_parse", "validation", "calculate_performance", "json_serialization")}
+    records_timings = []
+    keep_frames = rows <= RECORDS_MAX_ROWS
+
+    for _ in range(repeat):
+        parse = validate = compute = 0.0
+        accumulator = metrics_engine.PerformanceAccumulator()
+        report = ingestion.ValidationReportBuilder(settings.VALIDATION_MAX_REPORTED_ROWS)
+        grains, frames = [], []
+
+        with open(csv_path, "rb") as source:
+            chunks = ingestion.read_upload_chunks(source, chunk_size)
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                parse += time.perf_counter() - start
+                if chunk is None:
+                    break
+
+                start = time.perf_counter()
+                result = ingestion.validate_frame(chunk)
+                report.add(result)
+                validate += time.perf_counter() - start
+
+                start = time.perf_counter()
+                accumulator.add(result.frame)
+                compute += time.perf_counter() - start
+
+                grains.append(rollups.aggregate_to_grain(result.frame))
+                if keep_frames:
+                    frames.append(result.frame)
+
+        start = time.perf_counter()
+        analysis = accumulator.result()
+        analysis.validation = report.build()
+        compute += time.perf_counter() - start
+
+        # Payloads the API returns: the upload analysis and a query result at the rollup grain
+        grain = rollups.aggregate_to_grain(pd.concat(grains))
+        query = QueryResponse(
+            dataset_id="benchmark", version=1, group_by=rollups.GRAIN,
+            rows=grain.assign(date=grain["date"].dt.date).to_dict(orient="records")
+        )
+        serialize = _timed(lambda: (analysis.model_dump_json(), query.model_dump_json()))
+
+        for name, seconds in zip(timings, (parse, validate, compute, serialize)):
+            timings[name].append(seconds)
+
+        if keep_frames:
+            records = [CampaignRecord(**r) for r in pd.concat(frames).to_dict(orient="records")]
+            records_timings.append(_timed(lambda: metrics_engine.calculate_performance(records)))
+
+    results = [
+        _result("csv_parse", rows, timings["csv_parse"], chunk_size=chunk_size),
+        _result("validation", rows, timings["validation"], invalid_rows=analysis.validation.invalid_rows),
+        _result("calculate_performance", rows, timings["calculate_performance"], channels=len(analysis.summary)),
+        _result("json_serialization", rows, timings["json_serialization"], serialized_rows=len(query.rows)),
+    ]
+    if records_timings:
+        results.append(_result("calculate_performance_records", rows, records_timings))
+    return results
+
+def _drop_dataset(dataset_id: str) -> None:
+    """Removes a stored dataset (files, facts, rollups, ingest marker) so the next upload does the full work again."""
+    shutil.rmtree(dataset_store.get_store().path(dataset_id), ignore_errors=True)
+    with SessionLocal() as db:
+        for table in (CampaignFact, CampaignRollup, IngestedDataset):
+            db.query(table).filter(table.dataset_id == dataset_id).delete()
+        db.commit()
+    query_cache.invalidate(dataset_id)
+
+def upload_stage(client: TestClient, csv_path: str, rows: int, chunk_size: int, repeat: int) -> Dict[str, Any]:
+    """End-to-end POST /analytics/upload-csv: parsing, validation, metrics, Parquet store and rollups."""
+    timings = []
+    for _ in range(repeat):
+        with open(csv_path, "rb") as f:
+            start = time.perf_counter()
+            response = client.post(
+                "/analytics/upload-csv",
+                params={"chunk_size": chunk_size, "on_invalid": "skip"},
+                files={"file": ("benchmark.csv", f, "text/csv")}
+            )
+            timings.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"Upload failed ({response.status_code}): {response.text[:500]}")
+        _drop_dataset(response.json()["dataset_id"])
+    return _result("upload_end_to_end", rows, timings)
+
+def _wait_for_flush(timeout: float = 300.0) -> None:
+    deadline = time.monotonic() + timeout
+    while lead_buffer.depth and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def webhook_stages(client: TestClient, config: SyntheticConfig, leads: int, batch_size: int,
+                   repeat: int) -> List[Dict[str, Any]]:
+    """
+    Webhook throughput through the app (validation, dedupe, queueing):
+    - webhook_single: one POST per lead (up to WEBHOOK_SINGLE_MAX_CALLS).
+    - webhook_bulk: JSON batches of `batch_size`; timed until the write-behind
+      buffer has flushed every lead to the database. 429s are retried.
+    Every repeat uses new e-mail addresses, so no lead is rejected as a duplicate.
+    """
+    single_calls = min(leads, WEBHOOK_SINGLE_MAX_CALLS)
+    single_timings, bulk_timings, accept_timings = [], [], []
+    retries = 0
+
+    for _ in range(repeat):
+        payloads = generate_leads(single_calls, config, run_id=uuid.uuid4().hex[:12])
+        start = time.perf_counter()
+        for payload in payloads:
+            client.post("/integrations/webhook/ingest-data", json=payload)
+        _wait_for_flush()
+        single_timings.append(time.perf_counter() - start)
+
+        payloads = generate_leads(leads, config, run_id=uuid.uuid4().hex[:12])
+        start = time.perf_counter()
+        for offset in range(0, leads, batch_size):
+            batch = payloads[offset:offset + batch_size]
+            while True:
+                response = client.post("/integrations/webhook/ingest-bulk", json=batch)
+                if response.status_code != 429:
+                    break
+                retries += 1
+                time.sleep(float(response.headers.get("Retry-After", "1")))
+            if response.status_code != 200 or response.json()["accepted"] != len(batch):
+                raise RuntimeError(f"Bulk ingest failed ({response.status_code}): {response.text[:500]}")
+        accept_timings.append(time.perf_counter() - start)
+        _wait_for_flush()
+        bulk_timings.append(time.perf_counter() - start)
+
+    return [
+        _result("webhook_single", single_calls, single_timings),
+        _result("webhook_bulk", leads, bulk_timings, batch_size=batch_size,
+                accept_seconds_min=round(min(accept_timings), 6), retries_429=retries),
+    ]
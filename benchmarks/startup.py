@@ -0,0 +1,63 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+# Kept free of app imports: the import is measured in a fresh interpreter.
+
+# Modules that must only be imported on first use (provider SDKs)
+LAZY_MODULES = ["google.generativeai", "openai"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+{after}
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+def import_profile(module: str = "backend.main", after: str = "", env: Optional[Dict[str, str]] = None,
+                   top: int = 10) -> Dict[str, Any]:
+    """
+    Imports `module` in a new interpreter (what a fresh worker/pod pays) and returns
+    the wall time, which LAZY_MODULES are loaded (after running the `after` statement,
+    if any), and the `top` slowest packages by cumulative time (`python -X importtime`).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", _PROBE.format(module=module, after=after, lazy=LAZY_MODULES)],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, **(env or {})},
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["slowest"] = _slowest_packages(completed.stderr, exclude=module.split(".")[0], top=top)
+    return result
+
+def _slowest_packages(importtime_output: str, exclude: str, top: int) -> List[Dict[str, Any]]:
+    """Packages (top-level names, wherever they were first imported) by cumulative import time."""
+    packages = []
+    for line in importtime_output.splitlines():
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        if "." not in name and name != exclude:
+            packages.append({"module": name, "seconds": int(parts[1]) / 1e6})
+    return sorted(packages, key=lambda p: p["seconds"], reverse=True)[:top]
+
+def startup_stage(repeat: int) -> Dict[str, Any]:
+    """Cold import of the API (backend.main), in the same layout as the other stage results."""
+    profiles = [import_profile() for _ in range(repeat)]
+    timings = [p["seconds"] for p in profiles]
+    return {
+        "stage": "import_backend",
+        "rows": 0,
+        "repeats": repeat,
+        "seconds_min": round(min(timings), 6),
+        "seconds_median": round(statistics.median(timings), 6),
+        "rows_per_second": None,
+        "detail": {"eager_lazy_modules": profiles[0]["loaded"], "slowest": profiles[0]["slowest"]},
+    }
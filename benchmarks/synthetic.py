@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterator, List
+
+# Kept free of app imports: usable to produce sample files without the backend installed.
+
+# Rows are generated in fixed-size blocks, each from its own seed, so the output
+# only depends on the config (not on how the caller consumes it)
+BLOCK_ROWS = 500_000
+
+CHANNEL_NAMES = ["Google Ads", "Meta", "TikTok", "LinkedIn", "Bing", "Pinterest", "Snapchat", "X"]
+
+# Typical ROAS per channel (revenue is spend x a noisy multiple of this)
+CHANNEL_ROAS = [3.2, 2.4, 1.6, 0.9, 2.8, 1.2, 0.7, 1.9]
+
+COLUMNS = ["date", "channel", "campaign_name", "spend", "revenue", "clicks", "conversions"]
+
+class SyntheticConfig:
+    """
+    Shape of a synthetic campaign export.
+    - `nan_rate`: share of rows with one empty cell (in any column; an empty
+      campaign_name is still valid, an empty required field is not).
+    - `invalid_rate`: share of rows with a malformed value (unparseable date,
+      negative spend or negative clicks).
+    The same config (seed included) always produces the same rows.
+    """
+
+    def __init__(self, rows: int, channels: int = 6, campaigns: int = 40, days: int = 365,
+                 start_date: str = "2024-01-01", nan_rate: float = 0.0, invalid_rate: float = 0.0, seed: int = 42):
+        if rows < 0 or channels < 1 or campaigns < 1 or days < 1:
+            raise ValueError("rows must be >= 0; channels, campaigns and days must be >= 1.")
+        if not (0 <= nan_rate <= 1 and 0 <= invalid_rate <= 1):
+            raise ValueError("nan_rate and invalid_rate must be between 0 and 1.")
+        self.rows = rows
+        self.channels = channels
+        self.campaigns = campaigns
+        self.days = days
+        self.start_date = start_date
+        self.nan_rate = nan_rate
+        self.invalid_rate = invalid_rate
+        self.seed = seed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    def with_seed(self, seed: int) -> "SyntheticConfig":
+        return SyntheticConfig(**{**self.to_dict(), "seed": seed})
+
+def channel_names(count: int) -> List[str]:
+    return [CHANNEL_NAMES[i] if i < len(CHANNEL_NAMES) else f"Channel {i + 1}" for i in range(count)]
+
+def campaign_names(config: SyntheticConfig) -> List[str]:
+    """Campaign k runs on channel k % channels, so every campaign maps to one channel."""
+    channels = channel_names(config.channels)
+    return [f"{channels[k % config.channels].replace(' ', '')}_CMP_{k:04d}" for k in range(config.campaigns)]
+
+def _block(config: SyntheticConfig, index: int, rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng([config.seed, index])
+    channels = np.array(channel_names(config.channels), dtype=object)
+    campaigns = np.array(campaign_names(config), dtype=object)
+    roas = np.resize(np.array(CHANNEL_ROAS), config.channels)
+
+    campaign = rng.integers(0, config.campaigns, rows)
+    channel = campaign % config.channels
+    day = rng.integers(0, config.days, rows)
+    dates = (np.datetime64(config.start_date, "D") + day).astype(str).astype(object)
+
+    spend = np.round(rng.lognormal(mean=4.0, sigma=1.0, size=rows), 2)
+    revenue = np.round(spend * roas[channel] * rng.lognormal(mean=0.0, sigma=0.5, size=rows), 2)
+    clicks = rng.poisson(spend * 1.5)
+    conversions = rng.binomial(clicks, 0.04)
+
+    frame = pd.DataFrame({
+        "date": dates,
+        "channel": channels[channel],
+        "campaign_name": campaigns[campaign],
+        "spend": spend,
+        "revenue": revenue,
+        "clicks": pd.array(clicks, dtype="Int64"),
+        "conversions": pd.array(conversions, dtype="Int64"),
+    })
+
+    # Malformed values: one broken field per affected row
+    invalid = np.flatnonzero(rng.random(rows) < config.invalid_rate)
+    kind = rng.integers(0, 3, len(invalid))
+    frame.loc[invalid[kind == 0], "date"] = "not-a-date"
+    frame.loc[invalid[kind == 1], "spend"] = -1.0
+    frame.loc[invalid[kind == 2], "clicks"] = -1
+
+    # Empty cells: one column per affected row
+    empty = np.flatnonzero(rng.random(rows) < config.nan_rate)
+    column = rng.integers(0, len(COLUMNS), len(empty))
+    for i, name in enumerate(COLUMNS):
+        frame.loc[empty[column == i], name] = None
+
+    frame.index = pd.RangeIndex(index * BLOCK_ROWS, index * BLOCK_ROWS + rows)
+    return frame
+
+def iter_campaign_data(config: SyntheticConfig) -> Iterator[pd.DataFrame]:
+    """Yields the rows in blocks of up to BLOCK_ROWS (bounded memory for very large exports)."""
+    for index, start in enumerate(range(0, config.rows, BLOCK_ROWS)):
+        yield _block(config, index, min(BLOCK_ROWS, config.rows - start))
+
+def generate_campaign_data(config: SyntheticConfig) -> pd.DataFrame:
+    """All rows as one DataFrame (columns as in a CSV export)."""
+    blocks = list(iter_campaign_data(config))
+    return pd.concat(blocks) if blocks else pd.DataFrame(columns=COLUMNS)
+
+def write_csv(config: SyntheticConfig, path: str) -> int:
+    """Writes the export as a CSV file block by block. Returns the file size in bytes."""
+    with open(path, "w", newline="") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        for block in iter_campaign_data(config):
+            block.to_csv(f, header=False, index=False)
+        return f.tell()
+
+def generate_leads(count: int, config: SyntheticConfig, run_id: str = "0", vip_rate: float = 0.02) -> List[Dict[str, Any]]:
+    """
+    Webhook payloads for `count` distinct leads spread over the config's campaigns
+    (campaign_id matches campaign_name, so they join to the spend data).
+    Change `run_id` to get new e-mail addresses (leads are deduplicated).
+    """
+    rng = np.random.default_rng([config.seed, count])
+    channels = channel_names(config.channels)
+    campaigns = campaign_names(config)
+    picks = rng.integers(0, config.campaigns, count)
+    vips = rng.random(count) < vip_rate
+    return [
+        {
+            "source": channels[k % config.channels],
+            "campaign_id": campaigns[k],
+            "lead_email": f"lead{i}.{run_id}@example.com",
+            "metadata": {"is_vip": bool(vip)},
+        }
+        for i, (k, vip) in enumerate(zip(picks.tolist(), vips.tolist()))
+    ]
@@ -10,6 +10,27 @@ import streamlit as st
 import pandas as pd
 from frontend.components.sidebar import render_sidebar
 from frontend.utils.api_client import send_csv_to_backend
+from frontend.utils.data_cache import get_datasets, invalidate_dataset_cache
+
+# Rows parsed for the preview (the full file is only read by the Backend)
+PREVIEW_ROWS = 5
+
+# Accepted uploads: CSV (plain or compressed) and columnar exports
+UPLOAD_TYPES = ["csv", "gz", "zst", "parquet", "arrow", "feather", "ipc"]
+
+def read_preview(file) -> pd.DataFrame:
+    """First rows of the upload, without reading the whole file"""
+    name = file.name.lower()
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return next(pq.ParquetFile(file).iter_batches(batch_size=PREVIEW_ROWS)).to_pandas()
+    if name.endswith((".arrow", ".feather", ".ipc")):
+        import pyarrow as pa
+        return pa.ipc.open_file(file).get_batch(0).slice(0, PREVIEW_ROWS).to_pandas()
+    if name.endswith(".zst"):
+        import pyarrow as pa
+        return pd.read_csv(pa.CompressedInputStream(pa.BufferReader(file.getvalue()), "zstd"), nrows=PREVIEW_ROWS)
+    return pd.read_csv(file, nrows=PREVIEW_ROWS, compression="gzip" if name.endswith(".gz") else None)
 
 # 1. Page Configuration
 st.set_page_config(page_title="Upload Data", page_icon="📥", layout="wide")
@@ -29,38 +50,53 @@ render_sidebar()
 
 # 4. Main Content
 st.title("📥 Data Ingestion")
-st.markdown("Upload your campaign performance data (CSV) to initialize the analysis engine.")
+st.markdown("Upload your campaign performance data (CSV, compressed CSV, Parquet or Arrow/Feather) to initialize the analysis engine.")
 
 # File Uploader Widget
-uploaded_file = st.file_uploader("Drag and drop your CSV file here", type=["csv"])
+uploaded_file = st.file_uploader("Drag and drop your data file here", type=UPLOAD_TYPES)
 
 if uploaded_file:
     # A. Show Preview
     st.subheader("📄 File Preview")
     try:
-        df_preview = pd.read_csv(uploaded_file)
-        st.dataframe(df_preview.head(), use_container_width=True)
+        df_preview = read_preview(uploaded_file)
+        st.dataframe(df_preview, use_container_width=True)
         
         # IMPORTANT: Reset file pointer to the beginning before sending to API
         uploaded_file.seek(0)
         
         col1, col2 = st.columns([1, 4])
+
+        # Daily refreshes: merge the export into the loaded dataset instead of starting over
+        append_to = None
+        if st.session_state.get("dataset_id"):
+            if col2.checkbox(f"Append to dataset {st.session_state['dataset_id']} (rows with the same date, channel and campaign are replaced)"):
+                append_to = st.session_state["dataset_id"]
         
         # B. Action Button
         if col1.button("🚀 Process Data with AI", type="primary"):
             
             # Call Backend API
-            result = send_csv_to_backend(uploaded_file)
+            result = send_csv_to_backend(uploaded_file, append_to=append_to)
             
             if result:
+                # New data: drop memoized responses, frames and figures
+                invalidate_dataset_cache()
+
                 # C. Success Handling
                 st.toast("Analysis Complete!", icon="✅")
                 st.success("Data successfully processed by the Backend Engine.")
+                if append_to:
+                    st.caption(
+                        f"Version {result['version']}: {result['rows_added']:,} rows added, "
+                        f"{result['rows_replaced']:,} replaced; rewritten: {', '.join(result['partitions_rewritten'])}"
+                    )
+                    result = result["summary"]
                 
-                # Store results in Session State (Browser Memory)
-                # This allows the Dashboard page to access this data later
+                # Store only the dataset ID and summary in Session State
+                # The Dashboard and AI pages load everything else from the Backend by ID
+                st.session_state["dataset_id"] = result.get("dataset_id")
                 st.session_state["analysis_result"] = result
-                st.session_state["raw_data"] = df_preview
                 
                 # Show immediate mini-summary
                 st.info(f"Processed {len(result['summary'])} channels. Global ROAS: {result['global_roas']}x")
@@ -70,4 +106,20 @@ if uploaded_file:
 
 else:
     # Empty State
-    st.info("Awaiting file upload...")
\ No newline at end of file
+    st.info("Awaiting file upload...")
+
+# 5. Previously Uploaded Datasets (no need to re-upload)
+datasets = get_datasets()
+if datasets:
+    st.divider()
+    st.subheader("🗂️ Stored Datasets")
+    labels = {
+        d["dataset_id"]: f"{d['dataset_id']} · {d['row_count']:,} rows · {d['start_date']} → {d['end_date']}"
+        for d in datasets
+    }
+    selected = st.selectbox("Load a dataset", options=list(labels), format_func=labels.get)
+    if st.button("📂 Load Dataset"):
+        st.session_state["dataset_id"] = selected
+        st.session_state.pop("analysis_result", None)
+        st.session_state.pop("ai_report", None)
+        st.success(f"Dataset {selected} loaded. Open the Dashboard or AI Insights page.")
\ No newline at end of file
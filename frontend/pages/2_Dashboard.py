@@ -6,10 +6,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 # --------------------------------------------------------
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from frontend.components.sidebar import render_sidebar
+from frontend.utils.charts import BUCKET_LABELS, METRIC_LABELS, roas_bar_chart, spend_pie_chart, trend_chart
+from frontend.utils.data_cache import dataset_version, get_dataset, get_timeseries, summary_frame
 
 # 1. Page Config
 st.set_page_config(page_title="Dashboard", page_icon="📈", layout="wide")
@@ -29,17 +28,23 @@ render_sidebar()
 st.title("📈 Performance Dashboard")
 
 # --- SAFETY CHECK: Did the user upload data? ---
-if "analysis_result" not in st.session_state or "raw_data" not in st.session_state:
+if not st.session_state.get("dataset_id"):
     st.warning("⚠️ No data found. Please upload a CSV file first.")
     st.info("👈 Go to **Upload Data** in the sidebar to get started.")
     st.stop() # Stop execution here if no data
 
-# --- GET DATA FROM SESSION ---
-analysis = st.session_state["analysis_result"] # The JSON from Backend
-raw_df = st.session_state["raw_data"]         # The Raw DataFrame for time charts
+# --- LOAD DATA FROM BACKEND (by dataset ID and version, memoized across reruns) ---
+dataset_id = st.session_state["dataset_id"]
+dataset = get_dataset(dataset_id)
+if not dataset:
+    st.stop()
+version = dataset_version(dataset)
 
-# Convert Backend Summary List to DataFrame for easy plotting
-summary_df = pd.DataFrame(analysis["summary"])
+analysis = dataset["summary"] # The precomputed summary stored by the Backend
+st.caption(f"Dataset `{dataset_id}` · {dataset['row_count']:,} rows · {dataset['start_date']} → {dataset['end_date']}")
+
+# Backend Summary List as a DataFrame (cached per dataset version)
+summary_df = summary_frame(dataset_id, version)
 
 # --- SECTION 1: HIGH LEVEL KPIS ---
 st.subheader("Global Performance")
@@ -63,55 +68,33 @@ c1, c2 = st.columns([2, 1])
 
 with c1:
     st.subheader("ROAS by Channel")
-    # Bar Chart with Color Coding based on performance
-    fig_bar = px.bar(
-        summary_df,
-        x='channel',
-        y='roas',
-        color='recommendation_status',
-        color_discrete_map={
-            'Good': '#00CC96',   # Green
-            'Warning': '#FFA15A', # Orange
-            'Critical': '#EF553B' # Red
-        },
-        text='roas',
-        title="Efficiency per Channel (ROAS)"
-    )
-    fig_bar.update_traces(texttemplate='%{text:.2f}x', textposition='outside')
-    st.plotly_chart(fig_bar, use_container_width=True)
+    st.plotly_chart(roas_bar_chart(dataset_id, version), use_container_width=True)
 
 with c2:
     st.subheader("Budget Allocation")
-    # Donut Chart
-    fig_pie = px.pie(
-        summary_df,
-        values='total_spend',
-        names='channel',
-        hole=0.4,
-        title="Spend Distribution"
-    )
-    st.plotly_chart(fig_pie, use_container_width=True)
-
-# --- SECTION 3: TIME SERIES (Using Raw Data) ---
-st.subheader("Revenue Trend Over Time")
-
-# Ensure date is datetime
-if 'date' in raw_df.columns:
-    raw_df['date'] = pd.to_datetime(raw_df['date'])
-    # Group by Date and Channel
-    daily_trend = raw_df.groupby(['date', 'channel'])['revenue'].sum().reset_index()
-    
-    fig_line = px.line(
-        daily_trend,
-        x='date',
-        y='revenue',
-        color='channel',
-        markers=True,
-        title="Daily Revenue Performance"
-    )
-    st.plotly_chart(fig_line, use_container_width=True)
+    st.plotly_chart(spend_pie_chart(dataset_id, version), use_container_width=True)
+
+# --- SECTION 3: TIME SERIES (Aggregated and downsampled by the Backend) ---
+st.subheader("Trend Over Time")
+
+# Points per channel line: enough for a full-width chart, small enough for the browser
+MAX_CHART_POINTS = 400
+
+t1, t2 = st.columns(2)
+metric = t1.selectbox("Metric", list(METRIC_LABELS), format_func=METRIC_LABELS.get)
+bucket = t2.radio("Granularity", list(BUCKET_LABELS), horizontal=True, format_func=BUCKET_LABELS.get)
+
+timeseries = get_timeseries(dataset_id, version, metric, bucket, MAX_CHART_POINTS)
+if timeseries and not timeseries[0].empty:
+    points, points_total = timeseries
+    st.plotly_chart(trend_chart(dataset_id, version, metric, bucket, MAX_CHART_POINTS), use_container_width=True)
+
+    points_sent = points["channel"].value_counts()
+    downsampled = [channel for channel, total in points_total.items() if total > points_sent.get(channel, 0)]
+    if downsampled:
+        st.caption(f"Downsampled to {MAX_CHART_POINTS} points per channel (LTTB): {', '.join(downsampled)}")
 else:
-    st.warning("⚠️ 'date' column not found in raw data, skipping trend chart.")
+    st.warning("⚠️ No time series available for this dataset.")
 
 # --- SECTION 4: DETAILED TABLE ---
 with st.expander("View Detailed Metrics Table"):
@@ -1,35 +1,134 @@
+import gzip
+import json
+import os
+import time
 import requests
 import streamlit as st
 import pandas as pd
-from typing import Optional, Dict, Any
+import pyarrow as pa
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 
-# In production, this URL should come from os.getenv()
-API_BASE_URL = "http://127.0.0.1:8000"
+# Backend location (set API_BASE_URL in the environment / .env for deployments)
+API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
+
+# (connect, read) timeouts in seconds per kind of call
+TIMEOUTS = {
+    "health": (2, 2),
+    "default": (3.05, float(os.getenv("API_TIMEOUT_SECONDS", "30"))),
+    "upload": (3.05, float(os.getenv("API_UPLOAD_TIMEOUT_SECONDS", "600"))),
+    "ai": (3.05, float(os.getenv("API_AI_TIMEOUT_SECONDS", "180"))),
+}
+
+# Uploads smaller than this are sent as-is (compression would not pay off)
+GZIP_MIN_BYTES = 64 * 1024
+
+# Tabular results are requested as Arrow IPC streams: decoded straight into columns
+ARROW_HEADERS = {"Accept": "application/vnd.apache.arrow.stream"}
+
+def read_arrow(response: requests.Response) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Decodes an Arrow response into a DataFrame + its (JSON-encoded) schema metadata"""
+    table = pa.ipc.open_stream(response.content).read_all()
+    metadata = {
+        key.decode(): json.loads(value) for key, value in (table.schema.metadata or {}).items()
+        if key != b"pandas"
+    }
+    return table.to_pandas(), metadata
+
+class ApiClient:
+    """
+    Shared HTTP client for every Backend call.
+    - One Session: pooled keep-alive connections instead of a TCP handshake per call.
+    - Timeouts per kind of call (see TIMEOUTS).
+    - Bounded retries with exponential backoff, only for idempotent calls
+      (connection errors and 502/503/504).
+    - Upload bodies compressed with gzip (Content-Encoding: gzip).
+    """
+    RETRY_STATUSES = {502, 503, 504}
+
+    def __init__(self, base_url: str, max_retries: int = 3, backoff_seconds: float = 0.5, pool_size: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, path: str, timeout: str = "default",
+                idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """Sends a request; GET/HEAD (or idempotent=True) are retried on transient failures."""
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD")
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = self.session.request(method, url, timeout=TIMEOUTS[timeout], **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in self.RETRY_STATUSES or last_attempt:
+                    return response
+                response.close()
+            time.sleep(self.backoff_seconds * 2 ** attempt)
+
+    def upload(self, path: str, files: Dict[str, Any], timeout: str = "upload", compress: bool = True,
+               **kwargs) -> requests.Response:
+        """Multipart upload, gzip-compressed when the body is large enough. Never retried."""
+        prepared = self.session.prepare_request(requests.Request("POST", f"{self.base_url}{path}", files=files, **kwargs))
+        if compress and len(prepared.body) >= GZIP_MIN_BYTES:
+            prepared.body = gzip.compress(prepared.body, compresslevel=6)
+            prepared.headers["Content-Encoding"] = "gzip"
+            prepared.headers["Content-Length"] = str(len(prepared.body))
+        return self.session.send(prepared, timeout=TIMEOUTS[timeout])
+
+# Module-level client: Streamlit keeps imported modules across reruns, so the pool is reused
+client = ApiClient(API_BASE_URL)
 
 def get_health_check() -> Optional[Dict[str, Any]]:
     """Checks if Backend is healthy"""
     try:
-        response = requests.get(f"{API_BASE_URL}/", timeout=2)
+        response = client.request("GET", "/", timeout="health", idempotent=False)
         if response.status_code == 200:
             return response.json()
         return None
-    except requests.exceptions.ConnectionError:
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         return None
     except Exception as e:
         st.error(f"Unexpected error: {e}")
         return None
 
-def send_csv_to_backend(file) -> Optional[Dict[str, Any]]:
-    """Uploads CSV to Backend Analysis Engine"""
+def send_csv_to_backend(file, append_to: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Uploads campaign data to Backend Analysis Engine.
+    Accepts CSV (plain, .gz, .zst), Parquet and Arrow/Feather; the Backend detects the format.
+    With `append_to`, the rows are upserted into that stored dataset instead
+    (the response then reports what changed, with the dataset summary under "summary").
+    """
     try:
-        files = {"file": (file.name, file, "text/csv")}
+        is_plain_csv = file.name.lower().endswith(".csv")
+        files = {"file": (file.name, file, "text/csv" if is_plain_csv else "application/octet-stream")}
         with st.spinner("⏳ Sending data to Analytics Engine..."):
-            response = requests.post(f"{API_BASE_URL}/analytics/upload-csv", files=files)
+            # Already-compressed and columnar files are sent as they are
+            path = f"/analytics/datasets/{append_to}/append" if append_to else "/analytics/upload"
+            response = client.upload(path, files=files, compress=is_plain_csv)
         
         if response.status_code == 200:
             return response.json()
         elif response.status_code == 400:
-            st.error(f"⚠️ Validation Error: {response.json().get('detail')}")
+            detail = response.json().get('detail')
+            if isinstance(detail, dict):
+                # Row-level validation failure: show which rows are broken
+                st.error(f"⚠️ Validation Error: {detail.get('message')}")
+                failing_rows = detail.get('report', {}).get('failing_rows', [])
+                if failing_rows:
+                    st.caption(f"First failing rows: {failing_rows[:20]}")
+            else:
+                st.error(f"⚠️ Validation Error: {detail}")
             return None
         else:
             st.error(f"❌ Server Error ({response.status_code}): {response.text}")
@@ -38,19 +137,75 @@ def send_csv_to_backend(file) -> Optional[Dict[str, Any]]:
         st.error(f"Error processing file: {str(e)}")
         return None
 
-# --- MISSING FUNCTION (Esta es la que faltaba) ---
-def request_ai_insights(summary_data: Dict[str, Any]) -> Optional[str]:
+# --- STORED DATASETS ---
+def list_datasets() -> List[Dict[str, Any]]:
+    """Lists the datasets stored in the Backend (most recent first)"""
+    try:
+        response = client.request("GET", "/analytics/datasets")
+        if response.status_code == 200:
+            return response.json()
+        return []
+    except requests.exceptions.RequestException:
+        return []
+
+def fetch_dataset(dataset_id: str) -> Optional[Dict[str, Any]]:
+    """Loads the metadata and precomputed summary of a stored dataset"""
+    try:
+        response = client.request("GET", f"/analytics/datasets/{dataset_id}")
+        if response.status_code == 200:
+            return response.json()
+        st.error(f"❌ Could not load dataset ({response.status_code}): {response.text}")
+        return None
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        st.error("🚨 Cannot connect to the Backend. Is it running?")
+        return None
+
+def query_dataset(dataset_id: str, query: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """Runs a filtered aggregation on a stored dataset and returns the rows"""
+    try:
+        # Read-only query: safe to retry
+        response = client.request("POST", f"/analytics/datasets/{dataset_id}/query", json=query,
+                                  headers=ARROW_HEADERS, idempotent=True)
+        if response.status_code == 200:
+            return read_arrow(response)[0]
+        st.error(f"❌ Query Error ({response.status_code}): {response.text}")
+        return None
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        st.error("🚨 Cannot connect to the Backend. Is it running?")
+        return None
+
+def fetch_timeseries(dataset_id: str, metric: str = "revenue", bucket: str = "day",
+                     max_points: Optional[int] = None) -> Optional[Tuple[pd.DataFrame, Dict[str, int]]]:
+    """
+    Fetches chart-ready series, aggregated and downsampled by the Backend.
+    Returns the (channel, date, value) points and the original point count per channel.
+    """
+    params = {"metric": metric, "bucket": bucket}
+    if max_points:
+        params["max_points"] = max_points
+    try:
+        response = client.request("GET", f"/analytics/datasets/{dataset_id}/timeseries", params=params,
+                                  headers=ARROW_HEADERS)
+        if response.status_code == 200:
+            points, metadata = read_arrow(response)
+            return points, metadata["points_total"]
+        st.error(f"❌ Time Series Error ({response.status_code}): {response.text}")
+        return None
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        st.error("🚨 Cannot connect to the Backend. Is it running?")
+        return None
+
+def request_ai_insights(summary_data: Optional[Dict[str, Any]] = None, dataset_id: Optional[str] = None) -> Optional[str]:
     """
-    Sends the metrics summary to the Backend AI Agent.
+    Sends the metrics summary (or just the ID of a stored dataset) to the Backend AI Agent.
     Returns the markdown text generated by Gemini.
     """
     try:
         # Preparamos el payload (cuerpo del mensaje)
-        payload = {"summary_data": summary_data}
-        
+        payload = {"dataset_id": dataset_id} if dataset_id else {"summary_data": summary_data}
         with st.spinner("🤖 AI Agent is thinking... (This may take a few seconds)"):
             # Llamamos al endpoint que creamos en recommendations.py
-            response = requests.post(f"{API_BASE_URL}/ai/generate-insights", json=payload)
+            response = client.request("POST", "/ai/generate-insights", timeout="ai", json=payload)
             
         if response.status_code == 200:
             return response.json().get("response")
@@ -58,9 +213,46 @@ def request_ai_insights(summary_data: Dict[str, Any]) -> Optional[str]:
             st.error(f"AI Error ({response.status_code}): {response.text}")
             return None
             
+    except requests.exceptions.Timeout:
+        st.error("⌛ The AI Agent took too long to answer. Please try again.")
+        return None
     except requests.exceptions.ConnectionError:
         st.error("🚨 Cannot connect to AI Agent. Is the backend running?")
         return None
     except Exception as e:
         st.error(f"Unexpected error: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def stream_ai_insights(summary_data: Optional[Dict[str, Any]] = None, dataset_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming version of request_ai_insights.
+    Yields the report text token by token (Server-Sent Events), so the page can
+    render it while Gemini is still writing. Use with st.write_stream().
+    """
+    payload = {"dataset_id": dataset_id} if dataset_id else {"summary_data": summary_data}
+    try:
+        with client.request("POST", "/ai/generate-insights/stream", timeout="ai", json=payload, stream=True) as response:
+            if response.status_code != 200:
+                st.error(f"AI Error ({response.status_code}): {response.text}")
+                return
+
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "error":
+                        st.error(f"AI Error: {data.get('detail')}")
+                        return
+                    if event == "done":
+                        return
+                    yield data.get("token", "")
+                elif not line:
+                    event = None
+
+    except requests.exceptions.Timeout:
+        st.error("⌛ The AI Agent took too long to answer. Please try again.")
+        return None
+    except requests.exceptions.ConnectionError:
+        st.error("🚨 Cannot connect to AI Agent. Is the backend running?")
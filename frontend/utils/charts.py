@@ -0,0 +1,60 @@
+import streamlit as st
+import plotly.express as px
+import plotly.graph_objects as go
+from typing import Optional
+from frontend.utils.data_cache import summary_frame, trend_frame
+
+# Built Plotly figures, memoized per dataset ID, version (see data_cache) and chart parameters.
+# cache_resource returns the same object on every rerun (no copy), so callers must not mutate them.
+
+STATUS_COLORS = {
+    'Good': '#00CC96',   # Green
+    'Warning': '#FFA15A', # Orange
+    'Critical': '#EF553B' # Red
+}
+
+METRIC_LABELS = {"revenue": "Revenue", "spend": "Spend", "roas": "ROAS"}
+BUCKET_LABELS = {"day": "Daily", "week": "Weekly", "month": "Monthly"}
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def roas_bar_chart(dataset_id: str, version: str) -> go.Figure:
+    """Bar Chart with Color Coding based on performance"""
+    fig = px.bar(
+        summary_frame(dataset_id, version),
+        x='channel',
+        y='roas',
+        color='recommendation_status',
+        color_discrete_map=STATUS_COLORS,
+        text='roas',
+        title="Efficiency per Channel (ROAS)"
+    )
+    fig.update_traces(texttemplate='%{text:.2f}x', textposition='outside')
+    return fig
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def spend_pie_chart(dataset_id: str, version: str) -> go.Figure:
+    """Donut Chart of the budget allocation"""
+    return px.pie(
+        summary_frame(dataset_id, version),
+        values='total_spend',
+        names='channel',
+        hole=0.4,
+        title="Spend Distribution"
+    )
+
+@st.cache_resource(show_spinner=False, max_entries=128)
+def trend_chart(dataset_id: str, version: str, metric: str, bucket: str, max_points: Optional[int]) -> go.Figure:
+    """One line per channel over time"""
+    return px.line(
+        trend_frame(dataset_id, version, metric, bucket, max_points),
+        x='date',
+        y=metric,
+        color='channel',
+        markers=bucket != "day",
+        labels={metric: METRIC_LABELS[metric]},
+        title=f"{BUCKET_LABELS[bucket]} {METRIC_LABELS[metric]} Performance"
+    )
+
+def clear_figures() -> None:
+    for cached in (roas_bar_chart, spend_pie_chart, trend_chart):
+        cached.clear()
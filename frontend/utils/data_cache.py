@@ -0,0 +1,80 @@
+import streamlit as st
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+from frontend.utils import api_client
+
+# Memoized Backend responses and derived frames, keyed by dataset ID and version
+# (see dataset_version). Datasets change through appends, so the ID alone does not
+# name one content: the metadata is re-read every minute (and dropped by
+# invalidate_dataset_cache() after every upload or append), and everything derived
+# from the data is keyed by the version it reports.
+
+# How long dataset metadata (version, summary) is trusted before it is re-read
+DATASET_TTL_SECONDS = 60
+
+class _NotCached(Exception):
+    """Raised inside cached loaders so failed calls are never memoized."""
+
+@st.cache_data(show_spinner=False, max_entries=32, ttl=DATASET_TTL_SECONDS)
+def _dataset(dataset_id: str) -> Dict[str, Any]:
+    dataset = api_client.fetch_dataset(dataset_id)
+    if dataset is None:
+        raise _NotCached()
+    return dataset
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _timeseries(dataset_id: str, version: str, metric: str, bucket: str, max_points: Optional[int]) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    series = api_client.fetch_timeseries(dataset_id, metric=metric, bucket=bucket, max_points=max_points)
+    if series is None:
+        raise _NotCached()
+    return series
+
+@st.cache_data(show_spinner=False, ttl=DATASET_TTL_SECONDS)
+def get_datasets() -> List[Dict[str, Any]]:
+    """Stored datasets (refreshed every minute, or right after an upload)"""
+    return api_client.list_datasets()
+
+def get_dataset(dataset_id: str) -> Optional[Dict[str, Any]]:
+    """Dataset metadata + precomputed summary (one Backend call per dataset and minute)"""
+    try:
+        return _dataset(dataset_id)
+    except _NotCached:
+        return None
+
+def dataset_version(dataset: Dict[str, Any]) -> str:
+    """Cache key part naming one content of a dataset (its version and update time)"""
+    return f"{dataset.get('version', 1)}@{dataset.get('updated_at')}"
+
+def get_timeseries(dataset_id: str, version: str, metric: str, bucket: str,
+                   max_points: Optional[int] = None) -> Optional[Tuple[pd.DataFrame, Dict[str, int]]]:
+    """
+    Chart-ready (channel, date, value) points + original point count per channel
+    (one Backend call per dataset version, metric, bucket and point budget)
+    """
+    try:
+        return _timeseries(dataset_id, version, metric, bucket, max_points)
+    except _NotCached:
+        return None
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def summary_frame(dataset_id: str, version: str) -> pd.DataFrame:
+    """Per-channel summary of a dataset as a DataFrame"""
+    dataset = get_dataset(dataset_id)
+    return pd.DataFrame(dataset["summary"]["summary"]) if dataset else pd.DataFrame()
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def trend_frame(dataset_id: str, version: str, metric: str, bucket: str, max_points: Optional[int]) -> pd.DataFrame:
+    """Long-format (date, metric, channel) frame of the series, ready for plotting"""
+    timeseries = get_timeseries(dataset_id, version, metric, bucket, max_points)
+    if timeseries is None:
+        return pd.DataFrame(columns=["date", metric, "channel"])
+    points = timeseries[0]
+    return pd.DataFrame({"date": pd.to_datetime(points["date"]), metric: points["value"], "channel": points["channel"]})
+
+def invalidate_dataset_cache() -> None:
+    """Drops every memoized response, frame and figure (call after an upload or append)"""
+    from frontend.utils import charts  # charts builds on this module
+
+    for cached in (_dataset, _timeseries, get_datasets, summary_frame, trend_frame):
+        cached.clear()
+    charts.clear_figures()
@@ -1,9 +1,26 @@
+import os
+import tempfile
+
+# Use a throwaway SQLite database (must be set before the app is imported)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+# Never call a real LLM from the test suite
+os.environ.setdefault("AI_PROVIDER", "stub")
+
 import pytest
 from fastapi.testclient import TestClient
 from backend.main import app
+from backend.core.config import settings
 from backend.models.schemas import CampaignRecord
 from datetime import date
 
+# --- ISOLATED STORAGE ---
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """
+    Points the on-disk stores at a temporary folder so tests never touch ./data.
+    """
+    monkeypatch.setattr(settings, "DATASET_DIR", str(tmp_path / "datasets"))
+
 # --- API CLIENT (For Integration Tests) ---
 @pytest.fixture
 def client():
@@ -12,7 +29,9 @@ def client():
     Allows making requests without spinning up the actual server.
     
     """
-    return TestClient(app)
+    # The context manager runs the app lifespan (table creation, background workers)
+    with TestClient(app) as test_client:
+        yield test_client
 
 # --- SAMPLE DATA (For Unit Tests) ---
 @pytest.fixture
@@ -0,0 +1,62 @@
+from backend.services import ai_agent
+
+SUMMARY = {"summary": [{"channel": "TikTok", "roas": 3.0}], "global_roas": 3.0}
+
+def test_generate_insights_runs_off_the_event_loop(client, monkeypatch):
+    """
+    The blocking service call is executed on the AI worker pool, not on the event loop thread.
+    """
+    import threading
+    calls = []
+
+    def fake_generate(summary):
+        calls.append(threading.current_thread().name)
+        return "## Report", {"prompt_tokens": 42}
+
+    monkeypatch.setattr(ai_agent, "generate_marketing_insights_with_stats", fake_generate)
+    response = client.post("/ai/generate-insights", json={"summary_data": SUMMARY})
+
+    assert response.status_code == 200
+    assert response.json() == {"response": "## Report", "prompt_stats": {"prompt_tokens": 42}}
+    assert calls[0].startswith("ai-agent")
+
+def test_generate_insights_stream(client):
+    """
+    The streaming endpoint forwards every token as an SSE event and closes with 'done'.
+    """
+    class TwoTokens(ai_agent.StubProvider):
+        def stream(self, prompt):
+            yield from ["## Best", "\nTikTok"]
+
+    ai_agent.set_provider(TwoTokens())
+    ai_agent.clear_insight_cache()
+    try:
+        with client.stream("POST", "/ai/generate-insights/stream", json={"summary_data": SUMMARY}) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+    finally:
+        ai_agent.set_provider(None)
+        ai_agent.clear_insight_cache()
+
+    assert 'data: {"token": "## Best"}' in body
+    assert 'data: {"token": "\\nTikTok"}' in body
+    assert body.rstrip().endswith("event: done\ndata: {}")
+
+def test_generate_insights_requires_data(client):
+    """
+    Without a summary or a dataset ID there is nothing to analyze.
+    """
+    assert client.post("/ai/generate-insights", json={}).status_code == 400
+
+def test_prompt_preview_reports_compaction(client):
+    """
+    The preview endpoint returns the compacted prompt and its size stats without calling the model.
+    """
+    response = client.post("/ai/prompt-preview", json={"summary_data": SUMMARY})
+
+    assert response.status_code == 200
+    stats = response.json()["prompt_stats"]
+    assert stats["rows_total"] == 1
+    assert stats["prompt_tokens"] > stats["compacted_tokens"]
+    assert "TikTok" in response.json()["prompt"]
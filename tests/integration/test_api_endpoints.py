@@ -26,4 +26,311 @@ def test_upload_csv_endpoint(client):
     # Should have calculated 1 channel (TikTok)
     assert len(data["summary"]) == 1
     assert data["summary"][0]["channel"] == "TikTok"
-    assert data["summary"][0]["roas"] == 3.0  # 150/50
\ No newline at end of file
+    assert data["summary"][0]["roas"] == 3.0  # 150/50
+
+def test_upload_csv_in_small_chunks(client):
+    """
+    Streams a multi-row CSV with a tiny chunk size and checks the totals are merged across chunks.
+    """
+    csv_content = """date,channel,spend,revenue,clicks,conversions
+2024-01-01,TikTok,50,150,200,10
+2024-01-02,TikTok,50,50,100,5
+2024-01-01,Google,100,50,80,2
+"""
+    files = {"file": ("test.csv", csv_content, "text/csv")}
+    response = client.post("/analytics/upload-csv?chunk_size=1", files=files)
+
+    assert response.status_code == 200
+    summary = {row["channel"]: row for row in response.json()["summary"]}
+    assert summary["TikTok"]["total_spend"] == 100.0
+    assert summary["TikTok"]["roas"] == 2.0
+    assert summary["Google"]["recommendation_status"] == "Critical"
+
+def test_upload_csv_missing_columns(client):
+    """
+    A CSV without the required columns is a client error, not a server error.
+    """
+    files = {"file": ("test.csv", "date,channel\n2024-01-01,TikTok\n", "text/csv")}
+    response = client.post("/analytics/upload-csv", files=files)
+    assert response.status_code == 400
+    assert "Missing required columns" in response.json()["detail"]
+
+def test_upload_csv_invalid_rows(client):
+    """
+    Invalid rows reject the upload by default, or are skipped and reported on request.
+    """
+    csv_content = """date,channel,spend,revenue,clicks,conversions
+2024-01-01,TikTok,50,150,200,10
+2024-01-02,TikTok,-5,50,100,5
+"""
+    files = {"file": ("test.csv", csv_content, "text/csv")}
+    rejected = client.post("/analytics/upload-csv", files=files)
+    assert rejected.status_code == 400
+    assert rejected.json()["detail"]["report"]["failing_rows"] == [2]
+
+    files = {"file": ("test.csv", csv_content, "text/csv")}
+    skipped = client.post("/analytics/upload-csv?on_invalid=skip", files=files)
+    assert skipped.status_code == 200
+    assert skipped.json()["summary"][0]["total_spend"] == 50.0
+    assert skipped.json()["validation"]["invalid_rows"] == 1
+
+    # Skipping every row leaves nothing to analyze: no empty dataset is stored
+    files = {"file": ("bad.csv", "date,channel,spend,revenue,clicks,conversions\nnot-a-date,TikTok,50,150,200,10\n", "text/csv")}
+    response = client.post("/analytics/upload-csv?on_invalid=skip", files=files)
+    assert response.status_code == 400
+    assert response.json()["detail"]["report"]["invalid_rows"] == 1
+    assert [d["row_count"] for d in client.get("/analytics/datasets").json()] == [1]
+
+def test_uploaded_dataset_is_stored_and_queryable(client):
+    """
+    An upload is persisted under a content-hash ID that can be listed, fetched and queried.
+    """
+    csv_content = """date,channel,campaign_name,spend,revenue,clicks,conversions
+2024-01-01,TikTok,Launch,50,150,200,10
+2024-01-02,TikTok,Launch,50,50,100,5
+2024-02-01,Google,Brand,100,50,80,2
+"""
+    files = {"file": ("test.csv", csv_content, "text/csv")}
+    dataset_id = client.post("/analytics/upload-csv", files=files).json()["dataset_id"]
+    assert dataset_id
+
+    # Same content -> same ID, no duplicate dataset
+    files = {"file": ("again.csv", csv_content, "text/csv")}
+    assert client.post("/analytics/upload-csv", files=files).json()["dataset_id"] == dataset_id
+    assert [d["dataset_id"] for d in client.get("/analytics/datasets").json()] == [dataset_id]
+
+    info = client.get(f"/analytics/datasets/{dataset_id}").json()
+    assert info["row_count"] == 3
+    assert info["channels"] == ["Google", "TikTok"]
+    assert info["partitions"] == ["part-2024-01.parquet", "part-2024-02.parquet"]
+
+    query = {"group_by": ["date"], "channels": ["TikTok"], "end_date": "2024-01-01"}
+    rows = client.post(f"/analytics/datasets/{dataset_id}/query", json=query).json()["rows"]
+    assert rows == [{
+        "date": "2024-01-01", "total_spend": 50.0, "total_revenue": 150.0, "total_conversions": 10,
+        "roas": 3.0, "cpa": 5.0, "conversion_rate": 5.0, "recommendation_status": "Good"
+    }]
+
+    assert client.get("/analytics/datasets/0000000000000000").status_code == 404
+
+def test_timeseries_endpoint_downsamples_per_channel(client):
+    """
+    The time-series endpoint returns one line per channel and respects the point budget.
+    """
+    rows = "\n".join(f"2024-{1 + d // 28:02d}-{1 + d % 28:02d},{ch},10,{d % 7 + 1},5,1"
+                     for d in range(300) for ch in ("Google", "Meta"))
+    csv_content = "date,channel,spend,revenue,clicks,conversions\n" + rows + "\n"
+    dataset_id = client.post("/analytics/upload-csv", files={"file": ("ts.csv", csv_content, "text/csv")}).json()["dataset_id"]
+
+    response = client.get(f"/analytics/datasets/{dataset_id}/timeseries",
+                          params={"metric": "roas", "bucket": "day", "max_points": 50, "channels": ["Meta"]})
+    assert response.status_code == 200
+    (series,) = response.json()["series"]
+    assert series["channel"] == "Meta"
+    assert series["points_total"] == 300
+    assert len(series["values"]) == 50
+
+    monthly = client.get(f"/analytics/datasets/{dataset_id}/timeseries", params={"metric": "spend", "bucket": "month"}).json()
+    assert [len(s["dates"]) for s in monthly["series"]] == [11, 11]
+    assert monthly["series"][0]["values"][0] == 280.0  # 28 days x 10
+
+def test_gzip_compressed_upload(client):
+    """
+    Uploads sent with Content-Encoding: gzip are inflated transparently; unknown encodings are refused.
+    """
+    import gzip
+    import httpx
+
+    csv_content = "date,channel,spend,revenue,clicks,conversions\n2024-01-01,TikTok,50,150,200,10\n"
+    request = httpx.Request("POST", "http://test/analytics/upload-csv",
+                            files={"file": ("test.csv", csv_content, "text/csv")})
+    body = request.read()
+    headers = {"Content-Type": request.headers["Content-Type"], "Content-Encoding": "gzip"}
+
+    response = client.post("/analytics/upload-csv", content=gzip.compress(body), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["summary"][0]["roas"] == 3.0
+
+    response = client.post("/analytics/upload-csv", content=body, headers={**headers, "Content-Encoding": "br"})
+    assert response.status_code == 415
+
+
+def test_upload_parquet_without_csv_extension(client):
+    """
+    Columnar files are accepted by content, whatever their name, and analyzed like CSV.
+    """
+    import io
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        "date": ["2024-01-01", "2024-01-02"], "channel": ["TikTok", "TikTok"],
+        "spend": [50.0, 50.0], "revenue": [150.0, 50.0], "clicks": [200, 100], "conversions": [10, 5],
+    }).to_parquet(buffer, index=False)
+
+    response = client.post("/analytics/upload", files={"file": ("export.bin", buffer.getvalue(), "application/octet-stream")})
+
+    assert response.status_code == 200
+    assert response.json()["summary"][0]["roas"] == 2.0
+
+def test_query_and_timeseries_as_arrow(client):
+    """
+    Accept: application/vnd.apache.arrow.stream returns the same rows as an Arrow IPC stream.
+    """
+    import json
+    import pyarrow as pa
+
+    csv_content = ("date,channel,spend,revenue,clicks,conversions\n"
+                   "2024-01-01,TikTok,50,150,200,10\n2024-01-02,Google,100,200,300,20\n")
+    dataset_id = client.post("/analytics/upload", files={"file": ("test.csv", csv_content, "text/csv")}).json()["dataset_id"]
+    arrow = {"Accept": "application/vnd.apache.arrow.stream"}
+
+    response = client.post(f"/analytics/datasets/{dataset_id}/query", json={"group_by": ["channel"]}, headers=arrow)
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    json_rows = client.post(f"/analytics/datasets/{dataset_id}/query", json={"group_by": ["channel"]}).json()["rows"]
+    assert table.to_pylist() == json_rows
+    assert json.loads(table.schema.metadata[b"group_by"]) == ["channel"]
+
+    response = client.get(f"/analytics/datasets/{dataset_id}/timeseries", params={"metric": "spend"}, headers=arrow)
+    points = pa.ipc.open_stream(response.content).read_all()
+    assert points.schema.field("date").type == pa.date32()
+    assert points.column("value").to_pylist() == [100.0, 50.0]
+    assert json.loads(points.schema.metadata[b"points_total"]) == {"Google": 1, "TikTok": 1}
+
+def test_aggregate_endpoint_rolls_up_any_dimensions(client):
+    """
+    The aggregate endpoint groups by any dimension set and date grain, sorts and limits.
+    """
+    csv_content = """date,channel,campaign_name,spend,revenue,clicks,conversions
+2024-01-01,TikTok,Launch,50,150,200,10
+2024-02-10,TikTok,Launch,50,50,100,5
+2024-04-01,Google,Brand,100,50,80,2
+2024-04-02,Google,Launch,30,90,60,3
+"""
+    dataset_id = client.post("/analytics/upload-csv", files={"file": ("test.csv", csv_content, "text/csv")}).json()["dataset_id"]
+    url = f"/analytics/datasets/{dataset_id}/aggregate"
+
+    body = client.post(url, json={"dimensions": ["date"], "date_grain": "quarter", "metrics": ["spend", "roas"]}).json()
+    assert body["cuboid"] == "date:quarter"
+    assert body["rows"] == [{"date": "2024-01-01", "spend": 100.0, "roas": 2.0},
+                            {"date": "2024-04-01", "spend": 130.0, "roas": 1.08}]
+
+    query = {"dimensions": ["campaign_name"], "metrics": ["conversions"], "sort_by": "conversions",
+             "descending": True, "limit": 1, "start_date": "2024-01-01", "end_date": "2024-03-31"}
+    body = client.post(url, json=query).json()
+    assert body["rows"] == [{"campaign_name": "Launch", "conversions": 15}]
+    assert body["rows_total"] == 1
+    assert body["cuboid"] == "campaign_name+date:quarter"
+
+    assert client.post(url, json={"sort_by": "cpa"}).status_code == 422
+    assert client.get("/analytics/cube/stats").json()["builds"]["executions"] >= 1
+
+def test_append_upserts_rows_and_rewrites_only_touched_partitions(client):
+    """
+    Appending an overlapping export replaces the rows of its keys, bumps the version under the same ID
+    and leaves the partitions of untouched months as they were.
+    """
+    import os
+    from backend.core.config import settings
+
+    csv_content = """date,channel,campaign_name,spend,revenue,clicks,conversions
+2024-01-30,TikTok,Launch,50,150,200,10
+2024-01-31,TikTok,Launch,50,50,100,5
+2024-02-01,Google,Brand,100,50,80,2
+"""
+    dataset_id = client.post("/analytics/upload-csv", files={"file": ("week.csv", csv_content, "text/csv")}).json()["dataset_id"]
+    directory = os.path.join(settings.DATASET_DIR, dataset_id)
+    before = os.stat(os.path.join(directory, "v1", "part-2024-02.parquet"))
+
+    # Yesterday's export: a corrected 2024-01-31 and a new day
+    refresh = """date,channel,campaign_name,spend,revenue,clicks,conversions
+2024-01-31,TikTok,Launch,60,70,100,5
+2024-03-01,Google,Brand,10,50,80,2
+"""
+    response = client.post(f"/analytics/datasets/{dataset_id}/append", files={"file": ("day.csv", refresh, "text/csv")})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["dataset_id"], body["version"], body["row_count"]) == (dataset_id, 2, 4)
+    assert (body["rows_added"], body["rows_replaced"], body["keys_inserted"], body["keys_updated"]) == (2, 1, 1, 1)
+    assert body["partitions_rewritten"] == ["part-2024-01.parquet", "part-2024-03.parquet"]
+    after = os.stat(os.path.join(directory, "v2", "part-2024-02.parquet"))
+    assert after.st_mtime_ns == before.st_mtime_ns
+
+    info = client.get(f"/analytics/datasets/{dataset_id}").json()
+    assert (info["version"], info["end_date"]) == (2, "2024-03-01")
+    assert {s["channel"]: s["total_spend"] for s in info["summary"]["summary"]} == {"Google": 110.0, "TikTok": 110.0}
+
+    # Queries and the cube see the new version
+    rows = client.post(f"/analytics/datasets/{dataset_id}/query", json={"group_by": ["date"], "channels": ["TikTok"]}).json()["rows"]
+    assert [(r["date"], r["total_spend"]) for r in rows] == [("2024-01-30", 50.0), ("2024-01-31", 60.0)]
+    aggregate = client.post(f"/analytics/datasets/{dataset_id}/aggregate", json={"dimensions": [], "metrics": ["spend", "rows"]}).json()
+    assert aggregate["version"] == 2
+    assert aggregate["rows"] == [{"spend": 220.0, "rows": 4}]
+
+    # The dataset no longer holds the original file: re-uploading it stores a new dataset, with its own totals
+    reupload = client.post("/analytics/upload-csv", files={"file": ("week.csv", csv_content, "text/csv")}).json()
+    assert reupload["dataset_id"] != dataset_id
+    assert {s["channel"]: s["total_spend"] for s in reupload["summary"]} == {"Google": 100.0, "TikTok": 100.0}
+    assert client.post("/analytics/upload-csv", files={"file": ("week.csv", csv_content, "text/csv")}).json()["dataset_id"] == reupload["dataset_id"]
+
+    # Appending the same rows again changes nothing but the version; versions before the previous one are removed
+    again = client.post(f"/analytics/datasets/{dataset_id}/append", files={"file": ("day.csv", refresh, "text/csv")}).json()
+    assert (again["dataset_id"], again["version"], again["row_count"]) == (dataset_id, 3, 4)
+    assert sorted(name for name in os.listdir(directory) if not name.endswith(".json")) == ["v2", "v3"]
+
+    assert client.post("/analytics/datasets/0000000000000000/append",
+                       files={"file": ("day.csv", refresh, "text/csv")}).status_code == 404
+
+def test_query_results_are_cached_until_the_dataset_changes(client):
+    """
+    A repeated query is served from the result cache; an append invalidates it.
+    """
+    csv_content = "date,channel,spend,revenue,clicks,conversions\n2024-01-01,TikTok,50,150,200,10\n"
+    dataset_id = client.post("/analytics/upload", files={"file": ("test.csv", csv_content, "text/csv")}).json()["dataset_id"]
+    url = f"/analytics/datasets/{dataset_id}/query"
+
+    hits = client.get("/analytics/cache/stats").json()["memory"]["hits"]
+    first = client.post(url, json={"group_by": ["channel"]})
+    again = client.post(url, json={"group_by": ["channel"]})
+    assert again.content == first.content  # The cached body is sent as encoded
+    assert again.headers["content-type"] == "application/json"
+    assert client.get("/analytics/cache/stats").json()["memory"]["hits"] == hits + 1
+
+    refresh = "date,channel,spend,revenue,clicks,conversions\n2024-01-01,TikTok,80,160,200,10\n"
+    appended = client.post(f"/analytics/datasets/{dataset_id}/append", files={"file": ("day.csv", refresh, "text/csv")})
+    assert appended.json()["dataset_id"] == dataset_id
+    updated = client.post(url, json={"group_by": ["channel"]}).json()
+    assert (updated["version"], updated["rows"][0]["total_spend"]) == (2, 80.0)
+    assert client.get("/analytics/cache/stats").json()["invalidations"] >= 1
+
+def test_large_responses_are_compressed(client):
+    """
+    JSON responses above the size threshold are gzip-compressed when the client accepts it.
+    """
+    rows = "\n".join(f"2024-01-{d:02d},Channel{c},10,20,5,1" for d in range(1, 29) for c in range(20))
+    csv_content = "date,channel,spend,revenue,clicks,conversions\n" + rows + "\n"
+    dataset_id = client.post("/analytics/upload", files={"file": ("big.csv", csv_content, "text/csv")}).json()["dataset_id"]
+
+    response = client.post(f"/analytics/datasets/{dataset_id}/query", json={"group_by": ["date", "channel"]},
+                           headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["rows"]) == 560
+
+def test_metrics_endpoint_exposes_request_and_pipeline_timings(client):
+    """
+    /metrics reports per-route request counts, CSV stage latencies and the webhook queue depth.
+    """
+    csv_content = "date,channel,spend,revenue,clicks,conversions\n2024-01-01,TikTok,50,150,200,10\n"
+    client.post("/analytics/upload-csv", files={"file": ("test.csv", csv_content, "text/csv")})
+    client.get("/analytics/datasets/0000000000000000")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/analytics/datasets/{dataset_id}",status="404"}' in text
+    assert 'csv_pipeline_stage_seconds_count{stage="validate"}' in text
+    assert "webhook_queue_depth " in text
@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+from backend.main import app
+
+CSV = """date,channel,campaign_name,spend,revenue,clicks,conversions
+2024-01-01,Facebook,Attribution_Test,100,300,50,5
+2024-01-02,Google,Attribution_Test,100,100,40,2
+2024-01-01,Google,Brand,80,200,30,3
+"""
+
+def test_live_cpa_per_campaign():
+    """
+    Spend from an uploaded CSV is divided by the webhook leads of the same campaign,
+    and the counters survive a restart through the batch recompute.
+    """
+    with TestClient(app) as client:
+        upload = client.post("/analytics/upload-csv", files={"file": ("a.csv", CSV, "text/csv")})
+        dataset_id = upload.json()["dataset_id"]
+
+        leads = [{"source": "Facebook Ads", "campaign_id": "attribution_test", "lead_email": f"a{i}@attr.example.com"}
+                 for i in range(4)]
+        client.post("/integrations/webhook/ingest-bulk", json=leads)
+
+        report = client.get(f"/attribution/datasets/{dataset_id}", params={"campaign": "Attribution_Test"}).json()
+        assert report["campaigns"][0]["leads"] == 4
+        assert report["campaigns"][0]["cpa"] == 50.0
+
+        stats = client.post("/attribution/recompute").json()
+        assert stats["leads_total"] >= 4
+
+    with TestClient(app) as client:
+        report = client.get(f"/attribution/datasets/{dataset_id}", params={"campaign": "attribution_test"}).json()
+        assert report["campaigns"][0]["cpa"] == 50.0
+        assert client.get("/attribution/datasets/0123456789abcdef").status_code == 404
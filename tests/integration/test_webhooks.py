@@ -0,0 +1,182 @@
+import json
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.database.db import SessionLocal
+from backend.database.models import Lead
+from backend.services.lead_buffer import lead_buffer
+
+def lead(i, **extra):
+    return {"source": "Facebook Ads", "campaign_id": "launch", "lead_email": f"user{i}@example.com", **extra}
+
+def count_leads(email_domain="example.com"):
+    db = SessionLocal()
+    try:
+        return db.query(Lead).filter(Lead.lead_email.like(f"%@{email_domain}")).count()
+    finally:
+        db.close()
+
+def test_single_webhook_is_queued(client):
+    """
+    The single-lead endpoint keeps its response shape and queues the lead for a batched write.
+    """
+    response = client.post("/integrations/webhook/ingest-data", json=lead(0, metadata={"is_vip": True}))
+
+    assert response.status_code == 200
+    assert response.json()["action_taken"] == "Data Queued + Priority Alert Sent"
+
+def test_bulk_json_and_ndjson_are_flushed_on_shutdown():
+    """
+    JSON arrays and NDJSON streams are accepted; invalid items are reported, valid ones
+    end up in the database once the buffer is flushed at shutdown.
+    """
+    with TestClient(app) as client:
+        array = [lead(i, lead_email=f"a{i}@bulk.example.com") for i in range(3)] + [{"source": "x", "lead_email": "nope"}]
+        response = client.post("/integrations/webhook/ingest-bulk", json=array)
+        assert response.json()["accepted"] == 3
+        assert response.json()["errors"][0]["item"] == 4
+
+        ndjson = "\n".join(json.dumps(lead(i, lead_email=f"n{i}@bulk.example.com")) for i in range(5)) + "\n"
+        response = client.post(
+            "/integrations/webhook/ingest-bulk",
+            content=ndjson,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.json() == {"status": "success", "accepted": 5, "duplicates": 0, "rejected": 0, "errors": [], "priority_alerts": 0}
+
+    assert count_leads("bulk.example.com") == 8
+    assert lead_buffer.depth == 0
+
+def test_bulk_backpressure_returns_429(client, monkeypatch):
+    """
+    When the write-behind queue cannot take the whole batch, the request is refused with 429.
+    """
+    monkeypatch.setattr(lead_buffer, "max_depth", 2)
+    response = client.post("/integrations/webhook/ingest-bulk", json=[lead(i, lead_email=f"bp{i}@example.com") for i in range(3)])
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+
+def test_duplicate_leads_are_not_stored_twice():
+    """
+    Re-sent leads (same email/campaign/source, case-insensitive) are acknowledged as
+    duplicates, within a batch, while still queued and once flushed to the database.
+    """
+    with TestClient(app) as client:
+        first = client.post("/integrations/webhook/ingest-data", json=lead(0, lead_email="dup@dedupe.example.com"))
+        again = client.post("/integrations/webhook/ingest-data", json=lead(0, lead_email="DUP@dedupe.example.com"))
+        assert first.json()["status"] == "success"
+        assert again.json()["status"] == "duplicate"
+
+        batch = [lead(i, lead_email=f"b{i % 2}@dedupe.example.com") for i in range(4)]
+        response = client.post("/integrations/webhook/ingest-bulk", json=batch)
+        assert (response.json()["accepted"], response.json()["duplicates"]) == (2, 2)
+
+    with TestClient(app) as client:
+        # Flushed by now: the exact check hits the database
+        response = client.post("/integrations/webhook/ingest-bulk", json=batch)
+        assert (response.json()["accepted"], response.json()["duplicates"]) == (0, 4)
+        stats = client.get("/integrations/webhook/stats").json()["dedupe"]
+        assert stats["duplicates_rejected"] >= 7
+        assert stats["filter_memory_bytes"] > 0
+
+    assert count_leads("dedupe.example.com") == 3
+
+def test_idempotency_key_replay_is_ignored(client):
+    """
+    A retried request with the same Idempotency-Key is not processed again.
+    """
+    headers = {"Idempotency-Key": "launch-batch-42"}
+    batch = [lead(i, lead_email=f"k{i}@idem.example.com") for i in range(3)]
+
+    first = client.post("/integrations/webhook/ingest-bulk", json=batch, headers=headers)
+    replay = client.post("/integrations/webhook/ingest-bulk", json=batch, headers=headers)
+
+    assert first.json()["accepted"] == 3
+    assert replay.json()["status"] == "duplicate"
+    assert replay.json()["accepted"] == 0
+
+def test_lead_velocity_counts_accepted_leads(client):
+    """
+    Accepted webhook leads show up immediately in the velocity endpoint.
+    """
+    before = client.get("/integrations/leads/velocity", params={"dimension": "campaign_id", "key": "velocity-test"}).json()
+    assert before["groups"] == []
+
+    batch = [lead(i, lead_email=f"v{i}@velocity.example.com", campaign_id="velocity-test") for i in range(4)]
+    client.post("/integrations/webhook/ingest-bulk", json=batch)
+
+    after = client.get("/integrations/leads/velocity", params={"dimension": "campaign_id", "key": "velocity-test"}).json()
+    assert after["groups"][0]["windows"]["5m"]["count"] == 4
+
+def test_leads_already_stored_are_taken_off_the_counters(monkeypatch):
+    """
+    A lead the Bloom filter no longer remembers is accepted, then dropped by the write and
+    taken off the live counters; warming the filter from the table catches it upfront.
+    """
+    from backend.core.config import settings
+    from backend.services.dedupe import RotatingBloomFilter
+    from backend.services.lead_buffer import lead_deduplicator, load_recent_keys
+
+    def fresh_bloom():
+        return RotatingBloomFilter(window_seconds=3600, capacity=1000, error_rate=0.01)
+
+    def velocity(client):
+        groups = client.get("/integrations/leads/velocity", params={"dimension": "campaign_id", "key": "stored-test"}).json()["groups"]
+        return groups[0]["windows"]["5m"]["count"]
+
+    stored = lead(0, lead_email="old@stored.example.com", campaign_id="stored-test")
+    with TestClient(app) as client:
+        client.post("/integrations/webhook/ingest-data", json=stored)
+
+    # Past the window: the filter has forgotten the lead (and does not load it at startup)
+    monkeypatch.setattr(settings, "DEDUPE_WINDOW_SECONDS", 0)
+    monkeypatch.setattr(lead_deduplicator, "bloom", fresh_bloom())
+    with TestClient(app) as client:
+        assert client.post("/integrations/webhook/ingest-data", json=stored).json()["status"] == "success"
+        assert velocity(client) == 2
+        dropped = client.get("/integrations/webhook/stats").json()["dropped_already_stored"]
+    with TestClient(app) as client:
+        assert velocity(client) == 1
+        assert client.get("/integrations/webhook/stats").json()["dropped_already_stored"] == dropped + 1
+    assert count_leads("stored.example.com") == 1
+
+    monkeypatch.setattr(lead_deduplicator, "bloom", fresh_bloom())
+    assert lead_deduplicator.warm(load_recent_keys(3600)) >= 1
+    with TestClient(app) as client:
+        assert client.post("/integrations/webhook/ingest-data", json=stored).json()["status"] == "duplicate"
+
+def test_concurrent_idempotency_key_replays_are_queued_once(monkeypatch):
+    """
+    Two concurrent requests with the same Idempotency-Key (a retry whose items were rebuilt) queue
+    one batch, even when every key has to be checked against the database.
+    """
+    import asyncio
+    import time
+    import httpx
+    from backend.services.lead_buffer import lead_deduplicator
+
+    with TestClient(app):
+        pass  # Startup creates the tables
+    find_stored = lead_deduplicator.find_stored
+
+    def slow_find_stored(keys):
+        time.sleep(0.05)  # Both requests are waiting on the database at the same time
+        return find_stored(keys)
+
+    monkeypatch.setattr(lead_deduplicator, "find_stored", slow_find_stored)
+    # The filter cannot rule anything out (saturated), so every check awaits the database
+    monkeypatch.setattr(lead_deduplicator, "maybe_seen", lambda candidates: [k for keys in candidates for k in keys])
+    headers = {"Idempotency-Key": "concurrent-replay"}
+    batches = [[lead(i, lead_email=f"c{i}-{attempt}@replay.example.com") for i in range(3)] for attempt in range(2)]
+
+    async def send_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.post("/integrations/webhook/ingest-bulk", json=batch, headers=headers)
+                                          for batch in batches))
+
+    responses = asyncio.run(send_twice())
+    assert sorted(r.json()["accepted"] for r in responses) == [0, 3]
+    with TestClient(app):
+        pass  # Shutdown flushes the queue
+    assert count_leads("replay.example.com") == 3
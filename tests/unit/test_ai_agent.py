@@ -0,0 +1,171 @@
+from types import SimpleNamespace
+from backend.services import ai_agent
+
+def test_stub_provider_is_deterministic():
+    """
+    The offline stub returns the same streamed report for the same prompt.
+    """
+    provider = ai_agent.StubProvider()
+    first = provider.generate("prompt A")
+
+    assert first == "".join(provider.stream("prompt A"))
+    assert first == ai_agent.StubProvider().generate("prompt A")
+    assert first != provider.generate("prompt B")
+
+def test_gemini_model_discovery_is_cached(monkeypatch):
+    """
+    list_models runs once per TTL and the GenerativeModel handle is reused across calls.
+    """
+    listed, built = [], []
+
+    def fake_list_models():
+        listed.append(1)
+        return [SimpleNamespace(name="models/gemini-1.5-flash", supported_generation_methods=["generateContent"])]
+
+    class FakeModel:
+        def __init__(self, name):
+            built.append(name)
+
+        def generate_content(self, prompt):
+            return SimpleNamespace(text=f"ok:{prompt}")
+
+    genai = ai_agent._genai()
+    monkeypatch.setattr(genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(genai, "list_models", fake_list_models)
+    monkeypatch.setattr(genai, "GenerativeModel", FakeModel)
+
+    provider = ai_agent.GeminiProvider(api_key="test", model_ttl=3600)
+    assert provider.generate("a") == "ok:a"
+    assert provider.generate("b") == "ok:b"
+    assert (len(listed), built) == (1, ["gemini-1.5-flash"])
+
+    # Once the TTL expires the model list is refreshed
+    provider.model_ttl = 0
+    provider._resolved_at -= 1
+    provider.generate("c")
+    assert len(listed) == 2
+
+def test_insights_are_cached_and_coalesced():
+    """
+    Concurrent identical requests make one upstream call; later ones are cache hits.
+    """
+    import threading
+
+    class CountingProvider(ai_agent.StubProvider):
+        calls = 0
+
+        def generate(self, prompt):
+            CountingProvider.calls += 1
+            return super().generate(prompt)
+
+    ai_agent.set_provider(CountingProvider(latency_ms=100))
+    ai_agent.clear_insight_cache()
+    try:
+        summary = {"summary": [{"channel": "A", "roas": 2.0}], "global_roas": 2.0}
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(ai_agent.generate_marketing_insights(summary)))
+                   for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(set(results)) == 1 and results[0].startswith("## Stub Report")
+        assert ai_agent.generate_marketing_insights(dict(summary)) == results[0]
+        assert CountingProvider.calls == 1
+    finally:
+        ai_agent.set_provider(None)
+        ai_agent.clear_insight_cache()
+
+def test_identical_streams_share_one_upstream_call():
+    """
+    Concurrent identical streams get every token from one upstream stream; a stream
+    nobody listens to anymore is stopped and not cached.
+    """
+    import threading
+    import time
+
+    class SlowStream(ai_agent.StubProvider):
+        calls = 0
+        closed = 0
+
+        def stream(self, prompt):
+            SlowStream.calls += 1
+            try:
+                for token in ["a", "b", "c", "d"]:
+                    time.sleep(0.03)
+                    yield token
+            finally:
+                SlowStream.closed += 1
+
+    ai_agent.set_provider(SlowStream())
+    ai_agent.clear_insight_cache()
+    try:
+        summary = {"summary": [{"channel": "B", "roas": 1.0}], "global_roas": 1.0}
+        results = []
+        threads = [threading.Thread(target=lambda: results.append("".join(ai_agent.stream_marketing_insights(summary))))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == ["abcd"] * 4
+        assert SlowStream.calls == 1
+        assert "".join(ai_agent.stream_marketing_insights(summary)) == "abcd"  # Cached
+        assert SlowStream.calls == 1
+
+        # The only client leaves after the first token: the upstream stream is closed early
+        other = {"summary": [{"channel": "C", "roas": 1.0}], "global_roas": 1.0}
+        tokens = ai_agent.stream_marketing_insights(other)
+        assert next(tokens) == "a"
+        tokens.close()
+        deadline = time.monotonic() + 2
+        while SlowStream.closed < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert (SlowStream.calls, SlowStream.closed) == (2, 2)
+        assert ai_agent.insight_cache_stats()["stream_single_flight"]["abandoned"] >= 1
+        assert "".join(ai_agent.stream_marketing_insights(other)) == "abcd"
+        assert SlowStream.calls == 3
+    finally:
+        ai_agent.set_provider(None)
+        ai_agent.clear_insight_cache()
+
+def test_async_stream_never_blocks_the_event_loop():
+    """
+    Slow model discovery runs on the AI executor: the event loop keeps ticking meanwhile.
+    """
+    import asyncio
+    import time
+
+    class SlowDiscovery(ai_agent.StubProvider):
+        def model_name(self):
+            time.sleep(0.3)
+            return "stub-slow"
+
+    async def scenario():
+        gaps, stop = [], asyncio.Event()
+
+        async def ticker():
+            last = time.perf_counter()
+            while not stop.is_set():
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticking = asyncio.create_task(ticker())
+        await asyncio.sleep(0.02)  # The ticker is running
+        report = "".join([t async for t in ai_agent.astream_marketing_insights({"summary": [], "global_roas": 0})])
+        stop.set()
+        await ticking
+        return report, max(gaps)
+
+    ai_agent.set_provider(SlowDiscovery())
+    ai_agent.clear_insight_cache()
+    try:
+        report, longest_gap = asyncio.run(scenario())
+        assert report.startswith("## Stub Report")
+        assert longest_gap < 0.2
+    finally:
+        ai_agent.set_provider(None)
+        ai_agent.clear_insight_cache()
@@ -0,0 +1,53 @@
+import pandas as pd
+from backend.services.attribution import LeadAttribution
+
+def spend_frame():
+    return pd.DataFrame({
+        'campaign_name': ['Spring_Launch', 'Spring_Launch', 'Retargeting'],
+        'channel': ['Facebook', 'Google', 'Facebook'],
+        'spend': [300.0, 100.0, 50.0],
+        'revenue': [900.0, 100.0, 25.0],
+        'conversions': [10, 2, 1],
+    })
+
+def test_incremental_cpa_matches_batch_recompute():
+    """
+    Leads update CPA one by one; a batch recompute from the same counts gives the same report.
+    """
+    live = LeadAttribution()
+    live.record_lead("spring_launch")
+    index = live.index("ds", 1, spend_frame)
+    for campaign_id in [" Spring_Launch", "SPRING_LAUNCH", "retargeting", "unknown", None]:
+        live.record_lead(campaign_id)
+
+    report = live.report(index)
+    assert [(c['campaign_name'], c['leads'], c['cpa']) for c in report['campaigns']] == [
+        ('Spring_Launch', 3, 133.33), ('Retargeting', 1, 50.0)
+    ]
+    assert report['campaigns'][0]['channels'] == ['Facebook', 'Google']
+    assert (report['attributed_leads'], report['unattributed_leads']) == (4, 2)
+    assert report['attributed_cpa'] == 112.5  # 450 spend / 4 leads
+
+    batch = LeadAttribution()
+    batch.recompute(dict(live.lead_counts))
+    assert batch.report(batch.index("ds", 1, spend_frame)) == report
+
+    # A lead taken back (already stored) undoes its increment, spend included for a campaign's last lead
+    live.record_lead("retargeting", n=-1)
+    batch.recompute(dict(live.lead_counts))
+    assert live.report(index) == batch.report(batch.index("ds", 1, spend_frame))
+    assert live.report(index)['attributed_cpa'] == 133.33
+
+def test_single_campaign_lookup_and_index_eviction():
+    """
+    A single campaign is answered by key lookup; old dataset indexes are evicted.
+    """
+    attribution = LeadAttribution(max_indexes=1)
+    index = attribution.index("ds", 1, spend_frame)
+
+    report = attribution.report(index, campaign="RETARGETING")
+    assert report['campaigns'] == [{'campaign_name': 'Retargeting', 'channels': ['Facebook'],
+                                    'spend': 50.0, 'revenue': 25.0, 'leads': 0, 'cpa': None}]
+
+    attribution.index("ds", 2, spend_frame)
+    assert attribution.stats()['spend_indexes'] == 1
@@ -0,0 +1,69 @@
+import json
+import pandas as pd
+from benchmarks import compare, stages
+from benchmarks.synthetic import SyntheticConfig, generate_campaign_data, write_csv
+from backend.services import ingestion
+
+def test_synthetic_data_is_deterministic():
+    """
+    The same config always yields the same rows; another seed yields different ones.
+    """
+    config = SyntheticConfig(rows=2000, channels=3, campaigns=9, days=30)
+
+    first = generate_campaign_data(config)
+
+    assert first.equals(generate_campaign_data(config))
+    assert not first.equals(generate_campaign_data(config.with_seed(7)))
+    assert first["channel"].nunique() == 3
+    assert first["campaign_name"].nunique() == 9
+    assert first.groupby("campaign_name")["channel"].nunique().max() == 1  # One channel per campaign
+    assert pd.to_datetime(first["date"]).dt.date.nunique() == 30
+
+def test_synthetic_broken_rows_match_validation(tmp_path):
+    """
+    Rows made invalid by the generator are exactly the ones the validator rejects.
+    """
+    config = SyntheticConfig(rows=5000, nan_rate=0.02, invalid_rate=0.03)
+    frame = generate_campaign_data(config)
+    required = ["date", "channel", "spend", "revenue", "clicks", "conversions"]
+    expected = (frame[required].isna().any(axis=1) | (frame["date"] == "not-a-date")
+                | (frame["spend"] < 0) | (frame["clicks"] < 0).fillna(False))
+
+    path = tmp_path / "synthetic.csv"
+    write_csv(config, str(path))
+    with open(path, "rb") as f:
+        invalid = sum(int(ingestion.validate_frame(c).error_mask.sum()) for c in ingestion.read_upload_chunks(f, 1000))
+
+    assert 0 < invalid == int(expected.sum())
+
+def test_pipeline_and_webhook_stages_report_timings(client, tmp_path):
+    """
+    A tiny run produces one result per stage with timings and throughput.
+    """
+    config = SyntheticConfig(rows=500)
+    path = str(tmp_path / "bench.csv")
+    write_csv(config, path)
+
+    results = stages.pipeline_stages(path, 500, chunk_size=200, repeat=1)
+    results.append(stages.upload_stage(client, path, 500, chunk_size=200, repeat=2))
+    results.extend(stages.webhook_stages(client, config, leads=50, batch_size=20, repeat=1))
+
+    assert [r["stage"] for r in results] == [
+        "csv_parse", "validation", "calculate_performance", "json_serialization",
+        "calculate_performance_records", "upload_end_to_end", "webhook_single", "webhook_bulk",
+    ]
+    assert all(r["seconds_min"] > 0 and r["rows_per_second"] > 0 for r in results)
+    assert results[5]["repeats"] == 2
+    assert client.get("/integrations/webhook/stats").json()["flushed_total"] >= 100
+    json.dumps(results)  # Machine-readable as it is
+
+def test_compare_flags_regressions():
+    """
+    Stages whose best time grew past the threshold are flagged.
+    """
+    base = {("csv_parse", 1000): {"seconds_min": 1.0}, ("validation", 1000): {"seconds_min": 1.0}}
+    new = {("csv_parse", 1000): {"seconds_min": 1.05}, ("validation", 1000): {"seconds_min": 1.5}}
+
+    rows = compare.compare(base, new, threshold=0.10)
+
+    assert [(r["stage"], r["regression"]) for r in rows] == [("csv_parse", False), ("validation", True)]
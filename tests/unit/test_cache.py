@@ -0,0 +1,100 @@
+import threading
+import time
+from backend.services.cache import DiskCache, LRUCache, SingleFlight, content_key
+
+def test_content_key_is_canonical():
+    """
+    Key order, record order and float noise do not change the key; the data does.
+    """
+    a = {"summary": [{"channel": "A", "roas": 2.0}, {"channel": "B", "roas": 1.0}], "global_roas": 1.5}
+    b = {"global_roas": 1.5000000001, "summary": [{"roas": 1.0, "channel": "B"}, {"channel": "A", "roas": 2.0}]}
+
+    assert content_key(a, "v1") == content_key(b, "v1")
+    assert content_key(a, "v1") != content_key(a, "v2")
+
+def test_lru_evicts_by_entries_and_bytes():
+    """
+    The least recently used entry goes first when either bound is exceeded.
+    """
+    cache = LRUCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None and cache.get("a") == "1"
+
+    cache = LRUCache(max_bytes=10)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+    assert cache.get("a") is None and cache.current_bytes == 6
+    assert cache.stats()["evictions"] == 1
+
+def test_lru_ttl_expires_entries():
+    cache = LRUCache(ttl_seconds=0.01)
+    cache.set("a", "1")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_disk_cache_size_bound(tmp_path):
+    """
+    The disk tier persists values and drops the oldest files above its byte budget.
+    """
+    cache = DiskCache(str(tmp_path), max_bytes=200)
+    cache.set("old", "x" * 100)
+    time.sleep(0.01)
+    cache.set("new", "y" * 100)
+
+    assert cache.get("new") == "y" * 100
+    assert cache.get("old") is None
+    assert DiskCache(str(tmp_path), max_bytes=200).get("new") == "y" * 100
+
+def test_single_flight_coalesces_concurrent_calls():
+    """
+    N concurrent callers with the same key trigger a single execution and share its result.
+    """
+    flights = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("k", slow))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert flights.stats() == {"executions": 1, "coalesced": 7}
+
+def test_disk_cache_lists_the_directory_only_over_budget(tmp_path, monkeypatch):
+    """
+    Writes keep a running byte total; the directory is scanned only once it goes over budget.
+    Counters stay exact under concurrent lookups.
+    """
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    scans = []
+    files = cache._files
+    monkeypatch.setattr(cache, "_files", lambda: scans.append(1) or files())
+
+    for i in range(5):
+        cache.set(f"k{i}", "x" * 100)  # ~130 bytes per file
+    cache.set("k0", "y" * 100)  # Overwriting does not grow the total
+    assert scans == []
+
+    for i in range(5, 10):
+        cache.set(f"k{i}", "x" * 100)
+    assert len(scans) >= 1
+    assert cache.stats()["bytes"] == sum(f.stat().st_size for f in tmp_path.glob("*.json")) <= 1000
+
+    threads = [threading.Thread(target=lambda: [cache.get("k9") for _ in range(200)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats()["hits"] == 800
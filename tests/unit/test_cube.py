@@ -0,0 +1,81 @@
+import pandas as pd
+from backend.services.cube import AggregationCube, CubeCache, cuboid_name
+
+def make_cells():
+    """
+    Rollup cells over two quarters: one campaign per channel, plus a shared one.
+    """
+    dates = pd.date_range("2024-01-01", "2024-06-30", freq="D")
+    frames = []
+    for i, (channel, campaign) in enumerate([("Google", "Brand"), ("Meta", "Launch"), ("Meta", "Brand")]):
+        frames.append(pd.DataFrame({
+            "date": dates.date,
+            "channel": channel,
+            "campaign_name": campaign,
+            "spend": 10.0 * (i + 1),
+            "revenue": 25.0 * (i + 1) + dates.day.to_numpy(),
+            "clicks": 100,
+            "conversions": i + 1,
+            "row_count": 2,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def test_cube_matches_a_direct_groupby():
+    """
+    Quarter x channel totals from the cube equal a groupby over the raw cells.
+    """
+    cells = make_cells()
+    rows, key, _ = AggregationCube(cells).query(["channel", "date"], "quarter", ["spend", "revenue", "rows"])
+
+    dates = pd.to_datetime(cells["date"]).dt.to_period("Q").dt.start_time.dt.date
+    expected = cells.assign(date=dates).groupby(["channel", "date"], as_index=False)[["spend", "revenue", "row_count"]].sum()
+    assert rows["spend"].tolist() == expected["spend"].round(2).tolist()
+    assert rows["revenue"].tolist() == expected["revenue"].round(2).tolist()
+    assert rows["rows"].tolist() == expected["row_count"].tolist()
+    assert rows["date"].tolist() == expected["date"].tolist()
+    assert cuboid_name(key) == "channel+date:quarter"
+
+def test_query_reads_the_smallest_covering_cuboid():
+    """
+    Filters add their dimension to the cuboid; date filters need cells aligned to the range.
+    """
+    cube = AggregationCube(make_cells())
+
+    rows, key, cells = cube.query([], metrics=["spend", "roas"], channels=["Meta"])
+    assert cuboid_name(key) == "channel"
+    assert cells == 2
+    assert rows.to_dict(orient="records") == [{"spend": 182 * 50.0, "roas": rows["roas"][0]}]
+
+    # A month-aligned range is answered from monthly cells...
+    _, key, _ = cube.query(["campaign_name"], start_date="2024-02-01", end_date="2024-03-31")
+    assert cuboid_name(key) == "campaign_name+date:month"
+    # ...a range cutting through a month falls back to days
+    rows, key, _ = cube.query(["campaign_name"], metrics=["rows"], start_date="2024-02-15", end_date="2024-03-31")
+    assert cuboid_name(key) == "campaign_name+date:day"
+    assert rows["rows"].tolist() == [2 * 2 * 46, 2 * 46]
+
+def test_weeks_are_rolled_up_from_days():
+    """
+    Weeks start on Monday and straddle months, so they are never built from months.
+    """
+    rows, key, _ = AggregationCube(make_cells()).query(["date"], "week", ["clicks"], end_date="2024-01-14")
+    assert cuboid_name(key) == "date:week"
+    assert [str(d) for d in rows["date"]] == ["2024-01-01", "2024-01-08"]
+    assert rows["clicks"].tolist() == [2100, 2100]
+
+def test_cube_cache_builds_once_per_version():
+    """
+    The cube of a dataset version is built on first use; a new version gets a new cube.
+    """
+    cache = CubeCache(max_bytes=10 * 1024 * 1024)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return make_cells()
+
+    first = cache.get("abc", 1, load)
+    assert cache.get("abc", 1, load) is first
+    assert cache.get("abc", 2, load) is not first
+    assert len(loads) == 2
+    assert cache.stats()["hits"] == 1
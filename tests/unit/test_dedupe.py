@@ -0,0 +1,52 @@
+from backend.services.dedupe import BloomFilter, LeadDeduplicator, RotatingBloomFilter, lead_fingerprint
+
+def test_fingerprint_is_normalized():
+    """
+    Case and surrounding whitespace do not change a lead's identity; the campaign does.
+    """
+    assert lead_fingerprint(" Ana@Example.com", "C1", "Facebook") == lead_fingerprint("ana@example.com", "c1", "facebook ")
+    assert lead_fingerprint("ana@example.com", "c1", "facebook") != lead_fingerprint("ana@example.com", "c2", "facebook")
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    """
+    Every added key is found; unseen keys are rarely (about error_rate) reported.
+    """
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"seen-{i}")
+
+    assert all(f"seen-{i}" in bloom for i in range(10_000))
+    false_positives = sum(f"unseen-{i}" in bloom for i in range(10_000))
+    assert false_positives < 300
+    assert bloom.memory_bytes < 16_000
+
+def test_rotating_filter_forgets_after_window():
+    """
+    Keys survive at least one window and are dropped after two, with constant memory.
+    """
+    now = [0.0]
+    bloom = RotatingBloomFilter(window_seconds=60, capacity=100, error_rate=0.01, clock=lambda: now[0])
+    memory = bloom.memory_bytes
+    bloom.add("lead")
+
+    now[0] = 59
+    assert "lead" in bloom
+    now[0] = 121
+    assert "lead" not in bloom
+    assert bloom.memory_bytes == memory
+
+def test_exact_check_only_runs_on_bloom_positives():
+    """
+    Bloom negatives are accepted without the exact check; false positives are accepted after it.
+    """
+    bloom = RotatingBloomFilter(window_seconds=60, capacity=100, error_rate=0.01)
+    stored = {"fp:old"}
+    dedupe = LeadDeduplicator(bloom, is_pending=lambda key: False, find_stored=lambda keys: stored & set(keys))
+    bloom.add("fp:old")
+    bloom.add("fp:evicted-from-db")
+
+    candidates = [["fp:new"], ["fp:old"], ["fp:evicted-from-db"], ["fp:new"]]
+    assert dedupe.maybe_seen(candidates) == ["fp:old", "fp:evicted-from-db"]
+    assert dedupe.resolve(candidates, stored) == [False, True, False, True]
+    assert dedupe.stats()["bloom_false_positives"] == 1
+    assert dedupe.stats()["duplicate_rate"] == 0.5
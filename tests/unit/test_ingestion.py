@@ -0,0 +1,136 @@
+import pandas as pd
+from backend.services.ingestion import validate_frame, ValidationReportBuilder
+
+def make_chunk():
+    """
+    Four rows: one valid, one with a bad date, one negative spend and one fractional click count.
+    """
+    return pd.DataFrame({
+        "date": ["2024-01-01", "not-a-date", "2024-01-03", "2024-01-04"],
+        "channel": ["Facebook", "Google", "Google", "TikTok"],
+        "spend": [100.0, 50.0, -1.0, 10.0],
+        "revenue": [200.0, 100.0, 10.0, 20.0],
+        "clicks": [10, 5, 5, 2.5],
+        "conversions": [1, 1, 1, 1],
+    })
+
+def test_validate_frame_flags_every_bad_row():
+    """
+    All invalid rows are reported, not just the first one.
+    """
+    result = validate_frame(make_chunk())
+
+    assert result.error_mask.tolist() == [False, True, True, True]
+    assert result.failing_rows.tolist() == [2, 3, 4]
+    assert result.field_errors["date"].sum() == 1
+    assert result.field_errors["spend"].sum() == 1
+    assert result.field_errors["clicks"].sum() == 1
+
+def test_validate_frame_returns_typed_clean_rows():
+    """
+    The clean frame keeps only valid rows, with defaults and engine-ready dtypes.
+    """
+    frame = validate_frame(make_chunk()).frame
+
+    assert len(frame) == 1
+    assert frame["campaign_name"].tolist() == ["General"]
+    assert frame["clicks"].dtype == "int64"
+    assert pd.api.types.is_datetime64_any_dtype(frame["date"])
+
+def test_validate_frame_rejects_dates_with_a_time_of_day():
+    """
+    Timestamps are only valid dates at midnight, matching CampaignRecord.date.
+    """
+    import pytest
+    from pydantic import ValidationError
+    from backend.models.schemas import CampaignRecord
+
+    chunk = make_chunk().iloc[[0, 0, 0]].reset_index(drop=True)
+    chunk["date"] = ["2024-01-01T13:45:00", "2024-01-01T00:00:00", "2024-01-01"]
+    result = validate_frame(chunk)
+
+    assert result.field_errors["date"].tolist() == [True, False, False]
+    with pytest.raises(ValidationError):
+        CampaignRecord(**{**chunk.iloc[0].to_dict(), "date": "2024-01-01T13:45:00"})
+    assert str(CampaignRecord(**{**chunk.iloc[1].to_dict(), "clicks": 10}).date) == "2024-01-01"
+
+def test_report_builder_caps_failing_rows():
+    """
+    The report counts every invalid row but only lists up to the configured maximum.
+    """
+    builder = ValidationReportBuilder(max_reported_rows=2)
+    builder.add(validate_frame(make_chunk()))
+    report = builder.build()
+
+    assert report.total_rows == 4
+    assert report.invalid_rows == 3
+    assert report.failing_rows == [2, 3]
+
+def _encode(frame, fmt):
+    """Serializes a frame in one of the supported upload formats."""
+    import gzip
+    import io
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    buffer = io.BytesIO()
+    if fmt == "csv.gz":
+        buffer.write(gzip.compress(frame.to_csv(index=False).encode()))
+    elif fmt == "csv.zst":
+        buffer.write(pa.compress(frame.to_csv(index=False).encode(), codec="zstd", asbytes=True))
+    elif fmt == "parquet":
+        pq.write_table(table, buffer, row_group_size=2)
+    elif fmt == "arrow":
+        with pa.ipc.new_file(buffer, table.schema) as writer:
+            writer.write_table(table, max_chunksize=2)
+    elif fmt == "arrow-stream":
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table, max_chunksize=2)
+    buffer.seek(0)
+    return buffer
+
+def test_every_upload_format_validates_identically():
+    """
+    Compressed CSV and columnar uploads are detected by magic bytes and produce the
+    same validation result (including row numbers across chunks) as plain CSV.
+    """
+    import io
+    from datetime import date
+    from backend.services.ingestion import detect_format, read_upload_chunks
+
+    frame = pd.DataFrame({
+        "Date": [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)],
+        "Channel": ["Facebook", None, "TikTok"],
+        "Spend": [100.0, 50.0, 10.0],
+        "Revenue": [200.0, 100.0, 20.0],
+        "Clicks": [10, 5, 2],
+        "Conversions": [1, 1, 1],
+    })
+
+    def run(source):
+        chunks = [validate_frame(c) for c in read_upload_chunks(source, chunk_size=2)]
+        failing = [int(r) for c in chunks for r in c.failing_rows]
+        typed = pd.concat([c.frame for c in chunks]).reset_index(drop=True)
+        return failing, typed
+
+    expected_failing, expected = run(io.BytesIO(frame.to_csv(index=False).encode()))
+    assert expected_failing == [2]
+
+    for fmt in ["csv.gz", "csv.zst", "parquet", "arrow", "arrow-stream"]:
+        source = _encode(frame, fmt)
+        assert detect_format(source) == fmt
+        failing, typed = run(source)
+        assert failing == expected_failing, fmt
+        pd.testing.assert_frame_equal(typed, expected, check_dtype=False)
+
+def test_columnar_upload_missing_columns_is_rejected():
+    """
+    Required-column checks run on the columnar schema before any row is read.
+    """
+    import pytest
+    from backend.services.ingestion import IngestionError, read_upload_chunks
+
+    source = _encode(pd.DataFrame({"date": ["2024-01-01"], "channel": ["A"]}), "parquet")
+    with pytest.raises(IngestionError, match="Missing required columns"):
+        next(read_upload_chunks(source, chunk_size=10))
@@ -0,0 +1,77 @@
+import asyncio
+from sqlalchemy import exc
+from backend.services.lead_buffer import LeadWriteBuffer
+
+def records(n):
+    return [{"fingerprint": f"fp{i}", "idempotency_key": None} for i in range(n)]
+
+class FlakyWriter:
+    """Stores every batch except those holding a poisoned fingerprint (or all of them while `down`)."""
+
+    def __init__(self, poisoned=()):
+        self.poisoned = set(poisoned)
+        self.down = False
+        self.stored = []
+
+    def __call__(self, batch):
+        if self.down:
+            raise exc.OperationalError("INSERT", {}, Exception("database is locked"))
+        if any(r["fingerprint"] in self.poisoned for r in batch):
+            raise exc.DataError("INSERT", {}, Exception("value too long"))
+        self.stored.extend(r["fingerprint"] for r in batch)
+        return {r["fingerprint"] for r in batch}
+
+def test_refused_rows_are_isolated_and_dead_lettered():
+    """
+    A batch the database keeps refusing is split until the bad lead is alone; the others are stored.
+    """
+    writer = FlakyWriter(poisoned={"fp5"})
+    dropped = []
+    buffer = LeadWriteBuffer(max_depth=100, batch_size=8, flush_interval=1, writer=writer,
+                             on_dropped=dropped.extend, max_attempts=2)
+    buffer.offer(records(10))
+    asyncio.run(buffer.flush())
+
+    assert sorted(writer.stored) == sorted(f"fp{i}" for i in range(10) if i != 5)
+    assert [r["fingerprint"] for r in buffer.dead_letters] == ["fp5"] == [r["fingerprint"] for r in dropped]
+    assert buffer.depth == 0 and not buffer.is_pending("fp:fp5")
+
+def test_outages_are_retried_without_dropping_leads():
+    """
+    Connection-level failures keep the batch at the head of the queue, however many times they happen.
+    """
+    writer = FlakyWriter()
+    writer.down = True
+    buffer = LeadWriteBuffer(max_depth=100, batch_size=4, flush_interval=1, writer=writer, max_attempts=1)
+    buffer.offer(records(6))
+    for _ in range(5):
+        asyncio.run(buffer.flush())
+    assert (buffer.depth, buffer.dead_letter_total) == (6, 0)
+
+    writer.down = False
+    asyncio.run(buffer.flush())
+    assert writer.stored == [f"fp{i}" for i in range(6)]
+    assert buffer.depth == 0
+
+def test_stop_lets_the_running_write_finish():
+    """
+    Stopping while a batch is being written waits for it and drains the queue; nothing is lost.
+    """
+    writer = FlakyWriter()
+
+    def slow_writer(batch):
+        import time
+        time.sleep(0.05)
+        return writer(batch)
+
+    async def scenario():
+        buffer = LeadWriteBuffer(max_depth=100, batch_size=2, flush_interval=0.01, writer=slow_writer)
+        await buffer.start()
+        buffer.offer(records(5))
+        await asyncio.sleep(0.02)  # The flusher is in the middle of a write
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert sorted(writer.stored) == [f"fp{i}" for i in range(5)]
+    assert buffer.depth == 0
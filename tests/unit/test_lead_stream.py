@@ -0,0 +1,44 @@
+from backend.services.lead_stream import LeadStreamAggregator, WindowCounter
+
+def test_window_counter_slides_and_tumbles():
+    """
+    Sliding counts drop events older than the window; tumbling counts restart on window boundaries.
+    """
+    counter = WindowCounter(window_seconds=300, bucket_seconds=10)
+    counter.add(1000)  # bucket 100, window [900, 1200)
+    counter.add(1195, n=2)
+    counter.add(1205)  # next tumbling window
+
+    assert counter.sliding(1205) == 4
+    assert counter.tumbling(1205) == 1
+    assert counter.sliding(1305) == 3  # The event at t=1000 slid out
+    assert counter.sliding(2000) == 0
+
+def test_stale_events_do_not_resurrect_expired_slots():
+    """
+    An event older than the window never overwrites a newer bucket in the ring.
+    """
+    counter = WindowCounter(window_seconds=300, bucket_seconds=10)
+    counter.add(1300)
+    counter.add(1000)  # Same slot, 30 buckets earlier
+
+    assert counter.sliding(1300) == 1
+
+def test_velocity_per_dimension():
+    """
+    Velocity is reported overall and per key, busiest key first.
+    """
+    now = [10_000.0]
+    stream = LeadStreamAggregator(clock=lambda: now[0])
+    for _ in range(3):
+        stream.record("Facebook Ads", "launch")
+    stream.record("Typeform", None, ts=now[0] - 600)  # Outside 5m, inside 1h
+
+    velocity = stream.velocity("source")
+    assert velocity["total"]["5m"]["count"] == 3
+    assert velocity["total"]["1h"]["count"] == 4
+    assert velocity["total"]["5m"]["per_minute"] == 0.6
+    assert [g["key"] for g in velocity["groups"]] == ["Facebook Ads", "Typeform"]
+
+    by_campaign = stream.velocity("campaign_id", key="(none)")
+    assert by_campaign["groups"][0]["windows"]["24h"]["count"] == 1
@@ -0,0 +1,56 @@
+import pytest
+from backend.core.metrics import CallbackMetric, Counter, Histogram, Registry, StageTimer
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    Buckets are cumulative, +Inf equals the count, and label values are escaped.
+    """
+    latency = Histogram("demo_seconds", "Demo latency.", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.labels(route='/a"b').observe(value)
+
+    lines = latency.render().splitlines()
+
+    assert lines[:2] == ["# HELP demo_seconds Demo latency.", "# TYPE demo_seconds histogram"]
+    assert lines[2:] == [
+        'demo_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'demo_seconds_bucket{route="/a\\"b",le="1"} 3',
+        'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        'demo_seconds_sum{route="/a\\"b"} 4.05',
+        'demo_seconds_count{route="/a\\"b"} 4',
+    ]
+
+def test_registry_renders_counters_and_callbacks():
+    """
+    Counters keep one series per label set; callbacks are read at scrape time.
+    """
+    registry = Registry()
+    requests = registry.register(Counter("demo_requests_total", "Requests.", ["status"]))
+    depth = {"value": 3}
+    registry.register(CallbackMetric("demo_queue_depth", "Queue depth.", "gauge", lambda: depth["value"]))
+
+    requests.labels(status=200).inc()
+    requests.labels(status=200).inc(2)
+    depth["value"] = 7
+    text = registry.render()
+
+    assert 'demo_requests_total{status="200"} 3' in text
+    assert "# TYPE demo_queue_depth gauge\ndemo_queue_depth 7" in text
+    with pytest.raises(ValueError):
+        registry.register(Counter("demo_requests_total", "Duplicate."))
+
+def test_stage_timer_records_one_observation_per_stage():
+    """
+    Time across chunks is summed per stage and observed once, including time spent in the iterator.
+    """
+    stages = Histogram("demo_stage_seconds", "Stages.", ["stage"])
+    timer = StageTimer(stages)
+
+    for item in timer.timed("read", iter([1, 2, 3])):
+        with timer.stage("validate"):
+            pass
+    timer.observe()
+
+    assert set(timer.totals) == {"read", "validate"}
+    assert sum(stages.labels(stage="read").counts) == 1
+    assert sum(stages.labels(stage="validate").counts) == 1
@@ -28,4 +28,52 @@ def test_empty_data():
     """
     result = calculate_performance([])
     assert result.global_roas == 0.0
-    assert len(result.summary) == 0
\ No newline at end of file
+    assert len(result.summary) == 0
+
+def test_accumulator_matches_single_pass(sample_campaign_data):
+    """
+    Feeding records chunk by chunk must give the same result as one pass.
+    """
+    import pandas as pd
+    from backend.services.metrics_engine import PerformanceAccumulator
+
+    accumulator = PerformanceAccumulator()
+    for record in sample_campaign_data:
+        accumulator.add(pd.DataFrame([record.model_dump()]))
+
+    assert accumulator.rows == 2
+    assert accumulator.result() == calculate_performance(sample_campaign_data)
+
+def test_status_thresholds_vectorized():
+    """
+    The traffic light is applied on whole columns: boundaries are inclusive of the better status.
+    """
+    import pandas as pd
+    from backend.services.metrics_engine import compute_metrics
+
+    totals = pd.DataFrame({
+        "channel": ["A", "B", "C", "D"],
+        "spend": [100.0, 100.0, 100.0, 0.0],
+        "revenue": [200.0, 199.0, 99.0, 50.0],
+        "conversions": [4, 0, 1, 0],
+        "clicks": [40, 10, 0, 0],
+    })
+    metrics = compute_metrics(totals)
+
+    assert metrics["recommendation_status"].tolist() == ["Good", "Warning", "Critical", "Critical"]
+    assert metrics["cpa"].tolist() == [25.0, 0.0, 100.0, 0.0]
+    assert metrics["conversion_rate"].tolist() == [10.0, 0.0, 0.0, 0.0]
+
+def test_frame_and_arrow_entry_points_match(sample_campaign_data):
+    """
+    DataFrame and Arrow inputs give the same response as the record-based wrapper.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    from backend.services.metrics_engine import calculate_performance_frame
+
+    df = pd.DataFrame([record.model_dump() for record in sample_campaign_data])
+    expected = calculate_performance(sample_campaign_data)
+
+    assert calculate_performance_frame(df) == expected
+    assert calculate_performance_frame(pa.Table.from_pandas(df)) == expected
@@ -0,0 +1,83 @@
+import gzip
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from backend.core.middleware import CompressionMiddleware, GzipRequestMiddleware, accepted_encodings
+
+def make_client(max_size):
+    app = FastAPI()
+    app.add_middleware(GzipRequestMiddleware, max_size=max_size)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"length": len(body), "encoding": request.headers.get("content-encoding")}
+
+    return TestClient(app)
+
+def test_gzip_body_is_inflated_and_headers_hidden():
+    """
+    The endpoint sees the plain body, without the Content-Encoding header.
+    """
+    client = make_client(max_size=10_000)
+    response = client.post("/echo", content=gzip.compress(b"x" * 5000), headers={"Content-Encoding": "gzip"})
+
+    assert response.json() == {"length": 5000, "encoding": None}
+
+def test_gzip_bomb_and_corrupt_bodies_are_rejected():
+    """
+    Bodies inflating past max_size get 413; invalid gzip data gets 400.
+    """
+    client = make_client(max_size=1000)
+
+    bomb = client.post("/echo", content=gzip.compress(b"\0" * 1_000_000), headers={"Content-Encoding": "gzip"})
+    corrupt = client.post("/echo", content=b"not gzip at all", headers={"Content-Encoding": "gzip"})
+
+    assert bomb.status_code == 413
+    assert corrupt.status_code == 400
+
+def make_compressing_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    def big():
+        return {"rows": ["campaign"] * 1000}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return TestClient(app)
+
+def test_accepted_encodings_skips_refused_codings():
+    """
+    Codings with q=0 are not accepted; weights and case are ignored otherwise.
+    """
+    assert accepted_encodings("gzip;q=0.5, BR, deflate;q=0") == {"gzip", "br"}
+    assert accepted_encodings("") == set()
+
+def test_gzip_response_when_brotli_not_accepted():
+    """
+    Large responses are gzip-compressed; small ones are sent as they are.
+    """
+    client = make_compressing_client()
+
+    big = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.json()["rows"][0] == "campaign"
+    assert "content-encoding" not in small.headers
+
+def test_brotli_preferred_when_accepted():
+    """
+    Clients accepting br get brotli, which decodes back to the same JSON.
+    """
+    pytest.importorskip("brotli")
+    client = make_compressing_client()
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()["rows"][-1] == "campaign"
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from backend.core.config import settings
+from backend.services import metrics_engine
+from backend.services.parallel_aggregation import aggregate_parallel
+
+def synthetic_frame(rows=20_000, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'channel': rng.choice(['Facebook', 'Google', 'TikTok', 'Email', None], size=rows),
+        'spend': rng.uniform(0, 500, rows).round(2),
+        'revenue': rng.uniform(0, 900, rows).round(2),
+        'conversions': rng.integers(0, 20, rows),
+        'clicks': rng.integers(20, 400, rows),
+    })
+
+def test_parallel_partials_match_groupby():
+    """
+    Row-range partial sums merged from the process pool equal the serial groupby
+    (same channels and order, integer columns stay integers, missing channels dropped).
+    """
+    df = synthetic_frame()
+    serial = df.groupby('channel')[metrics_engine.AGGREGATE_COLUMNS].sum()
+    parallel = aggregate_parallel(df, 'channel', metrics_engine.AGGREGATE_COLUMNS, workers=3)
+
+    pd.testing.assert_frame_equal(parallel, serial, check_exact=False, rtol=1e-12)
+    assert parallel['clicks'].dtype == serial['clicks'].dtype
+
+def test_threshold_switches_to_parallel_with_identical_response(monkeypatch):
+    """
+    Above the threshold the metrics engine uses the pool; the API response is unchanged.
+    """
+    df = synthetic_frame()
+    serial = metrics_engine.calculate_performance_frame(df)
+
+    monkeypatch.setattr(settings, "PARALLEL_AGGREGATION_MIN_ROWS", 1000)
+    monkeypatch.setattr(settings, "PARALLEL_AGGREGATION_WORKERS", 2)
+    calls = []
+    original = metrics_engine.aggregate_parallel
+    monkeypatch.setattr(metrics_engine, "aggregate_parallel", lambda *a: calls.append(a) or original(*a))
+
+    assert metrics_engine.calculate_performance_frame(df) == serial
+    assert len(calls) == 1
+
+def test_chunked_upload_goes_parallel_past_the_cumulative_threshold(monkeypatch):
+    """
+    Upload chunks are smaller than the threshold: once the running row count reaches it,
+    the following chunks are summed in the pool, with the same response as the serial pass.
+    """
+    df = synthetic_frame()
+    serial = metrics_engine.calculate_performance_frame(df)
+
+    monkeypatch.setattr(settings, "PARALLEL_AGGREGATION_MIN_ROWS", 5000)
+    monkeypatch.setattr(settings, "PARALLEL_AGGREGATION_WORKERS", 2)
+    submitted = []
+    original = metrics_engine.PendingSum
+    monkeypatch.setattr(metrics_engine, "PendingSum", lambda *a: submitted.append(len(a[0])) or original(*a))
+
+    accumulator = metrics_engine.PerformanceAccumulator()
+    for start in range(0, len(df), 2000):
+        accumulator.add(df.iloc[start:start + 2000])
+
+    assert accumulator.result() == serial
+    assert sum(submitted) == len(df) - 4000  # The first two chunks stay under the threshold
@@ -0,0 +1,39 @@
+from backend.services.prompt_compactor import compact_summary, estimate_tokens
+
+def make_summary(n_channels):
+    return {
+        "summary": [
+            {
+                "channel": f"channel_{i:04d}", "total_spend": 1000.0 + i, "total_revenue": 1500.0 + 3 * i,
+                "total_conversions": i, "roas": round((1500.0 + 3 * i) / (1000.0 + i), 2),
+                "cpa": 12.3456, "conversion_rate": 1.234, "recommendation_status": "Warning"
+            }
+            for i in range(n_channels)
+        ],
+        "global_roas": 1.8
+    }
+
+def test_small_summary_is_kept_in_full():
+    """
+    A summary that fits in the budget keeps every channel, just in a denser table.
+    """
+    result = compact_summary(make_summary(3), token_budget=1000)
+
+    assert result["stats"]["rows_shown"] == 3
+    assert "channel_0002|1,002|1,506|2|1.50|12.35|1.2|Warning" in result["text"]
+    assert result["stats"]["compaction_ratio"] < 1
+
+def test_large_summary_fits_the_budget():
+    """
+    Hundreds of channels are reduced to top/bottom performers plus a long-tail aggregate.
+    """
+    summary = make_summary(500)
+    result = compact_summary(summary, token_budget=400, top_k=5)
+    stats = result["stats"]
+
+    assert estimate_tokens(result["text"]) <= 400
+    assert stats["rows_total"] == 500 and stats["rows_shown"] < 500
+    assert "LONG TAIL (" in result["text"]
+    # Best ROAS and biggest spender are always kept
+    assert "channel_0499" in result["text"]
+    assert stats["original_tokens"] > 10 * stats["compacted_tokens"]
@@ -0,0 +1,56 @@
+from datetime import datetime
+from backend.models.schemas import AnalysisResponse, DatasetInfo
+from backend.services.cache import DiskCache
+from backend.services.query_cache import QueryCache
+
+def make_info(dataset_id="abc123", version=1):
+    now = datetime(2024, 1, 1)
+    return DatasetInfo(dataset_id=dataset_id, version=version, created_at=now, updated_at=now, row_count=1,
+                       channels=[], summary=AnalysisResponse(summary=[], global_roas=0.0))
+
+def test_equivalent_parameters_share_an_entry():
+    """
+    Filter order and unset parameters do not change the key; the dataset version does.
+    """
+    cache = QueryCache(10_000)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return f'{{"rows":[{len(calls)}]}}'
+
+    first = cache.get_or_compute(make_info(), "query", {"channels": ["Meta", "Google"], "end_date": None}, compute)
+    again = cache.get_or_compute(make_info(), "query", {"channels": ["Google", "Meta"]}, compute)
+    newer = cache.get_or_compute(make_info(version=2), "query", {"channels": ["Google", "Meta"]}, compute)
+
+    assert first == again == '{"rows":[1]}'
+    assert newer == '{"rows":[2]}'
+    assert cache.stats()["memory"]["hit_ratio"] == round(1 / 3, 4)
+
+def test_memory_tier_is_bounded_by_bytes():
+    """
+    Bodies are sized by their encoded length; the least recently used are evicted first.
+    """
+    cache = QueryCache(100)
+    for i in range(3):
+        cache.get_or_compute(make_info(), "query", {"i": i}, lambda: '{"rows":["%s"]}' % ("x" * 30))
+
+    stats = cache.stats()["memory"]
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert stats["bytes"] <= 100
+
+def test_invalidate_drops_one_dataset_in_every_tier(tmp_path):
+    """
+    An append removes the dataset's results from memory and the shared disk tier, and nothing else.
+    """
+    cache = QueryCache(10_000, DiskCache(str(tmp_path), max_bytes=10_000))
+    cache.get_or_compute(make_info("abc"), "query", {}, lambda: '{"rows":[1]}')
+    cache.get_or_compute(make_info("def"), "query", {}, lambda: '{"rows":[2]}')
+
+    # Another worker (same directory, empty memory) is served from disk
+    other_worker = QueryCache(10_000, DiskCache(str(tmp_path), max_bytes=10_000))
+    assert other_worker.get_or_compute(make_info("abc"), "query", {}, lambda: '{"rows":[0]}') == '{"rows":[1]}'
+
+    assert cache.invalidate("abc") == 2  # Memory + disk
+    assert other_worker.tiers.disk.get(cache.key(make_info("abc"), "query", {})) is None
+    assert cache.get_or_compute(make_info("def"), "query", {}, lambda: '{"rows":[0]}') == '{"rows":[2]}'
@@ -0,0 +1,94 @@
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.database.db import Base
+from backend.database import models  # noqa: F401
+from backend.models.schemas import DatasetInfo, DatasetQuery
+from backend.services import rollups
+
+def make_session():
+    """
+    Fresh in-memory SQLite database with all tables.
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+def make_batch(spend):
+    return pd.DataFrame({
+        "date": [date(2024, 1, 1), date(2024, 1, 1)],
+        "channel": ["Facebook", "Google"],
+        "campaign_name": ["Launch", "Brand"],
+        "spend": [spend, 10.0],
+        "revenue": [2 * spend, 5.0],
+        "clicks": [10, 10],
+        "conversions": [1, 1],
+    })
+
+def test_rollups_are_incremented_across_batches():
+    """
+    Two batches hitting the same grain end up in one rollup row with summed totals.
+    """
+    db = make_session()
+    written = rollups.ingest_batches(db, "abc", [make_batch(100.0), make_batch(50.0)])
+
+    assert written == 4
+    rollup_rows = db.query(models.CampaignRollup).order_by(models.CampaignRollup.channel).all()
+    assert [(r.channel, r.spend, r.row_count) for r in rollup_rows] == [("Facebook", 150.0, 2), ("Google", 20.0, 2)]
+
+def test_query_rollups_filters_and_groups():
+    """
+    Queries are answered from the rollups with KPIs derived on the aggregated rows.
+    """
+    db = make_session()
+    rollups.ingest_batches(db, "abc", [make_batch(100.0)])
+
+    rows = rollups.query_rollups(db, "abc", DatasetQuery(group_by=["campaign_name"], channels=["Google"]))
+    assert rows.to_dict(orient="records") == [{
+        "campaign_name": "Brand", "total_spend": 10.0, "total_revenue": 5.0, "total_conversions": 1,
+        "roas": 0.5, "cpa": 10.0, "conversion_rate": 10.0, "recommendation_status": "Critical"
+    }]
+    assert rollups.query_rollups(db, "other", DatasetQuery()).empty
+
+def test_replace_keys_swaps_only_the_given_grains():
+    """
+    An append deletes the facts and rollups of the uploaded keys and writes the new rows; other keys are kept.
+    """
+    db = make_session()
+    rollups.ingest_batches(db, "abc", [make_batch(100.0), make_batch(50.0)])
+
+    keys = pd.DataFrame({"date": [date(2024, 1, 1)], "channel": ["Facebook"], "campaign_name": ["Launch"]})
+    written = rollups.replace_keys(db, "abc", keys, [make_batch(7.0).iloc[:1]])
+
+    assert written == 1
+    assert db.query(models.CampaignFact).count() == 3
+    assert rollups.channel_totals(db, "abc")[["channel", "spend"]].values.tolist() == [["Facebook", 7.0], ["Google", 20.0]]
+
+def test_concurrent_first_loads_ingest_a_dataset_once(tmp_path):
+    """
+    Two sessions loading the same dataset at once: one writes it, the other finds the marker; rollups are not doubled.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    info = DatasetInfo.model_construct(dataset_id="abc")
+
+    class SlowStore:
+        def iter_batches(self, info, batch_size):
+            time.sleep(0.1)
+            yield make_batch(100.0)
+
+    def load():
+        with Session() as db:
+            return rollups.ensure_ingested(db, SlowStore(), info, 1000)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        written = sorted(pool.map(lambda _: load(), range(2)))
+
+    assert written == [0, 2]
+    with Session() as db:
+        assert rollups.channel_totals(db, "abc")["spend"].tolist() == [100.0, 10.0]
+        assert rollups.ensure_ingested(db, SlowStore(), info, 1000) == 0
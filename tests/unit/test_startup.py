@@ -0,0 +1,22 @@
+import os
+from benchmarks.startup import import_profile
+
+# Generous ceiling for a cold `import backend.main` (CI machines vary); lower it locally to catch regressions
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "5"))
+
+def test_api_import_is_lazy_and_within_budget():
+    """
+    Importing the API loads no LLM SDK (they load on first use) and stays within the import-time budget.
+    """
+    profile = import_profile("backend.main")
+
+    assert profile["loaded"] == []
+    assert profile["seconds"] < IMPORT_BUDGET_SECONDS, profile["slowest"]
+
+def test_gemini_sdk_loads_on_first_use():
+    """
+    The Gemini SDK is only imported when a Gemini provider is built.
+    """
+    profile = import_profile("backend.services.ai_agent", after="backend.services.ai_agent.create_provider('gemini')")
+
+    assert "google.generativeai" in profile["loaded"]
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from backend.services.timeseries import build_series, lttb_indices
+
+def test_lttb_keeps_endpoints_and_peaks():
+    """
+    Downsampling keeps the first/last points and the spike a naive stride would miss.
+    """
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[503] = 100.0
+
+    keep = lttb_indices(x, y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 503 in keep
+    assert list(lttb_indices(x[:10], y[:10], 50)) == list(range(10))
+
+def test_weekly_buckets_and_roas_after_summing():
+    """
+    Days are summed per Monday-based week before ROAS is derived.
+    """
+    daily = pd.DataFrame({
+        'date': [date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 8)],
+        'channel': ['Google', 'Google', 'Google'],
+        'spend': [100.0, 300.0, 50.0],
+        'revenue': [400.0, 200.0, 25.0],
+    })
+
+    (series,) = build_series(daily, "roas", "week")
+    assert series['dates'] == [date(2024, 1, 1), date(2024, 1, 8)]
+    assert series['values'] == [1.5, 0.5]  # 600/400, 25/50
+
+    (monthly,) = build_series(daily, "spend", "month")
+    assert monthly['values'] == [450.0]